@@ -355,7 +355,18 @@ from datetime import datetime
 from flask import request, jsonify
 from Config import Session
 from Model import Books
+from catalog import parse_list_args, list_books, list_response, ListArgsError, bump_catalog_version
+from shelves import invalidate_shelves
+from search import index_book, unindex_book
+from autocomplete import forget_book
 REQUEST_TIMEOUT = 20
+USER_BOOK_FIELDS = ("book_id", "title", "author", "cover_image_url", "main_category", "sub_category", "created_at")
+MY_BOOK_FIELDS = ("book_id", "title", "author", "user_id", "main_category", "sub_category", "created_at")
+# the original (unpaged) responses, still sent when neither limit= nor cursor= is given
+USER_BOOK_ALL_FIELDS = ("book_id", "title", "author", "cover_image_url", "main_category", "sub_category",
+                        "description", "created_at")
+MY_BOOK_ALL_FIELDS = ("book_id", "title", "author", "description", "user_id", "main_category", "sub_category",
+                      "created_at")
 
 # ----------------- Helpers -----------------
 # -------------------------- Upload Book Controller -----------------------------
@@ -379,6 +390,9 @@ def upload_book_controller():
         )
         db.add(new_book)
         db.commit()
+        bump_catalog_version()
+        invalidate_shelves()
+        index_book(new_book.book_id)
 
         return jsonify({
             "message": "Book uploaded successfully",
@@ -394,25 +408,16 @@ def upload_book_controller():
 
 
 def get_user_books_controller(user_id):
-    db = Session()
+    # paged (limit= or cursor=): no description unless asked for with fields=...,description
     try:
-        books = db.query(Books).filter(Books.user_id == user_id).all()
-
-        result = [
-            {
-                "book_id": b.book_id,
-                "title": b.title,
-                "author": b.author,
-                "cover_image_url": b.cover_image_url,
-                "main_category": b.main_category,
-                "sub_category": b.sub_category,
-                "description": b.description,
-                "created_at": b.created_at.isoformat() if b.created_at else None
-            }
-            for b in books
-        ]
+        args = parse_list_args(request.args, USER_BOOK_FIELDS, USER_BOOK_ALL_FIELDS)
+    except ListArgsError as e:
+        return jsonify({"error": str(e)}), 400
 
-        return jsonify(result), 200
+    db = Session()
+    try:
+        items, next_cursor = list_books(db, (Books.user_id == user_id,), **args)
+        return list_response(items, next_cursor)
 
 
 
@@ -438,6 +443,8 @@ def update_book_controller(book_id):
 
         book.description = new_description
         db.commit()
+        bump_catalog_version()
+        index_book(book_id)
         return jsonify({"message": "Book updated successfully"}), 200
 
     except Exception as e:
@@ -456,8 +463,12 @@ def delete_book_controller(book_id):
         if not book:
             return jsonify({"error": "Book not found"}), 404
 
+        author = book.author
         db.delete(book)
         db.commit()
+        bump_catalog_version()
+        unindex_book(book_id)
+        forget_book(book_id, author)
         return jsonify({"message": "Book deleted successfully"}), 200
 
     except Exception as e:
@@ -501,30 +512,16 @@ def get_user_books():
     if not user_id:
         return jsonify({"error": "user_id is required"}), 400
 
+    try:
+        args = parse_list_args(request.args, MY_BOOK_FIELDS, MY_BOOK_ALL_FIELDS)
+    except ListArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
     db = Session()
     try:
         # Only fetch books that belong to this user
-        books = (
-            db.query(Books)
-            .filter(Books.user_id == user_id)
-            .all()
-        )
-
-        book_list = [
-            {
-                "book_id": b.book_id,
-                "title": b.title,
-                "author": b.author,
-                "description": b.description,
-                "user_id": b.user_id,
-                "main_category": b.main_category,
-                "sub_category": b.sub_category,
-                "created_at": b.created_at.isoformat() if b.created_at else None,
-            }
-            for b in books
-        ]
-
-        return jsonify({"books": book_list}), 200
+        items, next_cursor = list_books(db, (Books.user_id == user_id,), **args)
+        return list_response(items, next_cursor, key="books")
 
     except Exception as e:
         print("Get User Books Error:", e)
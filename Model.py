@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Index, inspect, text
 from datetime import datetime
 from Config import Base, engine
 
@@ -43,6 +43,14 @@ class Books(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     description = Column(Text)  #
 
+    # keyset pagination: each list endpoint's filter + sort key is one index range
+    # (create_all only adds these to new tables; upgrade_schema adds them to existing ones)
+    __table_args__ = (
+        Index("ix_books_user_id", "user_id", "book_id"),
+        Index("ix_books_category", "main_category", "sub_category", "book_id"),
+        Index("ix_books_created_at", "created_at", "book_id"),
+    )
+
 # -------------------- Summaries --------------------
 class Summaries(Base):
     __tablename__ = "Summaries"
@@ -52,6 +60,20 @@ class Summaries(Base):
     summary_type = Column(String(10), nullable=False)  # 1min, 10min, 30min
     content = Column(Text, nullable=False)
     audio_url = Column(String(500))
+    lookup_key = Column(String(64), index=True)  # sha256 of normalized title|author|duration
+    title = Column(String(255))
+    author = Column(String(255))
+    model = Column(String(50))
+    prompt_version = Column(String(20))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# -------------------- Summary Chunks (map-reduce partials) --------------------
+class SummaryChunks(Base):
+    __tablename__ = "SummaryChunks"
+
+    chunk_hash = Column(String(64), primary_key=True)  # sha256 of model|prompt version|words|chunk text
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 # -------------------- Audio Uploads --------------------
 class AudioUploads(Base):
@@ -93,6 +115,24 @@ class Notifications(Base):
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# -------------------- Jobs (background queue) --------------------
+class Jobs(Base):
+    __tablename__ = "Jobs"
+
+    job_id = Column(String(36), primary_key=True)  # uuid string
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, done, failed
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    stage = Column(String(50))
+    payload = Column(Text)  # JSON
+    result = Column(Text)   # JSON
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(100))
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class PendingUsers(Base):
     __tablename__ = "PendingUsers"
     id = Column(String(36), primary_key=True)  # uuid string
@@ -106,3 +146,48 @@ class PendingUsers(Base):
 
 # -------------------- Create all tables --------------------
 Base.metadata.create_all(bind=engine)
+
+
+# -------------------- Schema upgrades --------------------
+# create_all never alters a table that already exists: columns added to existing tables are listed
+# here and added on startup. Every step is idempotent (and safe when several workers start at once).
+ADDED_COLUMNS = {
+    "Summaries": ("lookup_key", "title", "author", "model", "prompt_version", "created_at"),
+}
+INDEXED_TABLES = ("Books", "Summaries")
+
+
+def _missing_columns(bind) -> dict:
+    insp = inspect(bind)
+    missing = {}
+    for table_name, names in ADDED_COLUMNS.items():
+        existing = {c["name"] for c in insp.get_columns(table_name)}
+        missing[table_name] = [n for n in names if n not in existing]
+    return {t: names for t, names in missing.items() if names}
+
+
+def upgrade_schema(bind):
+    """Add missing columns and indexes; raise if the schema still doesn't match the models."""
+    quote = bind.dialect.identifier_preparer.quote
+    for table_name, names in _missing_columns(bind).items():
+        table = Base.metadata.tables[table_name]
+        for name in names:
+            ddl_type = table.c[name].type.compile(dialect=bind.dialect)
+            try:
+                with bind.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(name)} {ddl_type}"))
+            except Exception as e:
+                print("Schema upgrade failed:", table_name, name, e)  # another worker may have added it
+    for table_name in INDEXED_TABLES:
+        for index in Base.metadata.tables[table_name].indexes:
+            try:
+                index.create(bind, checkfirst=True)
+            except Exception as e:
+                print("Index creation failed:", index.name, e)
+
+    missing = _missing_columns(bind)
+    if missing:
+        raise RuntimeError(f"Database schema is out of date, missing columns: {missing}")
+
+
+upgrade_schema(engine)
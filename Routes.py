@@ -1,22 +1,15 @@
 # ----------------------------------   1. Imports    -----------------------------
-import os, re, math
-from hashlib import sha256
+import os, re, json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
-from flask import Flask, Blueprint, request, jsonify, send_from_directory, url_for
+from flask import Flask, Blueprint, request, jsonify, send_file, send_from_directory, url_for, redirect, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from openai import OpenAI
 from dotenv import load_dotenv
-from gtts import gTTS
 from  Model import  Library
 
-import pdfplumber
-import docx
-from pptx import Presentation
-from openpyxl import load_workbook
-from ebooklib import epub, ITEM_DOCUMENT
-from sqlalchemy import text
 
 from extensions import mail
 from Config import (
@@ -25,6 +18,30 @@ from Config import (
 )
 from Config import UPLOADFOLDER
 from Model import Books
+from summary_services import (
+    WORDS_MAP, SUMMARY_MODEL, build_summary_prompt, build_own_summary_prompt,
+    get_stored_summary, store_summary, summary_lookup_key
+)
+from summarizer import condense_text, approx_tokens, SINGLE_PASS_TOKENS
+from coalesce import single_flight, make_key, key_lock, LockTimeout, coalesce_stats
+from jobs import register_job, enqueue_job, get_job, start_workers
+from tts_services import synthesize_tts_to_file, stream_tts
+from audio_store import AUDIO_DIR, resolve_name, store_stats, lookup_blob, digest_from_relpath
+from extractors import EXTRACTORS
+from extract_pool import (
+    isolated_preview, isolated_document, isolated_units, pool_stats, ExtractionError, PoolBusyError, EXTRACT_POOL_WORKERS
+)
+from resumable_uploads import (
+    create_upload, get_upload, append_chunk, finalize_upload, abort_upload, parse_content_range, UploadError,
+    RESUMABLE_MAX_BYTES
+)
+from catalog import parse_list_args, list_books, list_response, ListArgsError, catalog_metadata, \
+    conditional_response, bump_catalog_version
+from shelves import get_shelf, shelves_stats
+from search import search_books, index_book, SearchQueryError
+from autocomplete import suggest, autocomplete_stats, AUTOCOMPLETE_DEFAULT_LIMIT, AUTOCOMPLETE_MAX_LIMIT
+from url_ingest import download_document, attach_text_to_book, IngestError
+from extract_cache import save_upload_hashed, cache_key, cache_get, cache_put, cache_stats, save_text, touch_text
 from Controller import (
     signup_controller, verify_otp_controller, signin_controller, token_required, me_controller,
     forgot_password_controller, reset_password_controller, change_password_controller, _send_reset_email,
@@ -43,10 +60,6 @@ HF_MODEL = "tiiuae/falcon-7b-instruct"  # free instruct model
 
 app.config['UPLOAD_FOLDER'] = UPLOADFOLDER
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-AUDIO_DIR = os.path.join(BASE_DIR, "static", "audio")
-os.makedirs(AUDIO_DIR, exist_ok=True)
-
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
@@ -62,6 +75,14 @@ def uploaded_file(filename):
 
 
 ALLOWED_EXTENSIONS = {"pdf", "docx", "txt", "pptx", "xlsx", "epub"}
+COVER_EXTENSIONS = {"jpg", "jpeg", "png", "webp"}  # resumable uploads: stored, not extracted
+
+PREVIEW_CHARS = 5000
+MAX_PREVIEW_CHARS = 50000
+CATEGORY_LIST_FIELDS = ("book_id", "title", "author", "cover_image_url", "main_category", "sub_category")
+EXTRACT_BATCH_MAX_FILES = int(os.getenv("EXTRACT_BATCH_MAX_FILES", 20))
+EXTRACTED_DIR = os.path.abspath(os.path.join(UPLOAD_FOLDER, "extracted"))  # full texts from /extract-text?mode=full
+os.makedirs(EXTRACTED_DIR, exist_ok=True)
 
 app.config.update(
     MAIL_SERVER=MAIL_SERVER,
@@ -75,80 +96,85 @@ mail.init_app(app)
 
 
 # ------------------ 3. Helper functions ------------------
-def _slug(s: str) -> str:
-    s = (s or "").lower()
-    s = re.sub(r"[^a-z0-9]+", "-", s).strip("-")
-    return s or "audio"
+def _chat_completion(messages: list, max_tokens: int, model: str = SUMMARY_MODEL) -> str:
+    """One chat completion; identical concurrent prompts share a single in-flight call."""
+    def call():
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content or ""
 
-def _approx_seconds_from_text(txt: str, wpm: int = 150) -> int:
-    words = max(1, len((txt or "").split()))
-    return math.ceil(words / wpm * 60)
+    return single_flight(make_key(model, messages, max_tokens), call)
 
-def synthesize_tts_to_file(text: str, title: str, author: str, duration_key: str, lang: str = "en") -> dict:
-    digest = sha256((text or "").encode("utf-8")).hexdigest()[:12]
-    fname  = f"{_slug(title)}-{_slug(author)}-{duration_key}-{digest}.mp3"
-    fpath  = os.path.join(AUDIO_DIR, fname)
+def _complete_summary(prompt: str, max_tokens: int) -> str:
+    return _chat_completion([
+        {"role": "system", "content": "You are a book summarizer bot."},
+        {"role": "user", "content": prompt}
+    ], max_tokens)
 
-    if not os.path.exists(fpath):
-        tts = gTTS(text=text, lang=lang)
-        tts.save(fpath)
+def _get_book(book_id):
+    db = Session()
+    try:
+        return db.query(Books).filter(Books.book_id == book_id).first()
+    finally:
+        db.close()
 
-    return {
-        "filename": fname,
-        "path": fpath,
-        "seconds": _approx_seconds_from_text(text)
-    }
+def _wants_stream() -> bool:
+    if request.args.get("stream") in ("1", "true"):
+        return True
+    return "text/event-stream" in (request.headers.get("Accept") or "")
+
+def _sse(data: dict, event: str = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+def _sse_response(events) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _stream_summary_events(messages: list, max_tokens: int, meta: dict, on_complete=None):
+    """Forward completion tokens as SSE "data" events, then one "done" event with word count + meta."""
+    parts = []
+    try:
+        stream = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield _sse({"delta": delta})
+
+        summary_text = "".join(parts).strip()
+        if not summary_text:
+            yield _sse({"error": "Failed to generate summary"}, event="error")
+            return
+
+        extra = on_complete(summary_text) if on_complete else None
+        yield _sse({**meta, **(extra or {}), "word_count": len(summary_text.split()), "cached": False}, event="done")
+
+    except Exception as e:
+        print("Error in summary stream:", e)
+        yield _sse({"error": f"Server error: {str(e)}"}, event="error")
+
+def _cached_summary_events(stored: dict, meta: dict):
+    yield _sse({"delta": stored["summary"]})
+    yield _sse({**meta, "summary_id": stored["summary_id"],
+                "word_count": len(stored["summary"].split()), "cached": True}, event="done")
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(filepath):
-    text = ""
-    with pdfplumber.open(filepath) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-    return text.strip()
-
-def extract_text_from_docx(filepath):
-    doc = docx.Document(filepath)
-    return "\n".join([p.text for p in doc.paragraphs])
-
-def extract_text_from_txt(filepath):
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
-
-def extract_text_from_pptx(filepath):
-    prs = Presentation(filepath)
-    text = []
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text.append(shape.text)
-    return "\n".join(text)
-
-def extract_text_from_xlsx(filepath):
-    wb = load_workbook(filepath, data_only=True)
-    text = []
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        for row in ws.iter_rows(values_only=True):
-            row_text = " ".join([str(cell) for cell in row if cell])
-            if row_text.strip():
-                text.append(row_text)
-    return "\n".join(text)
-
-def extract_text_from_epub(filepath):
-    book = epub.read_epub(filepath)
-    text = []
-    for item in book.get_items():
-        if item.get_type() == ITEM_DOCUMENT:
-            try:
-                content = item.get_content().decode("utf-8")
-                text.append(content)
-            except:
-                pass
-    return "\n".join(text)
-
 
 # ------------------ 4. Core Routes ------------------
 
@@ -191,50 +217,85 @@ def generate_summary():
         title = data.get("title")
         author = data.get("author")
         duration = data.get("duration")
+        book_id = data.get("book_id")
+        regenerate = bool(data.get("regenerate"))
+
+        if book_id and (not title or not author):
+            book = _get_book(book_id)
+            if not book:
+                return jsonify({"error": "Book not found"}), 404
+            title = title or book.title
+            author = author or book.author
 
         if not title or not author or not duration:
             return jsonify({"error": "Missing required fields"}), 400
 
-        words_map = {
-            "1min": 150,
-            "10min": 1500,
-            "30min": 4500
-        }
-        words = words_map.get(duration)
+        words = WORDS_MAP.get(duration)
         if not words:
             return jsonify({"error": "Invalid duration"}), 400
 
-        # GPT summary only
-        prompt = f"""
-        You are a specialized AI assistant acting as a Book Summarizer Bot.
-        Your role is that of a "Book Keeper" who has read and learned from a wide range of real books.
-        Your task is to produce faithful summaries of books based strictly on their actual content.
-
-        ### Rules & Instructions:
-        BOOK NAME = {title}
-        AUTHOR = {author}
-        WORDS = {words}
-        """
+        meta = {"title": title, "author": author, "duration": duration, "target_words": words}
+
+        # Serve from the summary store unless the client asked for a fresh one
+        if not regenerate:
+            stored = get_stored_summary(title, author, duration, book_id=book_id)
+            if stored and _wants_stream():
+                return _sse_response(_cached_summary_events(stored, meta))
+            if stored:
+                return jsonify({
+                    "title": title,
+                    "author": author,
+                    "duration": duration,
+                    "target_words": words,
+                    "summary": stored["summary"],
+                    "summary_id": stored["summary_id"],
+                    "cached": True
+                }), 200
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a book summarizer bot."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=words + 200
-        )
+        # GPT summary only
+        prompt = build_summary_prompt(title, author, words)
+        messages = [
+            {"role": "system", "content": "You are a book summarizer bot."},
+            {"role": "user", "content": prompt}
+        ]
 
-        summary_text = response.choices[0].message.content.strip()
+        if _wants_stream():
+            def on_complete(summary_text):
+                stored = store_summary(title, author, duration, summary_text, book_id=book_id)
+                return {"summary_id": stored["summary_id"] if stored else None}
+
+            def events():
+                # Identical concurrent streams share one key: the first calls the model and stores the
+                # summary, the rest wait for it and replay the stored copy instead of calling again.
+                lock_key = make_key("summary-stream", summary_lookup_key(title, author, duration), book_id)
+                try:
+                    with key_lock("llm", lock_key):
+                        stored = None if regenerate else get_stored_summary(title, author, duration, book_id=book_id)
+                        if stored:
+                            yield from _cached_summary_events(stored, meta)
+                        else:
+                            yield from _stream_summary_events(messages, words + 200, meta, on_complete)
+                        return
+                except LockTimeout:
+                    print("Summary stream lock timed out, streaming uncoalesced:", lock_key[:12])
+                yield from _stream_summary_events(messages, words + 200, meta, on_complete)
+
+            return _sse_response(events())
+
+        summary_text = _chat_completion(messages, words + 200).strip()
         if not summary_text:
             return jsonify({"error": "Failed to generate summary"}), 500
 
+        stored = store_summary(title, author, duration, summary_text, book_id=book_id)
+
         return jsonify({
             "title": title,
             "author": author,
             "duration": duration,
             "target_words": words,
-            "summary": summary_text
+            "summary": summary_text,
+            "summary_id": stored["summary_id"] if stored else None,
+            "cached": False
         }), 200
 
     except Exception as e:
@@ -253,48 +314,47 @@ def generate_own_summary():
         if not description or not duration:
             return jsonify({"error": "Missing required fields"}), 400
 
-        words_map = {
-            "1min": 150,
-            "10min": 1500,
-            "30min": 4500
-        }
-        words = words_map.get(duration)
+        words = WORDS_MAP.get(duration)
         if not words:
             return jsonify({"error": "Invalid duration"}), 400
 
-        # GPT prompt for user’s own description
-        prompt = f"""
-        You are a specialized AI assistant acting as a Book Summarizer Bot.
-        You are given a book description written by the user.
-        Based strictly on this description, generate a clear and useful summary.
+        def own_summary_messages(text):
+            # GPT prompt for user’s own description
+            prompt = build_own_summary_prompt(text, duration, words)
+            return [
+                {"role": "system", "content": "You are a book summarizer bot."},
+                {"role": "user", "content": prompt}
+            ]
+
+        # Full books (e.g. after /append-pdf-to-book) are map-reduced down to one prompt first
+        needs_condense = approx_tokens(description) > SINGLE_PASS_TOKENS
+        stats = {}
 
-        ### Rules:
-        - Do NOT add any external content not hinted at in the description.
-        - Expand and compress the summary according to the requested time length.
-        - Duration: {duration} (target ~{words} words).
-        - The style should be engaging, clear, and faithful to the original description.
+        if _wants_stream():
+            meta = {"duration": duration, "target_words": words}
 
-        --- Book Description ---
-        {description}
-        """
+            def events():
+                text = description
+                if needs_condense:
+                    yield _sse({"stage": "condensing"}, event="progress")
+                    text = condense_text(description, _complete_summary, stats=stats)
+                    meta["map_reduce"] = stats
+                yield from _stream_summary_events(own_summary_messages(text), words + 200, meta)
+            return _sse_response(events())
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a book summarizer bot."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=words + 200
-        )
+        if needs_condense:
+            description = condense_text(description, _complete_summary, stats=stats)
+        messages = own_summary_messages(description)
 
-        summary_text = response.choices[0].message.content.strip()
+        summary_text = _chat_completion(messages, words + 200).strip()
         if not summary_text:
             return jsonify({"error": "Failed to generate summary"}), 500
 
         return jsonify({
             "duration": duration,
             "target_words": words,
-            "summary": summary_text
+            "summary": summary_text,
+            "map_reduce": stats or None
         }), 200
 
     except Exception as e:
@@ -320,6 +380,7 @@ def generate_tts():
         return jsonify({
             "audio_url": audio_url,
             "approx_audio_seconds": tts_info["seconds"],
+            "cache": tts_info["cache"],
         }), 200
 
     except Exception as e:
@@ -327,10 +388,50 @@ def generate_tts():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
 
+@app.route('/generate-tts/stream', methods=['POST'])
+def generate_tts_stream():
+    """Progressive audio/mpeg (chunked transfer) so playback can start after the first sentences."""
+    data = request.get_json() or {}
+    text = data.get("text")
+    lang = data.get("lang", "en")
+
+    if not text:
+        return jsonify({"error": "Missing text for TTS"}), 400
+
+    return Response(
+        stream_with_context(stream_tts(text, lang)),
+        mimetype="audio/mpeg",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/audio/<path:filename>")
 def serve_audio(filename):
+    # content-addressed blobs never change, so clients/CDNs may cache them forever
+    if filename.startswith("blobs/"):
+        digest = digest_from_relpath(filename)
+        path = lookup_blob(digest) if digest else None
+        try:
+            if path is None:
+                raise FileNotFoundError(filename)
+            resp = send_file(path, mimetype="audio/mpeg", as_attachment=False, etag=digest)
+        except FileNotFoundError:
+            # evicted (or never stored): clients regenerate it through /generate-tts
+            return jsonify({"error": "Audio not found"}), 404
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return resp
+
+    # logical (title-based) names resolve to their blob
+    blob = resolve_name(filename)
+    if blob:
+        return redirect(url_for("serve_audio", filename=blob), code=302)
+
     return send_from_directory(AUDIO_DIR, filename, mimetype="audio/mpeg", as_attachment=False)
 
+@app.route("/audio-store/stats", methods=["GET"])
+def audio_store_stats():
+    return jsonify(store_stats()), 200
+
 @app.route("/ask-question", methods=["POST"])
 def ask_question():
     data = request.get_json() or {}
@@ -361,16 +462,10 @@ def ask_question():
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful book assistant who always provides detailed, multi-sentence answers."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500  # increased to allow longer answers
-        )
-
-        answer = response.choices[0].message.content.strip()
+        answer = _chat_completion([
+            {"role": "system", "content": "You are a helpful book assistant who always provides detailed, multi-sentence answers."},
+            {"role": "user", "content": prompt}
+        ], max_tokens=500).strip()  # increased to allow longer answers
         return jsonify({"answer": answer}), 200
 
     except Exception as e:
@@ -402,24 +497,16 @@ def ask_own_question():
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful book assistant who always provides detailed, multi-sentence answers."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500  # increased to allow longer answers
-        )
-
-        answer = response.choices[0].message.content.strip()
+        answer = _chat_completion([
+            {"role": "system", "content": "You are a helpful book assistant who always provides detailed, multi-sentence answers."},
+            {"role": "user", "content": prompt}
+        ], max_tokens=500).strip()  # increased to allow longer answers
         return jsonify({"answer": answer}), 200
 
     except Exception as e:
         return jsonify({"error": f"Failed to get answer: {str(e)}"}), 500
 
 
-import json
-
 @app.route("/generate-mcqs", methods=["POST"])
 def generate_mcqs():
     data = request.get_json() or {}
@@ -457,16 +544,10 @@ def generate_mcqs():
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You generate quiz questions about books."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000
-        )
-
-        output = response.choices[0].message.content.strip()
+        output = _chat_completion([
+            {"role": "system", "content": "You generate quiz questions about books."},
+            {"role": "user", "content": prompt}
+        ], max_tokens=1000).strip()
 
         try:
             mcqs = json.loads(output)
@@ -483,44 +564,210 @@ def generate_mcqs():
 
 
 
+# ---- Background jobs ----
+@register_job("summary")
+def summary_job(payload: dict, progress) -> dict:
+    """LLM summary (catalog book or user description) followed by TTS; runs in the worker process."""
+    duration = payload["duration"]
+    words = WORDS_MAP[duration]
+    title = payload.get("title")
+    author = payload.get("author")
+    book_id = payload.get("book_id")
+    description = payload.get("description")
+
+    progress(5, "summarizing")
+    stored = None
+    if description:
+        if approx_tokens(description) > SINGLE_PASS_TOKENS:
+            description = condense_text(description, _complete_summary)
+            progress(40, "summarizing")
+        summary_text = _complete_summary(build_own_summary_prompt(description, duration, words), words + 200)
+    else:
+        if not payload.get("regenerate"):
+            stored = get_stored_summary(title, author, duration, book_id=book_id)
+        summary_text = stored["summary"] if stored else _complete_summary(
+            build_summary_prompt(title, author, words), words + 200)
+
+    summary_text = (summary_text or "").strip()
+    if not summary_text:
+        raise RuntimeError("Failed to generate summary")
+    progress(60, "summary_ready")
+
+    result = {
+        "duration": duration,
+        "target_words": words,
+        "summary": summary_text,
+        "word_count": len(summary_text.split()),
+        "cached": bool(stored)
+    }
+
+    audio_path = None
+    if payload.get("tts", True):
+        progress(65, "tts")
+        tts_info = synthesize_tts_to_file(summary_text, title or "book", author or "unknown", duration)
+        audio_path = f"/audio/{tts_info['filename']}"
+        result["audio_path"] = audio_path
+        result["approx_audio_seconds"] = tts_info["seconds"]
+
+    if not description:
+        saved = store_summary(title, author, duration, summary_text, book_id=book_id, audio_url=audio_path)
+        result["summary_id"] = saved["summary_id"] if saved else None
+    return result
+
+
+@app.route("/jobs/summary", methods=["POST"])
+def create_summary_job():
+    try:
+        data = request.get_json() or {}
+        title = data.get("title")
+        author = data.get("author")
+        duration = data.get("duration")
+        book_id = data.get("book_id")
+        description = data.get("description")
+
+        if book_id and not description and (not title or not author):
+            book = _get_book(book_id)
+            if not book:
+                return jsonify({"error": "Book not found"}), 404
+            title = title or book.title
+            author = author or book.author
+
+        if not duration or not (description or (title and author)):
+            return jsonify({"error": "Missing required fields"}), 400
+        if duration not in WORDS_MAP:
+            return jsonify({"error": "Invalid duration"}), 400
+
+        job_id = enqueue_job("summary", {
+            "title": title,
+            "author": author,
+            "duration": duration,
+            "book_id": book_id,
+            "description": description,
+            "regenerate": bool(data.get("regenerate")),
+            "tts": data.get("tts", True) is not False
+        })
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("job_status", job_id=job_id, _external=True)
+        }), 202
+
+    except Exception as e:
+        print("Error in /jobs/summary:", e)
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    result = job.get("result") or {}
+    if result.get("audio_path"):
+        result["audio_url"] = request.host_url.rstrip("/") + result["audio_path"]
+    _with_text_url(result)
+    return jsonify(job), 200
+
+
+# Dev convenience: run job workers inside the web process (production uses `python worker.py`)
+if int(os.getenv("JOBS_INLINE_WORKERS", 0)):
+    start_workers(int(os.getenv("JOBS_INLINE_WORKERS")))
+
+
+@app.route("/llm/coalesce-stats", methods=["GET"])
+def llm_coalesce_stats():
+    # counters are per gunicorn worker; "pid" tells them apart
+    return jsonify(coalesce_stats()), 200
+
+
 # ---- Books ----
 @app.route('/books/all')
 def all_books():
-    page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 20))
-    offset = (page - 1) * limit
-    session = Session()
-    books = session.execute(text(f"""
-        SELECT * 
-        FROM Books 
-        ORDER BY book_id 
-        OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY
-    """)).fetchall()
-    return jsonify([dict(row._mapping) for row in books])
+    """?limit= (max MAX_PAGE_LIMIT), ?cursor= from X-Next-Cursor, ?sort=book_id|created_at, ?fields=a,b,..."""
+    try:
+        args = parse_list_args(request.args)
+    except ListArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = Session()
+    try:
+        items, next_cursor = list_books(db, **args)
+        return list_response(items, next_cursor)
+    except Exception as e:
+        print("All Books Error:", e)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        db.close()
+
+def _shelf_response(name: str, label: str):
+    # random pick from a precomputed pool of ids (see shelves.py); rotation and filters live in SHELVES
+    try:
+        return jsonify(get_shelf(name))
+    except Exception as e:
+        print(f"{label} Books Error:", e)
+        return jsonify({"error": str(e)}), 500
+
 
 @app.route('/books/trending')
 def trending_books():
-    session = Session()
-    books = session.execute(text("""
-        SELECT TOP 20 * 
-        FROM Books 
-        WHERE main_category = 'Literature'
-        ORDER BY NEWID()
-    """)).fetchall()
-    return jsonify([dict(row._mapping) for row in books])
-
+    return _shelf_response("trending", "Trending")
 
 
 @app.route('/books/featured')
 def featured_books():
-    session = Session()
-    books = session.execute(text("""
-        SELECT TOP 20 * 
-        FROM Books 
-        WHERE main_category = 'History'
-        ORDER BY NEWID()
-    """)).fetchall()
-    return jsonify([dict(row._mapping) for row in books])
+    return _shelf_response("featured", "Featured")
+
+
+@app.route('/books/shelves/stats')
+def shelf_stats():
+    return jsonify(shelves_stats()), 200
+
+@app.route('/books/search')
+def search_books_route():
+    """?q= ranked over title, author, categories and description; ?limit=, ?page=, ?fields= as in /books/all."""
+    q = request.args.get("q") or ""  # unstripped: a trailing space tells search_books the last word is complete
+    if not q.strip():
+        return jsonify({"error": "q is required"}), 400
+    try:
+        args = parse_list_args(request.args)
+    except ListArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
+    page = args["page"] or 1
+    try:
+        items = search_books(q, args["fields"], args["limit"] + 1, (page - 1) * args["limit"])
+    except SearchQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print("Search Books Error:", e)
+        return jsonify({"error": str(e)}), 500
+    more = len(items) > args["limit"]
+    return jsonify({"query": q, "results": items[:args["limit"]], "page": page,
+                    "next_page": page + 1 if more else None}), 200
+
+
+@app.route('/books/autocomplete')
+def autocomplete_books():
+    """?q= typed so far, ?limit= (max AUTOCOMPLETE_MAX_LIMIT). Served from memory; no query per keystroke."""
+    q = request.args.get("q") or ""
+    try:
+        limit = max(1, min(int(request.args.get("limit", AUTOCOMPLETE_DEFAULT_LIMIT)), AUTOCOMPLETE_MAX_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        suggestions = suggest(q, limit)
+    except Exception as e:
+        print("Autocomplete Error:", e)
+        return jsonify({"error": str(e)}), 500
+    # identical prefixes from many clients: let proxies answer for a short while
+    return jsonify({"query": q, "suggestions": suggestions}), 200, {"Cache-Control": "public, max-age=60"}
+
+
+@app.route('/books/autocomplete/stats')
+def autocomplete_stats_route():
+    return jsonify(autocomplete_stats()), 200
+
 
 @app.route("/books/by-category")
 def books_by_category():
@@ -530,31 +777,16 @@ def books_by_category():
     if not main_category or not sub_category:
         return jsonify({"error": "Missing category parameters"}), 400
 
+    try:
+        args = parse_list_args(request.args, CATEGORY_LIST_FIELDS, CATEGORY_LIST_FIELDS)
+    except ListArgsError as e:
+        return jsonify({"error": str(e)}), 400
+
     db = Session()
     try:
-        stmt = text("""
-            SELECT * 
-            FROM Books
-            WHERE main_category = :main_category
-              AND sub_category = :sub_category
-        """)
-        rows = db.execute(stmt, {
-            "main_category": main_category,
-            "sub_category": sub_category
-        }).fetchall()
-
-        books = [
-            {
-                "book_id": r.book_id,
-                "title": r.title,
-                "author": r.author,
-                "cover_image_url": r.cover_image_url,
-                "main_category": r.main_category,
-                "sub_category": r.sub_category
-            }
-            for r in rows
-        ]
-        return jsonify(books)
+        where = (Books.main_category == main_category, Books.sub_category == sub_category)
+        items, next_cursor = list_books(db, where, **args)
+        return list_response(items, next_cursor)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -562,26 +794,15 @@ def books_by_category():
 
 @app.route("/books/categories")
 def books_categories():
-    db = Session()
+    """{main_category: [sub_categories]}; ?counts=1 gives book counts per category instead. Supports If-None-Match."""
     try:
-        stmt = text("SELECT DISTINCT main_category, sub_category FROM Books")
-        rows = db.execute(stmt).fetchall()
-
-        categories = {}
-        for r in rows:
-            main_cat = r.main_category
-            sub_cat = r.sub_category
-            if main_cat not in categories:
-                categories[main_cat] = []
-            if sub_cat and sub_cat not in categories[main_cat]:
-                categories[main_cat].append(sub_cat)
-        return jsonify(categories)
+        meta = catalog_metadata(Session)
+        key = "counts" if request.args.get("counts") in ("1", "true") else "tree"
+        return conditional_response(meta[key], meta["etags"][key])
     except Exception as e:
         print("Books Categories Error:", e)
         # ✅ return empty dict so frontend won’t get "error"
         return jsonify({}), 200
-    finally:
-        db.close()
 
 
 @app.route('/upload-book', methods=['POST'])
@@ -617,32 +838,341 @@ def extract_text():
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
-
         ext = filename.rsplit(".", 1)[1].lower()
-        text = ""
-
-        if ext == "pdf":
-            text = extract_text_from_pdf(filepath)
-        elif ext == "docx":
-            text = extract_text_from_docx(filepath)
-        elif ext == "txt":
-            text = extract_text_from_txt(filepath)
-        elif ext == "pptx":
-            text = extract_text_from_pptx(filepath)
-        elif ext == "xlsx":
-            text = extract_text_from_xlsx(filepath)
-        elif ext == "epub":
-            text = extract_text_from_epub(filepath)
-        else:
+        if ext not in EXTRACTORS:
             return jsonify({"error": f"Unsupported file format: {ext}"}), 400
 
-        return jsonify({"filename": filename, "text": text[:5000]})
+        # stored as <sha256>.<ext>, hashed while it is written out
+        digest, filepath = save_upload_hashed(file, app.config["UPLOAD_FOLDER"], ext)
+
+        # NDJSON: one {"unit": n, "text": ...} line per page/slide/row block/chapter as it is extracted
+        if request.args.get("stream") in ("1", "true") or "application/x-ndjson" in (request.headers.get("Accept") or ""):
+            def records():
+                units = 0
+                try:
+                    for units, unit_text in isolated_units(filepath, ext):
+                        yield json.dumps({"unit": units, "text": unit_text}) + "\n"
+                    yield json.dumps({"done": True, "filename": filename, "units": units}) + "\n"
+                except ExtractionError as e:
+                    yield json.dumps({"error": str(e), "status": e.status, "units": units}) + "\n"
+                except Exception as e:
+                    print("Error in /extract-text stream:", e)
+                    yield json.dumps({"error": str(e), "units": units}) + "\n"
+            return Response(stream_with_context(records()), mimetype="application/x-ndjson",
+                            headers={"X-Accel-Buffering": "no"})
+
+        mode, max_chars, max_units = _extract_options()
+        try:
+            result = _extract_result(filepath, ext, digest, mode, max_chars, max_units)
+        except ExtractionError as e:
+            # parsing ran in a pool worker: a bad file costs that worker, not this process
+            return jsonify({"error": str(e), "limit": getattr(e, "limit", None)}), e.status
+        except PoolBusyError as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+        return jsonify(_with_text_url({"filename": filename, **result}))
 
     return jsonify({"error": "File type not allowed"}), 400
 
 
+def _extract_options():
+    """(mode, max_chars, max_units) from the query string / form."""
+    mode = request.args.get("mode") or request.form.get("mode") or "preview"
+    max_chars = max(1, min(request.args.get("max_chars", PREVIEW_CHARS, type=int), MAX_PREVIEW_CHARS))
+    max_units = request.args.get("max_pages", type=int)
+    if max_units is not None:
+        max_units = max(1, max_units)
+    return mode, max_chars, max_units
+
+
+def _with_text_url(result: dict) -> dict:
+    if result.get("text_id"):
+        result["text_url"] = url_for("get_extracted_text", text_id=result["text_id"], _external=True)
+    return result
+
+
+def _extract_result(filepath: str, ext: str, digest: str, mode: str, max_chars: int, max_units: int = None) -> dict:
+    """Preview or full-mode result for a saved upload: cache first, then the extraction pool. Needs no request context."""
+    # full: extract everything, keep it server-side, return a preview plus an id to fetch the rest
+    # the same bytes always give the same text: results are cached by (content hash, extractor version)
+    if mode == "full":
+        key = cache_key(digest, ext, "full")
+        text_id = digest
+        text_path = os.path.join(EXTRACTED_DIR, f"{text_id}.txt")
+        result = cache_get(key)
+        cached = result is not None and touch_text(text_path)
+        if not cached:
+            doc = isolated_document(filepath, ext)
+            text = doc["text"]
+            save_text(text_path, text)  # texts unread for EXTRACTED_MAX_AGE_SECONDS (or over budget) are pruned
+            result = {"text": text[:PREVIEW_CHARS], "truncated": len(text) > PREVIEW_CHARS,
+                      "units_read": doc["units_read"], "chars": len(text)}
+            cache_put(key, result)
+        return {"mode": "full", **result, "text_id": text_id, "cached": cached}
+
+    # preview: stop parsing as soon as the response limit (or page budget) is reached
+    key = cache_key(digest, ext, f"preview-{max_chars}-{max_units or 0}")
+    preview = cache_get(key)
+    cached = preview is not None
+    if not cached:
+        preview = isolated_preview(filepath, ext, max_chars=max_chars, max_units=max_units)
+        cache_put(key, preview)
+    return {
+        "mode": "preview",
+        "text": preview["text"],
+        "truncated": preview["truncated"],
+        "units_read": preview["units_read"],
+        "cached": cached
+    }
+
+
+@app.route("/extract-text/batch", methods=["POST"])
+def extract_text_batch():
+    """
+    Many files in one multipart request (field "files", repeated). Files are extracted concurrently on the
+    extraction pool; each gets its own result or error, so one bad file doesn't fail the batch.
+    With ?stream=1 (or Accept: application/x-ndjson) results are sent as NDJSON lines as they finish.
+    """
+    files = [f for f in request.files.getlist("files") + request.files.getlist("file") if f and f.filename]
+    if not files:
+        return jsonify({"error": "No files uploaded"}), 400
+    if len(files) > EXTRACT_BATCH_MAX_FILES:
+        return jsonify({"error": f"At most {EXTRACT_BATCH_MAX_FILES} files per batch"}), 413
+
+    mode, max_chars, max_units = _extract_options()
+
+    # uploads are saved (and hashed) up front: the request body is gone once we start streaming
+    jobs, results = [], []
+    for index, file in enumerate(files):
+        filename = secure_filename(file.filename)
+        ext = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+        if not allowed_file(filename) or ext not in EXTRACTORS:
+            results.append({"index": index, "filename": filename, "error": "File type not allowed", "status": 400})
+            continue
+        # content-addressed, so parts (or concurrent requests) with the same filename never collide
+        digest, filepath = save_upload_hashed(file, app.config["UPLOAD_FOLDER"], ext)
+        jobs.append((index, filename, filepath, ext, digest))
+
+    def run(job):
+        index, filename, filepath, ext, digest = job
+        try:
+            result = _extract_result(filepath, ext, digest, mode, max_chars, max_units)
+            return {"index": index, "filename": filename, "status": 200, **result}
+        except ExtractionError as e:
+            return {"index": index, "filename": filename, "error": str(e), "status": e.status,
+                    "limit": getattr(e, "limit", None)}
+        except PoolBusyError as e:
+            return {"index": index, "filename": filename, "error": str(e), "status": 503}
+        except Exception as e:
+            print("Batch extraction Error:", e)
+            return {"index": index, "filename": filename, "error": str(e), "status": 500}
+
+    def completed():
+        yield from results
+        if not jobs:
+            return
+        # more threads than pool workers would only queue inside the pool
+        with ThreadPoolExecutor(max_workers=min(len(jobs), EXTRACT_POOL_WORKERS)) as ex:
+            for fut in as_completed([ex.submit(run, job) for job in jobs]):
+                yield fut.result()
+
+    if request.args.get("stream") in ("1", "true") or "application/x-ndjson" in (request.headers.get("Accept") or ""):
+        def records():
+            ok = 0
+            for item in completed():
+                ok += item["status"] == 200
+                yield json.dumps(_with_text_url(item)) + "\n"
+            yield json.dumps({"done": True, "files": len(files), "succeeded": ok, "failed": len(files) - ok}) + "\n"
+        return Response(stream_with_context(records()), mimetype="application/x-ndjson",
+                        headers={"X-Accel-Buffering": "no"})
+
+    items = sorted((_with_text_url(item) for item in completed()), key=lambda item: item["index"])
+    ok = sum(1 for item in items if item["status"] == 200)
+    return jsonify({"files": len(files), "succeeded": ok, "failed": len(files) - ok, "results": items})
+
+
+# ---- Resumable uploads ----
+# POST /resumable-uploads {"filename", "size"} -> upload_url; PUT byte ranges to it (Content-Range: bytes a-b/total);
+# GET/HEAD it for the current offset after a failure; POST <upload_url>/finalize to extract the file.
+def _upload_error(e: UploadError):
+    body, headers = {"error": str(e)}, {}
+    if e.offset is not None:
+        body["offset"] = e.offset
+        headers["Upload-Offset"] = str(e.offset)
+    return jsonify(body), e.status, headers
+
+
+def _upload_state(meta: dict) -> dict:
+    return {
+        "upload_id": meta["upload_id"],
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "offset": meta["offset"],
+        "complete": meta["size"] is not None and meta["offset"] == meta["size"],
+        "upload_url": url_for("resumable_upload", upload_id=meta["upload_id"], _external=True),
+    }
+
+
+@app.route("/resumable-uploads", methods=["POST"])
+def create_resumable_upload():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get("filename") or "")
+    ext = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+    if not filename or not (allowed_file(filename) or ext in COVER_EXTENSIONS):
+        return jsonify({"error": "File type not allowed"}), 400
+    size = data.get("size")
+    if size is not None and (not isinstance(size, int) or size < 0):
+        return jsonify({"error": "size must be a non-negative integer"}), 400
+
+    try:
+        meta = create_upload(filename, size)
+    except UploadError as e:
+        return _upload_error(e)
+    state = _upload_state(meta)
+    return jsonify({**state, "max_bytes": RESUMABLE_MAX_BYTES}), 201, {"Location": state["upload_url"]}
+
+
+@app.route("/resumable-uploads/<upload_id>", methods=["GET", "HEAD", "PUT", "DELETE"])
+def resumable_upload(upload_id):
+    try:
+        if request.method == "DELETE":
+            abort_upload(upload_id)
+            return jsonify({"message": "Upload aborted"}), 200
+
+        if request.method == "PUT":
+            length = request.content_length
+            if length is None:
+                return jsonify({"error": "Content-Length required"}), 411
+            rng = parse_content_range(request.headers.get("Content-Range"))
+            if rng:
+                start, end, total = rng
+                if end - start + 1 != length:
+                    return jsonify({"error": "Content-Range does not match Content-Length"}), 400
+            elif request.headers.get("Upload-Offset", "").isdigit():
+                start, total = int(request.headers["Upload-Offset"]), None
+            else:
+                return jsonify({"error": "Content-Range or Upload-Offset header required"}), 400
+            meta = append_chunk(upload_id, start, request.stream, length, total)
+        else:
+            meta = get_upload(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+
+    state = _upload_state(meta)
+    headers = {"Upload-Offset": str(state["offset"]), "Cache-Control": "no-store"}
+    if state["size"] is not None:
+        headers["Upload-Length"] = str(state["size"])
+    return jsonify(state), 200, headers
+
+
+@app.route("/resumable-uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_resumable_upload(upload_id):
+    """
+    Completes the upload into uploads/<sha256>.<ext> and extracts it like /extract-text (same options).
+    Cover images (the resumable counterpart of /upload-book-cover) and ?extract=0 only store the file.
+    """
+    try:
+        meta = get_upload(upload_id)
+        filename = meta["filename"]
+        upload = finalize_upload(upload_id, app.config["UPLOAD_FOLDER"])
+    except UploadError as e:
+        return _upload_error(e)
+
+    stored = {
+        "filename": filename,
+        "size": upload["size"],
+        "sha256": upload["sha256"],
+        "file_url": url_for("uploaded_file", filename=os.path.basename(upload["path"]), _external=True)
+    }
+    ext = filename.rsplit(".", 1)[1].lower()
+    if request.args.get("extract") in ("0", "false") or ext in COVER_EXTENSIONS:
+        return jsonify(stored)
+
+    mode, max_chars, max_units = _extract_options()
+    try:
+        result = _extract_result(upload["path"], ext, upload["sha256"], mode, max_chars, max_units)
+    except ExtractionError as e:
+        return jsonify({**stored, "error": str(e), "limit": getattr(e, "limit", None)}), e.status
+    except PoolBusyError as e:
+        return jsonify({**stored, "error": str(e)}), 503, {"Retry-After": "5"}
+    return jsonify(_with_text_url({**stored, **result}))
+
+
+# ---- URL ingestion ----
+def _ingest_url(url: str, book_id: int = None) -> dict:
+    """Download (deduped by content hash), extract the full text, optionally append it to a book. No request context needed."""
+    doc = download_document(url)
+    result = _extract_result(doc["path"], doc["ext"], doc["sha256"], "full", PREVIEW_CHARS)
+    out = {"url": url, "sha256": doc["sha256"], "size": doc["size"], "ext": doc["ext"],
+           "duplicate_download": doc["duplicate"], **result}
+    if book_id:
+        with open(os.path.join(EXTRACTED_DIR, f"{result['text_id']}.txt"), "r", encoding="utf-8") as f:
+            out["attached"] = attach_text_to_book(book_id, f.read(), url, doc["sha256"])
+        out["book_id"] = book_id
+    return out
+
+
+@register_job("ingest_url")
+def ingest_url_job(payload: dict, progress) -> dict:
+    progress(5, "downloading")
+    return _ingest_url(payload["url"], payload.get("book_id"))
+
+
+@app.route("/ingest-url", methods=["POST"])
+def ingest_url():
+    """
+    {"url", "book_id"?, "async"?}: stream a remote document to disk, extract it and attach the text to the book.
+    With "async": true the work runs as a background job (202 + status_url).
+    """
+    data = request.get_json() or {}
+    url = (data.get("url") or "").strip()
+    book_id = data.get("book_id")
+    if not url:
+        return jsonify({"error": "Missing url"}), 400
+    if book_id and not _get_book(book_id):
+        return jsonify({"error": "Book not found"}), 404
+
+    if data.get("async"):
+        job_id = enqueue_job("ingest_url", {"url": url, "book_id": book_id})
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("job_status", job_id=job_id, _external=True)
+        }), 202
+
+    try:
+        return jsonify(_with_text_url(_ingest_url(url, book_id)))
+    except IngestError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ExtractionError as e:
+        return jsonify({"error": str(e), "limit": getattr(e, "limit", None)}), e.status
+    except PoolBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        print("Error in /ingest-url:", e)
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+
+@app.route("/extracted/<text_id>", methods=["GET"])
+def get_extracted_text(text_id):
+    if not re.fullmatch(r"[0-9a-f]{32,64}", text_id or ""):
+        return jsonify({"error": "Invalid text id"}), 400
+    path = os.path.join(EXTRACTED_DIR, f"{text_id}.txt")
+    if not touch_text(path):
+        # pruned: extracting the same file again recreates it under the same id
+        return jsonify({"error": "Text not found"}), 404
+    return send_from_directory(EXTRACTED_DIR, f"{text_id}.txt", mimetype="text/plain")
+
+
+@app.route("/extract-text/cache-stats", methods=["GET"])
+def extract_cache_stats():
+    return jsonify(cache_stats())
+
+
+@app.route("/extract-text/pool-stats", methods=["GET"])
+def extract_pool_stats():
+    return jsonify(pool_stats())
+
+
 @app.route('/append-pdf-to-book', methods=['POST'])
 def append_pdf_to_book():
     try:
@@ -665,6 +1195,8 @@ def append_pdf_to_book():
             book.description = pdf_text
 
         db.commit()
+        bump_catalog_version()
+        index_book(book.book_id)
         return jsonify({"message": "PDF content appended to book successfully."}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,225 @@
+import os, re, time, sqlite3, tempfile
+from hashlib import sha256
+
+from coalesce import key_lock
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+AUDIO_DIR = os.getenv("AUDIO_DIR", os.path.join(BASE_DIR, "static", "audio"))
+BLOB_DIR = os.path.join(AUDIO_DIR, "blobs")
+INDEX_PATH = os.path.join(AUDIO_DIR, "index.sqlite3")
+_BLOB_RELPATH = re.compile(r"blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.mp3")
+os.makedirs(BLOB_DIR, exist_ok=True)
+
+AUDIO_STORE_MAX_BYTES = int(os.getenv("AUDIO_STORE_MAX_BYTES", 2 * 1024 ** 3))  # LRU byte budget
+
+
+# ----------------- Index -----------------
+def _db():
+    conn = sqlite3.connect(INDEX_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")  # every read updates last_access; WAL keeps this safe
+    return conn
+
+
+def _init_index():
+    conn = _db()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY, size INTEGER NOT NULL,
+            created_at REAL NOT NULL, last_access REAL NOT NULL)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS names (
+            name TEXT PRIMARY KEY, digest TEXT NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_blobs_last_access ON blobs(last_access)")
+    finally:
+        conn.close()
+
+
+_init_index()
+
+
+# ----------------- Helpers -----------------
+def audio_digest(text: str, lang: str = "en", voice: str = "gtts") -> str:
+    return sha256(f"{voice}|{lang}|{text or ''}".encode("utf-8")).hexdigest()
+
+
+def segment_digest(segment: str, lang: str = "en", voice: str = "gtts") -> str:
+    """Key for one sentence group's audio; kept apart from whole-text digests."""
+    return sha256(f"segment|{voice}|{lang}|{segment}".encode("utf-8")).hexdigest()
+
+
+def blob_relpath(digest: str) -> str:
+    """Path under AUDIO_DIR, sharded two levels deep: blobs/ab/cd/<digest>.mp3"""
+    return f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.mp3"
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(AUDIO_DIR, *blob_relpath(digest).split("/"))
+
+
+def atomic_write(path: str, data: bytes):
+    """Write to a temp file in the same directory, then rename into place so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# ----------------- Store API -----------------
+# Readers record the access in the same index transaction that finds the blob, and eviction deletes a
+# blob's row (only if it was not read since it was picked) and its file in one transaction, so a blob
+# is never evicted between being looked up and being opened. A blob whose file is gone is a miss.
+def _forget(conn, digest: str):
+    conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+    conn.execute("DELETE FROM names WHERE digest = ?", (digest,))
+
+
+def _checkout(digest: str, opener):
+    """Run opener(path) with the access recorded; None (and the stale row dropped) if the blob is gone."""
+    conn = _db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            found = conn.execute("UPDATE blobs SET last_access = ? WHERE digest = ?",
+                                 (time.time(), digest)).rowcount == 1
+            result = opener(blob_path(digest)) if found else None
+        except FileNotFoundError:
+            _forget(conn, digest)
+            result = None
+        conn.execute("COMMIT")
+        return result
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _existing(path: str) -> str:
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return path
+
+
+def lookup_blob(digest: str):
+    """Path of the blob, or None if it is not (or no longer) in the store."""
+    return _checkout(digest, _existing)
+
+
+def open_blob(digest: str):
+    """Open binary file for the blob (safe to read even if it is evicted meanwhile), or None."""
+    return _checkout(digest, lambda path: open(path, "rb"))
+
+
+def put_blob(digest: str, data: bytes, evict_now: bool = True):
+    atomic_write(blob_path(digest), data)
+    now = time.time()
+    conn = _db()
+    try:
+        conn.execute("INSERT OR REPLACE INTO blobs (digest, size, created_at, last_access) VALUES (?, ?, ?, ?)",
+                     (digest, len(data), now, now))
+    finally:
+        conn.close()
+    if evict_now:
+        evict()
+
+
+def read_blob(digest: str):
+    """Blob bytes, or None if it is not (or no longer) in the store."""
+    f = open_blob(digest)
+    if f is None:
+        return None
+    with f:
+        return f.read()
+
+
+def get_or_create_blob(digest: str, synthesize) -> dict:
+    """Return the blob for digest, calling synthesize() -> bytes once (per digest, across workers) if missing."""
+    created = False
+    if lookup_blob(digest) is None:
+        with key_lock("tts", digest):
+            if lookup_blob(digest) is None:
+                put_blob(digest, synthesize())
+                created = True
+    return {"digest": digest, "relpath": blob_relpath(digest), "path": blob_path(digest), "created": created}
+
+
+def link_name(name: str, digest: str):
+    """Map a logical (human-readable) audio name to a blob."""
+    conn = _db()
+    try:
+        conn.execute("INSERT OR REPLACE INTO names (name, digest) VALUES (?, ?)", (name, digest))
+    finally:
+        conn.close()
+
+
+def resolve_name(name: str):
+    conn = _db()
+    try:
+        row = conn.execute("SELECT digest FROM names WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    if row and lookup_blob(row[0]):
+        return blob_relpath(row[0])
+    return None
+
+
+def digest_from_relpath(relpath: str):
+    """Inverse of blob_relpath; None for anything that is not a blob path."""
+    m = _BLOB_RELPATH.fullmatch(relpath or "")
+    return m.group(1) if m and blob_relpath(m.group(1)) == relpath else None
+
+
+def evict(max_bytes: int = AUDIO_STORE_MAX_BYTES) -> int:
+    """Delete least-recently-used blobs until the store fits max_bytes. Returns bytes freed."""
+    conn = _db()
+    freed = 0
+    try:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        for digest, size, last_access in conn.execute(
+                "SELECT digest, size, last_access FROM blobs ORDER BY last_access").fetchall():
+            if total - freed <= max_bytes:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # skipped if it was read after the SELECT above
+                if conn.execute("DELETE FROM blobs WHERE digest = ? AND last_access = ?",
+                                (digest, last_access)).rowcount != 1:
+                    conn.execute("ROLLBACK")
+                    continue
+                conn.execute("DELETE FROM names WHERE digest = ?", (digest,))
+                try:
+                    os.remove(blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                conn.execute("COMMIT")
+            except OSError as e:
+                conn.execute("ROLLBACK")
+                print("Audio eviction failed:", e)
+                continue
+            freed += size
+        return freed
+    finally:
+        conn.close()
+
+
+def store_stats() -> dict:
+    conn = _db()
+    try:
+        blobs, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        names = conn.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+    finally:
+        conn.close()
+    return {"blobs": blobs, "bytes": size, "names": names, "max_bytes": AUDIO_STORE_MAX_BYTES}
@@ -0,0 +1,289 @@
+import os, re, sys, time, heapq, threading, unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from sqlalchemy import select, func
+
+from Config import Session
+from Model import Books, Library
+from catalog import catalog_version
+
+# Title/author suggestions from a sorted array of normalized keys (bisect for the prefix range) plus a
+# segment tree over popularity, so the top-k of any range costs O(k log n) however short the prefix.
+AUTOCOMPLETE_DEFAULT_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", 60))  # new books from other workers
+AUTOCOMPLETE_REBUILD_SECONDS = int(os.getenv("AUTOCOMPLETE_REBUILD_SECONDS", 3600))  # deletions, popularity
+AUTOCOMPLETE_LOAD_WAIT_SECONDS = float(os.getenv("AUTOCOMPLETE_LOAD_WAIT_SECONDS", 2))
+AUTOCOMPLETE_DELTA_MAX = 2000  # new books are scanned linearly until the next rebuild
+LOAD_BATCH = 50000
+
+TITLE, AUTHOR = 0, 1
+KINDS = ("title", "author")
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_ARTICLES = frozenset(("the", "a", "an"))
+_KEY_END = "\U0010ffff"
+
+
+def normalize(s: str) -> str:
+    """Case- and accent-insensitive key: 'Les Misérables!' -> 'les miserables'."""
+    s = s or ""
+    if not s.isascii():
+        s = "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", s.casefold()).strip()
+
+
+class _Index:
+    """Parallel arrays in key order; tree[n + i] = i, tree[p] = the more popular of its children."""
+
+    def __init__(self, entries: list, version: int, max_id: int):
+        entries.sort(key=lambda e: e[0])
+        self.keys = [e[0] for e in entries]
+        self.text = [e[1] for e in entries]
+        self.kind = array("b", (e[2] for e in entries))
+        self.book = array("q", (e[3] for e in entries))
+        self.pop = array("l", (e[4] for e in entries))
+        self.n = n = len(entries)
+        tree = array("i", bytes(4 * 2 * n))
+        pop = self.pop
+        for i in range(n):
+            tree[n + i] = i
+        for p in range(n - 1, 0, -1):
+            a, b = tree[2 * p], tree[2 * p + 1]
+            tree[p] = a if pop[a] >= pop[b] else b
+        self.tree = tree
+        self.delta = []  # (key, text, kind, book_id) for books added since the build
+        self.version = version
+        self.max_id = max_id
+        self.built_at = self.refreshed_at = time.time()
+
+    def _argmax(self, lo: int, hi: int) -> int:
+        pop, tree, best = self.pop, self.tree, -1
+        lo += self.n
+        hi += self.n
+        while lo < hi:
+            if lo & 1:
+                c = tree[lo]
+                if best < 0 or pop[c] > pop[best]:
+                    best = c
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                c = tree[hi]
+                if best < 0 or pop[c] > pop[best]:
+                    best = c
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def top(self, prefix: str, limit: int, removed, removed_authors=()) -> list:
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _KEY_END, lo)
+        heap, out = [], []
+
+        def push(l, r):
+            if l < r:
+                i = self._argmax(l, r)
+                heapq.heappush(heap, (-self.pop[i], i, l, r))
+
+        push(lo, hi)
+        while heap and len(out) < limit:
+            _, i, l, r = heapq.heappop(heap)
+            if self.book[i] not in removed and not (self.kind[i] == AUTHOR and normalize(self.text[i]) in removed_authors):
+                out.append((self.text[i], self.kind[i], self.book[i]))
+            push(l, i)
+            push(i + 1, r)
+        if len(out) < limit:
+            for key, text, kind, book_id in self.delta:
+                if key.startswith(prefix) and book_id not in removed \
+                        and not (kind == AUTHOR and normalize(text) in removed_authors):
+                    out.append((text, kind, book_id))
+                    if len(out) == limit:
+                        break
+        return out
+
+    def has_key(self, key: str) -> bool:
+        i = bisect_left(self.keys, key)
+        return i < self.n and self.keys[i] == key
+
+
+_index = None
+_lock = threading.Lock()
+_loaded = threading.Event()
+_removed = set()  # book ids deleted in this process since the last rebuild; other workers drop them at theirs
+_removed_authors = set()  # normalized authors whose last book was deleted, likewise
+
+
+# ----------------- Loading -----------------
+def _iter_books(db, after: int = 0):
+    while True:
+        rows = db.execute(select(Books.book_id, Books.title, Books.author)
+                          .where(Books.book_id > after).order_by(Books.book_id).limit(LOAD_BATCH)).fetchall()
+        yield from rows
+        if len(rows) < LOAD_BATCH:
+            return
+        after = rows[-1].book_id
+
+
+def _title_keys(title: str):
+    key = normalize(title)
+    if key:
+        yield key
+        first, _, rest = key.partition(" ")
+        if rest and first in _ARTICLES:
+            yield rest  # "hobbit" finds "The Hobbit"
+
+
+def _author_keys(key: str):
+    yield key
+    if " " in key:
+        yield key.rsplit(" ", 1)[1]  # "tolkien" finds "J. R. R. Tolkien"
+
+
+def build_index(rows, popularity: dict, version: int = 0) -> _Index:
+    """rows: (book_id, title, author). Titles keep their most popular book; authors sum their books' popularity."""
+    titles, authors, author_keys, max_id = {}, {}, {}, 0
+    for book_id, title, author in rows:
+        max_id = max(max_id, book_id)
+        pop = popularity.get(book_id, 0)
+        for key in _title_keys(title):
+            best = titles.get(key)
+            if best is None or pop > best[2]:
+                titles[key] = (title, book_id, pop)
+        akey = author_keys.get(author)
+        if akey is None:
+            akey = author_keys[author] = normalize(author)  # authors repeat across many books
+        if akey:
+            entry = authors.get(akey)
+            if entry is None:
+                authors[sys.intern(akey)] = [sys.intern(author), pop]
+            else:
+                entry[1] += pop
+    entries = [(key, title, TITLE, book_id, pop) for key, (title, book_id, pop) in titles.items()]
+    entries += [(key, author, AUTHOR, -1, pop)
+                for akey, (author, pop) in authors.items() for key in _author_keys(akey)]
+    return _Index(entries, version, max_id)
+
+
+def _load() -> _Index:
+    version = catalog_version()
+    db = Session()
+    try:
+        popularity = dict(db.execute(select(Library.book_id, func.count()).group_by(Library.book_id)).fetchall())
+        return build_index(_iter_books(db), popularity, version)
+    finally:
+        db.close()
+
+
+def _catch_up(idx: _Index):
+    version = catalog_version()
+    db = Session()
+    try:
+        added, new_authors = [], set()
+        for book_id, title, author in _iter_books(db, idx.max_id):
+            idx.max_id = max(idx.max_id, book_id)
+            added += [(key, title, TITLE, book_id) for key in _title_keys(title)]
+            akey = normalize(author)
+            _removed_authors.discard(akey)  # the author has a book again
+            if akey and akey not in new_authors and not idx.has_key(akey):
+                new_authors.add(akey)
+                added += [(key, author, AUTHOR, -1) for key in _author_keys(akey)]
+    finally:
+        db.close()
+    idx.delta = idx.delta + added  # swapped, not appended: lookups may be iterating the old list
+    idx.version = version
+    idx.refreshed_at = time.time()
+
+
+def _rebuild():
+    global _index
+    # deletions recorded so far are committed, so the fresh load no longer has them
+    books, authors = set(_removed), set(_removed_authors)
+    try:
+        _index = _load()
+        _removed.difference_update(books)
+        _removed_authors.difference_update(authors)
+    except Exception as e:
+        print("Autocomplete Rebuild Error:", e)
+        if _index is not None:
+            _index.built_at = time.time()  # retry after another AUTOCOMPLETE_REBUILD_SECONDS, not on every request
+    finally:
+        _loaded.set()
+        _lock.release()
+
+
+def _get_index() -> _Index:
+    idx = _index
+    if idx is None:
+        # first use: a large catalog takes seconds to load, so it loads in the background and
+        # requests wait only briefly (no suggestions until it is ready)
+        if _lock.acquire(blocking=False):
+            threading.Thread(target=_rebuild, daemon=True).start()
+        _loaded.wait(AUTOCOMPLETE_LOAD_WAIT_SECONDS)
+        return _index
+
+    now = time.time()
+    full = now - idx.built_at > AUTOCOMPLETE_REBUILD_SECONDS or len(idx.delta) > AUTOCOMPLETE_DELTA_MAX
+    if (full or idx.version != catalog_version() or now - idx.refreshed_at > AUTOCOMPLETE_REFRESH_SECONDS) \
+            and _lock.acquire(blocking=False):
+        if full:
+            # lookups keep using the current index while the new one loads
+            threading.Thread(target=_rebuild, daemon=True).start()
+        else:
+            try:
+                _catch_up(idx)
+            except Exception as e:
+                print("Autocomplete Refresh Error:", e)
+            finally:
+                _lock.release()
+    return idx
+
+
+# ----------------- Autocomplete API -----------------
+def suggest(q: str, limit: int = AUTOCOMPLETE_DEFAULT_LIMIT) -> list:
+    """Most popular titles and authors starting with q: [{text, type, book_id?}]."""
+    prefix = normalize(q)
+    if not prefix:
+        return []
+    idx = _get_index()
+    if idx is None:
+        return []
+    out = []
+    for text, kind, book_id in idx.top(prefix, limit, _removed, _removed_authors):
+        item = {"text": text, "type": KINDS[kind]}
+        if kind == TITLE:
+            item["book_id"] = book_id
+        out.append(item)
+    return out
+
+
+def forget_book(book_id: int, author: str = None):
+    """Called after a delete commits so the book, and its author if no book is left, stop being suggested."""
+    _removed.add(book_id)
+    akey = normalize(author)
+    if not akey:
+        return
+    db = Session()
+    try:
+        remaining = db.execute(select(Books.book_id).where(Books.author == author).limit(1)).first()
+    finally:
+        db.close()
+    if remaining is None:
+        _removed_authors.add(akey)
+
+
+def autocomplete_stats() -> dict:
+    idx = _index
+    if idx is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "entries": idx.n,
+        "delta": len(idx.delta),
+        "version": idx.version,
+        "max_book_id": idx.max_id,
+        "array_bytes": sum(a.itemsize * len(a) for a in (idx.kind, idx.book, idx.pop, idx.tree)),
+        "built_at": datetime.utcfromtimestamp(idx.built_at).isoformat(),
+        "refreshed_at": datetime.utcfromtimestamp(idx.refreshed_at).isoformat(),
+    }
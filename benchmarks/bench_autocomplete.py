@@ -0,0 +1,104 @@
+# Autocomplete benchmark: prefix lookups on an in-memory index of ~1M titles and authors.
+#   python benchmarks/bench_autocomplete.py [--titles 1000000] [--authors 100000] [--lookups 20000] [--out result.json]
+# Builds the index from synthetic rows (no database needed), then times lookups for prefixes of 1-8
+# characters. Target: p99 under 1 ms at 1M entries. Prints JSON (build time, memory, latency by prefix length).
+import os, sys, time, json, random, argparse, tempfile, tracemalloc, statistics, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TARGET_P99_MS = 1.0
+SYLLABLES = ["ka", "lo", "mi", "ra", "en", "tho", "sa", "qu", "bel", "dor", "an", "is", "ur", "ve", "ni", "zo"]
+WORDS = ["the", "a", "of", "and", "history", "war", "love", "night", "river", "empire", "garden", "secret"]
+
+
+def _word(rng) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_rows(titles: int, authors: int, seed: int = 3):
+    rng = random.Random(seed)
+    names = [f"{_word(rng).title()} {_word(rng).title()}" for _ in range(authors)]
+    for book_id in range(1, titles + 1):
+        title = " ".join(rng.choice(WORDS) if rng.random() < 0.3 else _word(rng) for _ in range(rng.randint(1, 5)))
+        yield book_id, title.title(), rng.choice(names)
+
+
+def _timings(samples: list) -> dict:
+    samples.sort()
+    return {
+        "lookups": len(samples),
+        "mean_ms": round(statistics.mean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p99_ms": round(samples[max(0, int(len(samples) * 0.99) - 1)], 4),
+        "max_ms": round(samples[-1], 4),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--titles", type=int, default=1000000)
+    ap.add_argument("--authors", type=int, default=100000)
+    ap.add_argument("--lookups", type=int, default=20000)
+    ap.add_argument("--out")
+    args = ap.parse_args()
+
+    # the module imports Config, which needs a database; nothing is read from it here
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'kotubrief_bench_ac.db')}")
+    import Config
+    Config.engine.echo = False
+    from autocomplete import build_index, normalize
+
+    rows = list(make_rows(args.titles, args.authors))
+    rng = random.Random(5)
+    popularity = {book_id: int(rng.paretovariate(1.2)) for book_id in range(1, args.titles + 1, 3)}
+
+    t0 = time.perf_counter()
+    index = build_index(rows, popularity)
+    build_seconds = time.perf_counter() - t0
+    # a second, traced build for memory: tracing slows the build several times over
+    del index
+    tracemalloc.start()
+    index = build_index(rows, popularity)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    keys = [normalize(title) for _, title, _ in rows[:: max(1, len(rows) // 5000)]]
+    by_length = {}
+    for length in (1, 2, 3, 4, 6, 8):
+        prefixes = [k[:length] for k in keys if len(k) >= length]
+        samples = []
+        for i in range(args.lookups // 6):
+            p = prefixes[i % len(prefixes)]
+            t0 = time.perf_counter()
+            index.top(p, 8, ())
+            samples.append((time.perf_counter() - t0) * 1000)
+        by_length[length] = _timings(samples)
+
+    report = {
+        "commit": _git_rev(),
+        "python": sys.version.split()[0],
+        "entries": index.n,
+        "build_seconds": round(build_seconds, 2),
+        "index_memory_mb": round(memory / 1024 ** 2, 1),
+        "array_bytes": sum(a.itemsize * len(a) for a in (index.kind, index.book, index.pop, index.tree)),
+        "target_p99_ms": TARGET_P99_MS,
+        "by_prefix_length": by_length,
+        "meets_target": all(r["p99_ms"] < TARGET_P99_MS for r in by_length.values()),
+    }
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# Extraction benchmark for every supported format.
+#   python benchmarks/bench_extraction.py [--sizes small,medium,large] [--pdf-pages 100] [--repeat 3] [--out result.json]
+# Generates synthetic DOCX/PPTX/XLSX/EPUB/TXT files, uses the bundled downloaded.pdf, times the
+# extract_text_from_* wrappers and prints JSON (MB/s, units/s, tracemalloc peak) for comparing commits.
+import os, sys, time, json, shutil, argparse, tempfile, tracemalloc, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from extractors import (
+    EXTRACTOR_VERSION, iter_units, extract_text_from_pdf, extract_text_from_docx, extract_text_from_txt,
+    extract_text_from_pptx, extract_text_from_xlsx, extract_text_from_epub
+)
+
+# size name -> scale: paragraphs/100, slides/10, rows/1000, chapters/5, TXT KiB/100
+SIZES = {"small": 1, "medium": 10, "large": 50}
+
+SENTENCE = ("The quick brown fox jumps over the lazy dog while the librarian catalogues "
+            "another shelf of well-thumbed summaries. ")
+
+
+# ----------------- Generators -----------------
+def make_docx(path: str, scale: int):
+    import docx
+    doc = docx.Document()
+    for i in range(100 * scale):
+        if i % 25 == 0:
+            doc.add_heading(f"Section {i // 25 + 1}", level=1)
+        doc.add_paragraph(SENTENCE * 3)
+    doc.save(path)
+
+
+def make_pptx(path: str, scale: int):
+    from pptx import Presentation
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(10 * scale):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {i + 1}"
+        slide.placeholders[1].text = "\n".join([SENTENCE] * 5)
+    prs.save(path)
+
+
+def make_xlsx(path: str, scale: int):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for s in range(2):
+        ws = wb.create_sheet(f"Sheet{s + 1}")
+        for r in range(500 * scale):
+            ws.append([r, f"Book {r}", "Author Name", 4.5, SENTENCE.strip()])
+    wb.save(path)
+
+
+def make_epub(path: str, scale: int):
+    from ebooklib import epub
+    book = epub.EpubBook()
+    book.set_identifier("bench")
+    book.set_title("Benchmark Book")
+    book.set_language("en")
+    chapters = []
+    for i in range(5 * scale):
+        ch = epub.EpubHtml(title=f"Chapter {i + 1}", file_name=f"ch{i + 1}.xhtml", lang="en")
+        body = "".join(f"<p>{SENTENCE * 3}</p>" for _ in range(40))
+        ch.content = f"<html><body><h1>Chapter {i + 1}</h1>{body}</body></html>"
+        book.add_item(ch)
+        chapters.append(ch)
+    book.toc = chapters
+    book.spine = ["nav"] + chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(path, book)
+
+
+def make_txt(path: str, scale: int):
+    line = SENTENCE + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(line * (100 * 1024 * scale // len(line)))
+
+
+GENERATORS = {
+    "docx": (make_docx, extract_text_from_docx),
+    "pptx": (make_pptx, extract_text_from_pptx),
+    "xlsx": (make_xlsx, extract_text_from_xlsx),
+    "epub": (make_epub, extract_text_from_epub),
+    "txt": (make_txt, extract_text_from_txt),
+}
+
+
+# ----------------- Measurement -----------------
+def _pdf_subset(src: str, pages: int, workdir: str) -> str:
+    """First `pages` pages of src (pypdfium2 ships with pdfplumber)."""
+    import pypdfium2 as pdfium
+    doc = pdfium.PdfDocument(src)
+    out = pdfium.PdfDocument.new()
+    out.import_pages(doc, list(range(min(pages, len(doc)))))
+    path = os.path.join(workdir, f"downloaded-{pages}p.pdf")
+    out.save(path)
+    return path
+
+
+def measure(fn, path: str, ext: str, repeat: int) -> dict:
+    units = sum(1 for _ in iter_units(path, ext, parallel=False))
+    size = os.path.getsize(path)
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        text = fn(path)
+        times.append(time.perf_counter() - t0)
+
+    # separate run for memory: tracemalloc slows allocation-heavy parsers down noticeably
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "bytes": size,
+        "units": units,
+        "chars": len(text),
+        "seconds_best": round(best, 4),
+        "seconds_median": round(sorted(times)[len(times) // 2], 4),
+        "mb_per_sec": round(size / 1e6 / best, 3),
+        "units_per_sec": round(units / best, 1),
+        "peak_mem_mb": round(peak / 1e6, 2),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="small,medium,large", help=f"comma-separated subset of {list(SIZES)}")
+    ap.add_argument("--formats", default="pdf," + ",".join(GENERATORS))
+    ap.add_argument("--pdf", default=os.path.join(ROOT, "downloaded.pdf"))
+    ap.add_argument("--pdf-pages", type=int, default=100, help="first N pages of the PDF (0 = all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help="also write the JSON here")
+    args = ap.parse_args()
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    formats = [f for f in args.formats.split(",") if f]
+    workdir = tempfile.mkdtemp(prefix="bench-extract-")
+    results = []
+    try:
+        for ext in formats:
+            if ext == "pdf":
+                # single process: tracemalloc cannot see into pool workers
+                path = _pdf_subset(args.pdf, args.pdf_pages, workdir) if args.pdf_pages else args.pdf
+                row = measure(lambda p: extract_text_from_pdf(p, workers=1), path, "pdf", args.repeat)
+                results.append({"format": "pdf", "size": os.path.basename(path), **row})
+                continue
+            make, fn = GENERATORS[ext]
+            for size in sizes:
+                path = os.path.join(workdir, f"{size}.{ext}")
+                make(path, SIZES[size])
+                results.append({"format": ext, "size": size, **measure(fn, path, ext, args.repeat)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": _git_rev(),
+        "extractor_version": EXTRACTOR_VERSION,
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
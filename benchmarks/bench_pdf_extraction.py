@@ -0,0 +1,57 @@
+# Page-parallel PDF extraction benchmark against the bundled downloaded.pdf.
+#   python benchmarks/bench_pdf_extraction.py [--pages 200] [--max-workers 8]
+# Prints JSON with pages/sec for 1..N workers.
+import os, sys, time, json, shutil, argparse, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import extractors
+from extractors import extract_text_from_pdf, pdf_page_count
+
+
+def _subset(src: str, pages: int) -> str:
+    """First `pages` pages of src as a temp PDF (pypdfium2 ships with pdfplumber)."""
+    import pypdfium2 as pdfium
+    doc = pdfium.PdfDocument(src)
+    out = pdfium.PdfDocument.new()
+    out.import_pages(doc, list(range(min(pages, len(doc)))))
+    path = os.path.join(tempfile.mkdtemp(), "subset.pdf")
+    out.save(path)
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", default=os.path.join(ROOT, "downloaded.pdf"))
+    ap.add_argument("--pages", type=int, default=0, help="only use the first N pages (0 = all)")
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    path = _subset(args.pdf, args.pages) if args.pages else args.pdf
+    n = pdf_page_count(path)
+    extractors.PDF_PARALLEL_MIN_PAGES = 0
+
+    results, baseline = [], None
+    for w in range(1, args.max_workers + 1):
+        if w > 1:
+            extractors._get_pool(w).submit(int).result()  # pool start-up is not part of the measurement
+        t0 = time.perf_counter()
+        text = extract_text_from_pdf(path, workers=w)
+        elapsed = time.perf_counter() - t0
+        baseline = baseline or elapsed
+        results.append({
+            "workers": w,
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(n / elapsed, 2),
+            "speedup": round(baseline / elapsed, 2),
+            "chars": len(text),
+        })
+
+    print(json.dumps({"pdf": os.path.basename(args.pdf), "pages": n, "cpus": os.cpu_count(),
+                      "results": results}, indent=2))
+    if args.pages:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# /books/search benchmark on a seeded catalog (SQLite FTS5 backend; point --database-url at Postgres for tsvector/GIN).
+#   python benchmarks/bench_search.py [--rows 500000] [--requests 100] [--db /tmp/search.db] [--out result.json]
+# Seeds Books with synthetic titles/authors/descriptions (reused on later runs with the same --rows), builds the
+# index, then times ranked queries against an unindexed LIKE scan. Target: search p95 under 50 ms. Prints JSON.
+import os, sys, time, json, random, argparse, tempfile, statistics, subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TARGET_P95_MS = 50
+BATCH = 20000
+CATEGORIES = ["Literature", "History", "Science", "Business", "Philosophy", "Psychology", "Art", "Travel"]
+SUBCATEGORIES = ["Classics", "Modern", "Essays", "Biography", "Reference"]
+# Zipf-ish vocabulary: a few words everywhere, most words rare
+VOCAB = [f"w{i}" for i in range(20000)] + ["history", "empire", "ocean", "habit", "mind", "money", "war", "love"]
+QUERIES = {
+    "common_word": "history",
+    "rare_word": "w19999",
+    "two_words": "empire ocean",
+    "prefix": "hab",
+    "author": "author 4242",
+}
+
+
+def _args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500000)
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--description-words", type=int, default=60)
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "kotubrief_bench_search.db"))
+    ap.add_argument("--database-url")
+    ap.add_argument("--out")
+    return ap.parse_args()
+
+
+def seed(engine, Books, rows: int, words: int) -> float:
+    from sqlalchemy import func, select, insert
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(Books)).scalar() == rows:
+            return 0.0
+    t0 = time.perf_counter()
+    rng = random.Random(7)
+    cum, total = [], 0.0
+    for i in range(len(VOCAB)):
+        total += 1 / (i + 1)
+        cum.append(total)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(Books.__table__.delete())
+        for start in range(0, rows, BATCH):
+            batch = []
+            for i in range(start, min(rows, start + BATCH)):
+                title = rng.choices(VOCAB, cum_weights=cum, k=3)
+                batch.append({
+                    "title": " ".join(title).title(),
+                    "author": f"Author {i % 10000}",
+                    "main_category": rng.choice(CATEGORIES),
+                    "sub_category": rng.choice(SUBCATEGORIES),
+                    "created_at": now,
+                    "description": " ".join(rng.choices(VOCAB, cum_weights=cum, k=words)),
+                })
+            conn.execute(insert(Books), batch)
+    return time.perf_counter() - t0
+
+
+def _timings(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "requests": n,
+        "mean_ms": round(statistics.mean(samples), 2),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[max(0, int(len(samples) * 0.95) - 1)], 2),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    args = _args()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{args.db}"
+    import Config
+    Config.engine.echo = False
+    from sqlalchemy import select, or_
+    from Model import Books
+    from catalog import LIST_FIELDS
+    import search
+
+    seed_seconds = seed(Config.engine, Books, args.rows, args.description_words)
+    t0 = time.perf_counter()
+    indexed = search.rebuild_search_index()
+    build_seconds = time.perf_counter() - t0
+
+    def like_scan(q):
+        # roughly what clients do today, minus the network: every row checked for the word
+        db = Config.Session()
+        try:
+            pattern = f"%{q}%"
+            return db.execute(select(Books.book_id).where(or_(
+                Books.title.ilike(pattern), Books.author.ilike(pattern), Books.description.ilike(pattern)
+            )).limit(20)).fetchall()
+        finally:
+            db.close()
+
+    queries = {}
+    for name, q in QUERIES.items():
+        fts = _timings(lambda: search.search_books(q, LIST_FIELDS, 20), args.requests)
+        queries[name] = {
+            "q": q,
+            "hits_first_page": len(search.search_books(q, LIST_FIELDS, 20)),
+            "search": fts,
+            "like_scan": _timings(lambda: like_scan(q), max(1, args.requests // 20)),
+            "meets_target": fts["p95_ms"] < TARGET_P95_MS,
+        }
+
+    sample_ids = random.Random(1).sample(range(1, args.rows + 1), min(200, args.rows))
+    ids = iter(sample_ids)
+    reindex = _timings(lambda: search.index_book(next(ids)), len(sample_ids))
+
+    report = {
+        "commit": _git_rev(),
+        "python": sys.version.split()[0],
+        "backend": Config.engine.dialect.name,
+        "rows": args.rows,
+        "seed_seconds": round(seed_seconds, 1),
+        "index_build_seconds": round(build_seconds, 1),
+        "indexed": indexed,
+        "index_book": reindex,
+        "target_p95_ms": TARGET_P95_MS,
+        "queries": queries,
+    }
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
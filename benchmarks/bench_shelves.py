@@ -0,0 +1,126 @@
+# Trending/featured shelf benchmark: ORDER BY random() vs. the precomputed id pools in shelves.py.
+#   python benchmarks/bench_shelves.py [--rows 1000000] [--requests 200] [--db /tmp/shelves.db] [--out result.json]
+# Seeds a SQLite Books table (reused on later runs with the same --db/--rows), then times the old
+# "random 20 of a category" query against pool build, incremental refresh and per-request sampling. Prints JSON.
+import os, sys, time, json, random, argparse, tempfile, statistics, subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ["Literature", "History", "Science", "Business", "Philosophy", "Psychology", "Art", "Travel"]
+SUBCATEGORIES = ["Classics", "Modern", "Essays", "Biography", "Reference"]
+BATCH = 20000
+
+
+def _args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1000000)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--description-bytes", type=int, default=300)
+    ap.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "kotubrief_bench_shelves.db"))
+    ap.add_argument("--out")
+    return ap.parse_args()
+
+
+def seed(engine, Books, rows: int, description_bytes: int):
+    from sqlalchemy import func, select, insert
+    with engine.connect() as conn:
+        have = conn.execute(select(func.count()).select_from(Books)).scalar()
+    if have == rows:
+        return 0.0
+    t0 = time.perf_counter()
+    rng = random.Random(42)
+    filler = ("lorem ipsum dolor sit amet " * (description_bytes // 27 + 1))[:description_bytes]
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(Books.__table__.delete())
+        for start in range(0, rows, BATCH):
+            conn.execute(insert(Books), [{
+                "title": f"Book {i}",
+                "author": f"Author {i % 5000}",
+                "cover_image_url": f"https://example.com/covers/{i}.jpg",
+                "main_category": rng.choice(CATEGORIES),
+                "sub_category": rng.choice(SUBCATEGORIES),
+                "created_at": now,
+                "description": filler,
+            } for i in range(start, min(rows, start + BATCH))])
+    return time.perf_counter() - t0
+
+
+def _timings(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "requests": n,
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    args = _args()
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    import Config
+    Config.engine.echo = False
+    from sqlalchemy import text
+    from Model import Books
+    import shelves
+
+    seed_seconds = seed(Config.engine, Books, args.rows, args.description_bytes)
+    Session = Config.Session
+
+    def order_by_random():
+        # the old /books/trending query, with SQLite's random() in place of NEWID()
+        db = Session()
+        try:
+            return db.execute(text(
+                "SELECT * FROM Books WHERE main_category = 'Literature' ORDER BY random() LIMIT 20"
+            )).fetchall()
+        finally:
+            db.close()
+
+    pool = shelves._get_pool("trending")
+    t0 = time.perf_counter()
+    shelves._ensure_fresh(pool)
+    build_ms = (time.perf_counter() - t0) * 1000
+    pool.refreshed_at = 0.0
+    t0 = time.perf_counter()
+    shelves._ensure_fresh(pool)  # nothing new: one index range above the high-water mark
+    refresh_ms = (time.perf_counter() - t0) * 1000
+
+    report = {
+        "commit": _git_rev(),
+        "python": sys.version.split()[0],
+        "rows": args.rows,
+        "seed_seconds": round(seed_seconds, 1),
+        "shelf": "trending",
+        "pool_size": len(pool.ids),
+        "pool_build_ms": round(build_ms, 1),
+        "incremental_refresh_ms": round(refresh_ms, 2),
+        "pool_bytes": pool.ids.itemsize * len(pool.ids),
+        "order_by_random": _timings(order_by_random, max(1, args.requests // 10)),
+        "pool_sample": _timings(lambda: shelves.get_shelf("trending"), args.requests),
+    }
+    report["speedup_p50"] = round(report["order_by_random"]["p50_ms"] / report["pool_sample"]["p50_ms"], 1)
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
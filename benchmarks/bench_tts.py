@@ -0,0 +1,62 @@
+# TTS pipeline benchmark (offline): synthesize_tts_to_file (the /generate-tts path) against serial synthesis.
+#   python benchmarks/bench_tts.py [--words 4500] [--latency 0.25]
+# Uses SilenceEngine with an artificial per-request latency in place of gTTS, and a throwaway audio store.
+import os, sys, time, json, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AUDIO_DIR", tempfile.mkdtemp(prefix="bench-tts-"))
+from tts_services import SilenceEngine, set_tts_engine, synthesize_mp3, synthesize_tts_to_file, iter_mp3_frames
+
+
+class CountingEngine(SilenceEngine):
+    def __init__(self, delay: float):
+        super().__init__(delay=delay)
+        self.calls = 0
+
+    def synthesize(self, text: str, lang: str = "en") -> bytes:
+        self.calls += 1
+        return super().synthesize(text, lang)
+
+
+def make_text(words: int, tag: str = "") -> str:
+    sentence = "The quick brown fox jumps over the lazy dog near the quiet river bank."
+    n = max(1, words // len(sentence.split()))
+    return " ".join(f"{sentence[:-1]} {tag}{i}." for i in range(n))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--words", type=int, default=4500)
+    ap.add_argument("--latency", type=float, default=0.25, help="simulated seconds per engine request")
+    args = ap.parse_args()
+
+    engine = CountingEngine(delay=args.latency)
+    set_tts_engine(engine)
+    text = make_text(args.words)
+    edited = text.replace(" 7.", " 7, edited.", 1)
+
+    t0 = time.perf_counter()
+    synthesize_mp3(text, engine=engine, max_workers=1)
+    serial = {"seconds": round(time.perf_counter() - t0, 3), "engine_calls": engine.calls}
+
+    results = []
+    for label, body in (("cold", text), ("warm", text), ("edited", edited)):
+        engine.calls = 0
+        t0 = time.perf_counter()
+        out = synthesize_tts_to_file(body, "Bench", "Author", "5min")
+        elapsed = time.perf_counter() - t0
+        with open(out["path"], "rb") as f:
+            audio = f.read()
+        results.append({
+            "run": label,
+            "seconds": round(elapsed, 3),
+            "engine_calls": engine.calls,
+            "cache": out["cache"],
+            "bytes": len(audio),
+            "frames": sum(1 for _ in iter_mp3_frames(audio)),
+        })
+    print(json.dumps({"words": args.words, "latency": args.latency, "serial": serial, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import os, json, time, base64, threading
+from hashlib import sha1
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import request, jsonify
+from sqlalchemy import select, func, and_, or_
+
+from Model import Books
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = int(os.getenv("MAX_PAGE_LIMIT", 100))
+
+# columns a list endpoint may return; "description" can be a whole book, so it is only sent when asked for
+BOOK_FIELDS = ("book_id", "user_id", "title", "author", "cover_image_url", "main_category", "sub_category",
+               "created_at", "description")
+LIST_FIELDS = ("book_id", "user_id", "title", "author", "cover_image_url", "main_category", "sub_category",
+               "created_at")
+SORTS = ("book_id", "created_at")  # book_id ascending; created_at newest first
+# bumps only reach this process; other workers pick up changes within this many seconds
+CATALOG_CACHE_SECONDS = int(os.getenv("CATALOG_CACHE_SECONDS", 60))
+
+
+class ListArgsError(ValueError):
+    pass
+
+
+_version = 0
+_meta_cache = None  # (version, loaded_at, tree, counts, etags)
+_meta_lock = threading.Lock()
+
+
+# ----------------- Catalog version -----------------
+def bump_catalog_version():
+    """Called by the book controllers after any insert/update/delete; drops cached catalog metadata."""
+    global _version
+    with _meta_lock:
+        _version += 1
+
+
+def catalog_version() -> int:
+    return _version
+
+
+# ----------------- Cursors -----------------
+def encode_cursor(sort: str, book_id: int, created_at: datetime = None) -> str:
+    data = {"s": sort, "id": book_id}
+    if sort == "created_at":
+        data["t"] = created_at.isoformat()
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> dict:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["s"] != sort:
+            raise ListArgsError("Cursor belongs to a different sort order")
+        out = {"id": int(data["id"])}
+        if sort == "created_at":
+            out["t"] = datetime.fromisoformat(data["t"])
+        return out
+    except ListArgsError:
+        raise
+    except Exception:
+        raise ListArgsError("Invalid cursor")
+
+
+# ----------------- Listing -----------------
+def parse_list_args(args, default_fields=LIST_FIELDS, unpaged_fields=None) -> dict:
+    """
+    fields=, limit= (capped at MAX_PAGE_LIMIT), sort=, cursor= and legacy page= from a query string.
+    Endpoints that used to return every row pass unpaged_fields: without limit= or cursor= they keep
+    doing so (limit None), with those fields by default.
+    """
+    unpaged = unpaged_fields is not None and not args.get("limit") and not args.get("cursor")
+    if unpaged:
+        default_fields = unpaged_fields
+    fields = [f.strip() for f in (args.get("fields") or "").split(",") if f.strip()] or list(default_fields)
+    unknown = [f for f in fields if f not in BOOK_FIELDS]
+    if unknown:
+        raise ListArgsError(f"Unknown fields: {', '.join(unknown)}")
+
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_LIMIT))
+        page = int(args["page"]) if args.get("page") else None
+    except ValueError:
+        raise ListArgsError("limit and page must be integers")
+    limit = max(1, min(limit, MAX_PAGE_LIMIT))
+
+    sort = args.get("sort") or "book_id"
+    if sort not in SORTS:
+        raise ListArgsError(f"sort must be one of: {', '.join(SORTS)}")
+    cursor = decode_cursor(args["cursor"], sort) if args.get("cursor") else None
+    if unpaged:
+        return {"fields": fields, "limit": None, "sort": sort, "cursor": None, "page": None}
+    return {"fields": fields, "limit": limit, "sort": sort, "cursor": cursor, "page": page}
+
+
+def list_books(db, where=(), fields=LIST_FIELDS, limit=DEFAULT_PAGE_LIMIT, sort="book_id", cursor=None, page=None):
+    """
+    One page of Books as dicts with only `fields` selected (no ORM objects, no unrequested text columns).
+    Keyset pagination: the cursor holds the last row's sort key, so every page is an index range scan
+    no matter how deep. limit=None returns every row. Returns (items, next_cursor).
+    Books without created_at are not listed under sort=created_at.
+    """
+    wanted = list(fields)
+    keys = ["book_id"] + (["created_at"] if sort == "created_at" else [])
+    columns = [getattr(Books, f) for f in dict.fromkeys(keys + wanted)]
+
+    stmt = select(*columns).where(*where)
+    if sort == "created_at":
+        stmt = stmt.where(Books.created_at.isnot(None)).order_by(Books.created_at.desc(), Books.book_id.desc())
+        if cursor:
+            stmt = stmt.where(or_(Books.created_at < cursor["t"],
+                                  and_(Books.created_at == cursor["t"], Books.book_id < cursor["id"])))
+    else:
+        stmt = stmt.order_by(Books.book_id)
+        if cursor:
+            stmt = stmt.where(Books.book_id > cursor["id"])
+    if page and not cursor and limit is not None:
+        stmt = stmt.offset((page - 1) * limit)  # legacy page= clients; deep pages stay slow
+    rows = db.execute(stmt if limit is None else stmt.limit(limit + 1)).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, last.book_id, getattr(last, "created_at", None))
+
+    items = []
+    for r in rows:
+        m = r._mapping
+        item = {}
+        for f in wanted:
+            v = m[f]
+            item[f] = v.isoformat() if isinstance(v, datetime) else v
+        items.append(item)
+    return items, next_cursor
+
+
+def fetch_books(db, ids: list, fields=LIST_FIELDS) -> list:
+    """Books by primary key as dicts of `fields`, in the order of ids; missing ids are skipped."""
+    if not ids:
+        return []
+    columns = [getattr(Books, f) for f in dict.fromkeys(["book_id"] + list(fields))]
+    rows = db.execute(select(*columns).where(Books.book_id.in_(ids))).fetchall()
+    by_id = {}
+    for r in rows:
+        m = r._mapping
+        by_id[m["book_id"]] = {f: (m[f].isoformat() if isinstance(m[f], datetime) else m[f]) for f in fields}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def list_response(items: list, next_cursor: str, key: str = None):
+    """
+    Keeps each endpoint's existing body (a bare array, or {key: [...]}) and adds the next page as
+    X-Next-Cursor / Link headers (and `next_cursor` inside object bodies).
+    """
+    headers = {}
+    if next_cursor:
+        args = request.args.to_dict()
+        args.pop("page", None)
+        args["cursor"] = next_cursor
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    body = {key: items, "next_cursor": next_cursor} if key else items
+    return jsonify(body), 200, headers
+
+
+# ----------------- Category tree -----------------
+def _etag(body) -> str:
+    # derived from the content, so every worker hands out the same tag for the same tree
+    return '"' + sha1(json.dumps(body, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:20] + '"'
+
+
+def _load_metadata(db):
+    """{main: [subs]} plus {main: {"total": n, "sub_categories": {sub: n}}} from one GROUP BY."""
+    rows = db.execute(
+        select(Books.main_category, Books.sub_category, func.count())
+        .group_by(Books.main_category, Books.sub_category)
+    ).fetchall()
+    tree, counts = {}, {}
+    for main_cat, sub_cat, n in rows:
+        if main_cat is None:
+            continue  # uncategorized uploads (a None key also breaks sorted JSON output)
+        subs = tree.setdefault(main_cat, {})  # dict keys: ordered, O(1) dedupe
+        entry = counts.setdefault(main_cat, {"total": 0, "sub_categories": {}})
+        entry["total"] += n
+        if sub_cat:
+            subs[sub_cat] = None
+            entry["sub_categories"][sub_cat] = entry["sub_categories"].get(sub_cat, 0) + n
+    tree = {main_cat: list(subs) for main_cat, subs in tree.items()}
+    return tree, counts
+
+
+def catalog_metadata(db_factory) -> dict:
+    """Cached category tree and counts for the current catalog version: {version, tree, counts, etags}."""
+    global _meta_cache
+    cached = _meta_cache
+    if cached and cached[0] == _version and time.time() - cached[1] < CATALOG_CACHE_SECONDS:
+        return {"version": cached[0], "tree": cached[2], "counts": cached[3], "etags": cached[4]}
+
+    version = _version
+    db = db_factory()
+    try:
+        tree, counts = _load_metadata(db)
+    finally:
+        db.close()
+    etags = {"tree": _etag(tree), "counts": _etag(counts)}
+    with _meta_lock:
+        if _version == version:  # a bump during the query leaves the cache empty
+            _meta_cache = (version, time.time(), tree, counts, etags)
+    return {"version": version, "tree": tree, "counts": counts, "etags": etags}
+
+
+def conditional_response(body, etag: str, max_age: int = 0):
+    """JSON with an ETag; 304 with no body when the client's If-None-Match already has it."""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}, must-revalidate"}
+    sent = {t.strip().removeprefix("W/") for t in (request.headers.get("If-None-Match") or "").split(",")}
+    if etag in sent or "*" in sent:
+        return "", 304, headers
+    return jsonify(body), 200, headers
@@ -0,0 +1,229 @@
+import os, json, time, tempfile, threading
+from hashlib import sha256
+from contextlib import contextmanager
+
+try:
+    import fcntl  # POSIX only; on Windows we fall back to in-process locking
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = os.getenv("COALESCE_DIR", os.path.join(tempfile.gettempdir(), "kotubrief-locks"))
+LOCK_WAIT_SECONDS = int(os.getenv("COALESCE_WAIT_SECONDS", 180))
+RESULT_MAX_AGE = 3600  # shared result files and idle lock files older than this are pruned
+PRUNE_EVERY = 200
+
+_guard = threading.Lock()
+_thread_locks = {}   # "namespace:key" -> [Lock, refcount]
+_inflight = {}       # key -> _Flight
+_stats = {"calls": 0, "coalesced_local": 0, "coalesced_remote": 0, "errors": 0}
+_acquired = 0  # lock_dir is pruned every PRUNE_EVERY acquisitions
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# ----------------- Helpers -----------------
+def make_key(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _bump(name: str, n: int = 1):
+    with _guard:
+        _stats[name] += n
+
+
+def coalesce_stats() -> dict:
+    with _guard:
+        return {**_stats, "inflight": len(_inflight), "pid": os.getpid()}
+
+
+def _path(namespace: str, key: str, suffix: str) -> str:
+    d = os.path.join(LOCK_DIR, namespace)
+    os.makedirs(d, exist_ok=True)
+    return os.path.join(d, f"{key}{suffix}")
+
+
+# ----------------- Locks -----------------
+class LockTimeout(TimeoutError):
+    """The lock for a key was not acquired within the timeout."""
+
+
+def _lock_file(namespace: str, key: str, deadline: float):
+    """Open and flock the key's lock file; None on timeout. Retries if prune_lock_dir unlinked it meanwhile."""
+    path = _path(namespace, key, ".lock")
+    while True:
+        fh = open(path, "a")
+        while True:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    fh.close()
+                    return None
+                time.sleep(0.05)
+        try:
+            if os.fstat(fh.fileno()).st_ino == os.stat(path).st_ino:
+                return fh
+        except FileNotFoundError:
+            pass
+        fh.close()  # locked an unlinked file: someone else may hold the new one
+
+
+@contextmanager
+def key_lock(namespace: str, key: str, timeout: int = LOCK_WAIT_SECONDS):
+    """
+    Exclusive lock for one key, across threads and (via flock) across gunicorn workers.
+    Yields True if the cross-process lock is held, False where flock is unavailable (Windows).
+    Raises LockTimeout if either lock is not acquired within timeout.
+    """
+    global _acquired
+    name = f"{namespace}:{key}"
+    with _guard:
+        entry = _thread_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    lock = entry[0]
+    deadline = time.time() + timeout
+    got_thread, fh = False, None
+    try:
+        got_thread = lock.acquire(timeout=timeout)
+        if not got_thread:
+            raise LockTimeout(f"Timed out waiting for lock {name}")
+        if fcntl is not None:
+            fh = _lock_file(namespace, key, deadline)
+            if fh is None:
+                raise LockTimeout(f"Timed out waiting for lock {name}")
+        yield fh is not None
+    finally:
+        if fh is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            fh.close()
+        if got_thread:
+            lock.release()
+        with _guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _thread_locks.pop(name, None)
+            _acquired += 1
+            prune = _acquired % PRUNE_EVERY == 0
+        if prune:
+            prune_lock_dir()
+
+
+# ----------------- Shared results (cross-worker) -----------------
+def _read_result(key: str, since: float):
+    try:
+        with open(_path("llm", key, ".json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # only reuse a result that finished while we were waiting for the lock
+    return data if data.get("finished_at", 0) >= since else None
+
+
+def _write_result(key: str, value):
+    final = _path("llm", key, ".json")
+    tmp = f"{final}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"finished_at": time.time(), "value": value}, f)
+    os.replace(tmp, final)
+
+
+
+def prune_lock_dir(max_age: int = RESULT_MAX_AGE):
+    """Remove old shared results and idle lock files in every namespace (llm, tts, upload, ...)."""
+    cutoff = time.time() - max_age
+    try:
+        namespaces = os.listdir(LOCK_DIR)
+    except OSError:
+        return
+    for ns in namespaces:
+        directory = os.path.join(LOCK_DIR, ns)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            p = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(p) >= cutoff:
+                    continue
+                if name.endswith(".lock") and fcntl is not None:
+                    # only unlink a lock file nobody holds; _lock_file notices an unlink that races with it
+                    with open(p, "a") as fh:
+                        try:
+                            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue
+                        os.remove(p)
+                else:
+                    os.remove(p)
+            except OSError:
+                pass
+
+
+def _run_across_processes(key: str, fn):
+    started = time.time()
+    entered = False
+    try:
+        with key_lock("llm", key) as locked:
+            entered = True
+            if locked:
+                shared = _read_result(key, started)
+                if shared is not None:
+                    _bump("coalesced_remote")
+                    return shared["value"]
+
+            value = fn()
+            _bump("calls")
+            if locked:
+                try:
+                    _write_result(key, value)
+                except (OSError, TypeError) as e:
+                    print("Coalesce result write failed:", e)
+            return value
+    except LockTimeout:
+        if entered:
+            raise
+    # another caller held this key for LOCK_WAIT_SECONDS: run uncoalesced rather than fail the request
+    print("Coalesce lock timed out, running uncoalesced:", key[:12])
+    value = fn()
+    _bump("calls")
+    return value
+
+
+# ----------------- Single flight -----------------
+def single_flight(key: str, fn):
+    """
+    Run fn() once for all concurrent callers with the same key and share its result.
+    Results must be JSON-serializable so waiters in other worker processes can reuse them.
+    """
+    with _guard:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        _bump("coalesced_local")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _run_across_processes(key, fn)
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        _bump("errors")
+        raise
+    finally:
+        with _guard:
+            _inflight.pop(key, None)
+        flight.done.set()
@@ -0,0 +1,225 @@
+import os, json, time, threading, tempfile
+from hashlib import sha256
+
+from extractors import EXTRACTOR_VERSION
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", os.path.join(BASE_DIR, "uploads", "extract_cache"))
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", 256 * 1024 ** 2))  # LRU byte budget
+EXTRACT_CACHE_LOW_WATER = 0.9  # eviction frees down to this share of the budget, so it runs rarely
+EXTRACT_CACHE_RESYNC_PUTS = 500  # puts between rescans (other workers write to the same directory)
+EXTRACTED_MAX_BYTES = int(os.getenv("EXTRACTED_MAX_BYTES", 1024 ** 3))  # full texts from mode=full
+EXTRACTED_MAX_AGE_SECONDS = int(os.getenv("EXTRACTED_MAX_AGE_SECONDS", 7 * 24 * 3600))  # since last read
+EXTRACTED_PRUNE_EVERY = 50  # text writes between directory scans
+UPLOAD_CHUNK = 1024 * 1024
+os.makedirs(EXTRACT_CACHE_DIR, exist_ok=True)
+
+_guard = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_text_writes = 0
+_size = None  # running total of cache bytes as seen by this process; None = rescan on next put
+_puts = 0
+
+
+# ----------------- Uploads -----------------
+def save_upload_hashed(file_storage, dest_dir: str, ext: str) -> tuple:
+    """
+    Store an upload in dest_dir as <sha256>.<ext>, hashing it while it is copied to a private temp file,
+    so concurrent uploads with the same filename never overwrite each other (identical content is stored
+    once). Returns (digest, path).
+    """
+    h = sha256()
+    stream = file_storage.stream
+    fd, tmp = tempfile.mkstemp(dir=dest_dir, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+    digest = h.hexdigest()
+    path = os.path.join(dest_dir, f"{digest}.{ext}")
+    if os.path.exists(path):
+        os.remove(tmp)  # same bytes uploaded before: keep the stored copy
+    else:
+        os.replace(tmp, path)
+    return digest, path
+
+
+# ----------------- Cache -----------------
+def cache_key(digest: str, ext: str, variant: str) -> str:
+    """Results are keyed by (content hash, extractor version), plus how they were extracted."""
+    return f"{digest}-{ext}-v{EXTRACTOR_VERSION}-{variant}"
+
+
+def _path(key: str) -> str:
+    return os.path.join(EXTRACT_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _bump(name: str):
+    with _guard:
+        _stats[name] += 1
+
+
+def cache_get(key: str):
+    path = _path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+    except (OSError, ValueError):
+        _bump("misses")
+        return None
+    try:
+        os.utime(path)  # mtime doubles as last-access time for LRU
+    except OSError:
+        pass
+    _bump("hits")
+    return value
+
+
+def cache_put(key: str, value: dict):
+    global _size, _puts
+    path = _path(key)
+    data = json.dumps(value).encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        print("Extraction cache write failed:", e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return
+    # the directory is only listed when the running total says the budget is exceeded, or to resync
+    with _guard:
+        _puts += 1
+        if _size is not None and _puts % EXTRACT_CACHE_RESYNC_PUTS:
+            _size += len(data) - replaced
+        else:
+            _size = None
+        due = _size is None or _size > EXTRACT_CACHE_MAX_BYTES
+    if due:
+        evict(int(EXTRACT_CACHE_MAX_BYTES * EXTRACT_CACHE_LOW_WATER), EXTRACT_CACHE_MAX_BYTES)
+
+
+def _entries():
+    for shard in os.scandir(EXTRACT_CACHE_DIR):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if entry.name.endswith(".json"):
+                st = entry.stat()
+                yield entry.path, st.st_size, st.st_mtime
+
+
+def evict(max_bytes: int = EXTRACT_CACHE_MAX_BYTES, trigger_bytes: int = None) -> int:
+    """
+    Drop least-recently-used entries until the cache fits max_bytes, if it is over trigger_bytes
+    (default: max_bytes). Returns bytes freed. Resets the running total to what is left.
+    """
+    global _size
+    entries = list(_entries())
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    if total <= (max_bytes if trigger_bytes is None else trigger_bytes):
+        with _guard:
+            _size = total
+        return 0
+    for path, size, _ in sorted(entries, key=lambda e: e[2]):
+        if total - freed <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            freed += size
+            _bump("evictions")
+        except OSError:
+            pass
+    with _guard:
+        _size = total - freed
+    return freed
+
+
+# ----------------- Extracted texts -----------------
+def save_text(path: str, text: str):
+    """Write a full extracted text atomically; the first and every EXTRACTED_PRUNE_EVERY-th write prunes its directory."""
+    global _text_writes
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    with _guard:
+        _text_writes += 1
+        due = _text_writes % EXTRACTED_PRUNE_EVERY == 1
+    if due:
+        prune_texts(os.path.dirname(path))
+
+
+def touch_text(path: str) -> bool:
+    """Mark a text as read (mtime is its last-access time). False if it was pruned."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def prune_texts(directory: str, max_bytes: int = EXTRACTED_MAX_BYTES,
+                max_age: int = EXTRACTED_MAX_AGE_SECONDS) -> int:
+    """Delete texts not read for max_age, then least-recently-read ones until max_bytes fits. Returns bytes freed."""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".txt"):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((entry.path, st.st_size, st.st_mtime))
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - max_age
+    freed = 0
+    for path, size, mtime in sorted(entries, key=lambda e: e[2]):
+        if mtime >= cutoff and total - freed <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+
+def cache_stats() -> dict:
+    entries = list(_entries())
+    with _guard:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+        "entries": len(entries),
+        "bytes": sum(size for _, size, _ in entries),
+        "max_bytes": EXTRACT_CACHE_MAX_BYTES,
+        "extractor_version": EXTRACTOR_VERSION,
+        "pid": os.getpid(),
+    }
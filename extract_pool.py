@@ -0,0 +1,345 @@
+import os, time, signal, threading, multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock timeout applies
+    resource = None
+
+from extractors import EXTRACTORS, PDF_PARALLEL_MIN_PAGES, iter_units, extract_preview, extract_pdf_pages, \
+    iter_pdf_pages, pdf_page_count, _page_ranges
+
+EXTRACT_POOL_WORKERS = int(os.getenv("EXTRACT_POOL_WORKERS", os.cpu_count() or 1))
+EXTRACT_MEMORY_MB = int(os.getenv("EXTRACT_MEMORY_MB", 2048))  # RLIMIT_AS per worker process
+EXTRACT_CPU_SECONDS = int(os.getenv("EXTRACT_CPU_SECONDS", 120))  # CPU time per job
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", 180))  # wall clock per job
+EXTRACT_MAX_JOBS_PER_WORKER = int(os.getenv("EXTRACT_MAX_JOBS_PER_WORKER", 50))  # then the worker is replaced
+EXTRACT_QUEUE_SECONDS = float(os.getenv("EXTRACT_QUEUE_SECONDS", 30))  # max wait for a free worker
+EXTRACT_PAGES_PER_JOB = int(os.getenv("EXTRACT_PAGES_PER_JOB", 200))  # PDFs run as page-range jobs of at most this
+
+
+class ExtractionError(Exception):
+    """The document could not be parsed (malformed, encrypted, ...)."""
+    status = 422
+
+
+class ExtractionLimitError(ExtractionError):
+    """A worker hit its memory, CPU or wall-clock limit and was replaced."""
+
+    def __init__(self, limit: str):
+        super().__init__(f"Document exceeded the {limit} limit for extraction")
+        self.limit = limit
+        self.status = 413 if limit == "memory" else 422
+
+
+class PoolBusyError(Exception):
+    """No worker became free within EXTRACT_QUEUE_SECONDS."""
+
+
+# ----------------- Worker process -----------------
+class _CPULimit(BaseException):
+    """BaseException so parsers' own `except Exception` wrappers can't swallow it."""
+
+
+def _on_sigxcpu(signum, frame):
+    raise _CPULimit()
+
+
+def _cpu_used() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _caused_by(exc: BaseException, kind: type) -> bool:
+    # pdfplumber re-raises parser failures (MemoryError included) wrapped in its own exception type
+    while exc is not None:
+        if isinstance(exc, kind):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def _run_job(kind: str, args: tuple, send):
+    # everything runs serially here: the pool itself provides the parallelism
+    if kind == "preview":
+        return extract_preview(*args)
+    if kind == "text":
+        filepath, ext = args
+        parts, n = [], 0
+        for n, unit in iter_units(filepath, ext, parallel=False):
+            parts.append(unit)
+        return {"text": EXTRACTORS[ext][1].join(parts), "units_read": n}
+    if kind == "units":
+        filepath, ext = args
+        n = 0
+        for n, unit in iter_units(filepath, ext, parallel=False):
+            send(("unit", n, unit))
+        return n
+    if kind == "pages":
+        return extract_pdf_pages(*args)
+    if kind == "page_units":
+        filepath, start, stop = args
+        n = start
+        for n, page in enumerate(iter_pdf_pages(filepath, start, stop), start=start + 1):
+            send(("unit", n, page))
+        return n
+    if kind == "count":
+        return pdf_page_count(*args)
+    raise ValueError(f"Unknown extraction job: {kind}")
+
+
+def _worker_main(conn, memory_mb: int, cpu_seconds: int):
+    if resource is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        kind, args = job
+        if resource is not None:
+            # RLIMIT_CPU counts the whole process lifetime, so each job gets "used so far + budget"
+            hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            resource.setrlimit(resource.RLIMIT_CPU, (int(_cpu_used()) + cpu_seconds + 1, hard))
+        try:
+            conn.send(("done", _run_job(kind, args, conn.send)))
+        except _CPULimit:
+            conn.send(("limit", "cpu"))
+            return
+        except Exception as e:
+            if _caused_by(e, MemoryError):
+                conn.send(("limit", "memory"))
+                return
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# ----------------- Pool -----------------
+class _Worker:
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, EXTRACT_MEMORY_MB, EXTRACT_CPU_SECONDS),
+                                   daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(5)
+        except Exception:
+            pass
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(5)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+_cond = threading.Condition()
+_idle = []
+_live = 0
+_stats = {
+    "busy": 0, "waiting": 0, "jobs": 0, "spawned": 0, "recycled": 0, "rejected": 0,
+    "errors": 0, "limit_memory": 0, "limit_cpu": 0, "limit_timeout": 0, "crashed": 0,
+    "wait_seconds_total": 0.0, "job_seconds_total": 0.0,
+}
+
+
+def _acquire(queue_timeout: float = EXTRACT_QUEUE_SECONDS) -> _Worker:
+    """queue_timeout=None waits as long as it takes (page ranges of a job that already got a worker)."""
+    global _live
+    t0 = time.monotonic()
+    worker, spawn = None, False
+    with _cond:
+        _stats["waiting"] += 1
+        try:
+            while True:
+                if _idle:
+                    worker = _idle.pop()
+                    break
+                if _live < EXTRACT_POOL_WORKERS:
+                    _live += 1
+                    spawn = True
+                    break
+                if queue_timeout is None:
+                    _cond.wait()
+                    continue
+                remaining = queue_timeout - (time.monotonic() - t0)
+                if remaining <= 0:
+                    _stats["rejected"] += 1
+                    raise PoolBusyError("All extraction workers are busy")
+                _cond.wait(remaining)
+        finally:
+            _stats["waiting"] -= 1
+    if spawn:
+        try:
+            worker = _Worker()
+        except Exception:
+            with _cond:
+                _live -= 1
+                _cond.notify()
+            raise
+    with _cond:
+        _stats["busy"] += 1
+        _stats["spawned"] += spawn
+        _stats["wait_seconds_total"] += time.monotonic() - t0
+    return worker
+
+
+def _release(worker: _Worker, healthy: bool):
+    global _live
+    worker.jobs += 1
+    recycle = healthy and worker.jobs >= EXTRACT_MAX_JOBS_PER_WORKER
+    with _cond:
+        _stats["busy"] -= 1
+        _stats["recycled"] += recycle
+        if healthy and not recycle:
+            _idle.append(worker)
+        else:
+            _live -= 1
+        _cond.notify()
+    if recycle:
+        worker.stop()
+    elif not healthy:
+        worker.kill()
+
+
+def _execute(kind: str, *args, queue_timeout: float = EXTRACT_QUEUE_SECONDS):
+    """
+    Generator: runs one job on a pool worker, yielding ("unit", n, text) messages as they arrive;
+    its return value is the job result. Limits surface as ExtractionLimitError, and the worker is replaced.
+    """
+    worker = _acquire(queue_timeout)
+    healthy = False
+    t0 = time.monotonic()
+    try:
+        worker.conn.send((kind, args))
+        deadline = t0 + EXTRACT_TIMEOUT_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not worker.conn.poll(remaining):
+                _count("limit_timeout")
+                raise ExtractionLimitError("time")
+            try:
+                msg = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.process.join(1)
+                code = worker.process.exitcode
+                _count("crashed")
+                # SIGKILL mid-job is the kernel's OOM killer; SIGXCPU a CPU limit the handler couldn't catch
+                if code == -signal.SIGKILL:
+                    raise ExtractionLimitError("memory")
+                if code == -signal.SIGXCPU:
+                    raise ExtractionLimitError("cpu")
+                raise ExtractionError(f"Extraction worker exited unexpectedly (code {code})")
+            if msg[0] == "unit":
+                # the clock stops while the consumer holds the generator (a slow client is not the document's fault)
+                suspended = time.monotonic()
+                yield msg
+                deadline += time.monotonic() - suspended
+                continue
+            if msg[0] == "limit":
+                _count(f"limit_{msg[1]}")
+                raise ExtractionLimitError(msg[1])
+            healthy = True
+            if msg[0] == "error":
+                _count("errors")
+                raise ExtractionError(msg[1])
+            return msg[1]
+    finally:
+        # a consumer that stops early (client disconnect) leaves the job running: healthy stays False
+        with _cond:
+            _stats["jobs"] += 1
+            _stats["job_seconds_total"] += time.monotonic() - t0
+        _release(worker, healthy)
+
+
+def _count(name: str):
+    with _cond:
+        _stats[name] += 1
+
+
+def run_extraction(kind: str, *args, queue_timeout: float = EXTRACT_QUEUE_SECONDS):
+    gen = _execute(kind, *args, queue_timeout=queue_timeout)
+    while True:
+        try:
+            next(gen)
+        except StopIteration as stop:
+            return stop.value
+
+
+# ----------------- Public API -----------------
+def isolated_preview(filepath: str, ext: str, max_chars: int = 5000, max_units: int = None) -> dict:
+    return run_extraction("preview", filepath, ext, max_chars, max_units)
+
+
+def _pdf_ranges(n: int, parts: int = 1) -> list:
+    """At least `parts` page ranges, none longer than EXTRACT_PAGES_PER_JOB pages."""
+    return _page_ranges(n, max(parts, -(-n // EXTRACT_PAGES_PER_JOB)))
+
+
+def isolated_document(filepath: str, ext: str) -> dict:
+    """
+    Whole-document text plus the number of units (pages, slides, ...) read. PDFs always run as page-range
+    jobs, each with its own CPU and wall-clock budget, so a long book fits the limits even on one worker;
+    large ones are spread across the pool's workers.
+    Only the first job waits at most EXTRACT_QUEUE_SECONDS for a worker: the ranges of a document that
+    is already being extracted queue behind other work rather than fail it with PoolBusyError.
+    """
+    if ext == "pdf":
+        n = run_extraction("count", filepath)
+        ranges = _pdf_ranges(n, EXTRACT_POOL_WORKERS if n >= PDF_PARALLEL_MIN_PAGES else 1)
+
+        def pages(r):
+            return run_extraction("pages", filepath, *r, queue_timeout=None)
+
+        if len(ranges) <= 1:
+            return {"text": "\n".join(pages(ranges[0])) if ranges else "", "units_read": n}
+        with ThreadPoolExecutor(max_workers=min(len(ranges), EXTRACT_POOL_WORKERS)) as ex:
+            chunks = list(ex.map(pages, ranges))
+        return {"text": "\n".join(page for chunk in chunks for page in chunk), "units_read": n}
+    return run_extraction("text", filepath, ext)
+
+
+def isolated_units(filepath: str, ext: str):
+    """Like extractors.iter_units, but parsed in a pool worker and relayed unit by unit."""
+    if ext == "pdf":
+        for start, stop in _pdf_ranges(run_extraction("count", filepath)):
+            for _, n, unit in _execute("page_units", filepath, start, stop, queue_timeout=None):
+                yield n, unit
+        return
+    for _, n, unit in _execute("units", filepath, ext):
+        yield n, unit
+
+
+def pool_stats() -> dict:
+    with _cond:
+        stats = dict(_stats)
+        live, idle = _live, len(_idle)
+    jobs = stats["jobs"] or 1
+    wait, busy_time = stats.pop("wait_seconds_total"), stats.pop("job_seconds_total")
+    return {
+        **stats,
+        "workers": EXTRACT_POOL_WORKERS,
+        "live": live,
+        "idle": idle,
+        "saturation": round(stats["busy"] / EXTRACT_POOL_WORKERS, 3),
+        "avg_wait_ms": round(wait / jobs * 1000, 1),
+        "avg_job_ms": round(busy_time / jobs * 1000, 1),
+        "limits": {
+            "memory_mb": EXTRACT_MEMORY_MB,
+            "cpu_seconds": EXTRACT_CPU_SECONDS,
+            "timeout_seconds": EXTRACT_TIMEOUT_SECONDS,
+            "pages_per_job": EXTRACT_PAGES_PER_JOB,
+            "max_jobs_per_worker": EXTRACT_MAX_JOBS_PER_WORKER,
+        },
+    }
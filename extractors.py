@@ -0,0 +1,310 @@
+import os
+import zipfile
+import posixpath
+import multiprocessing
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+import docx
+from pptx import Presentation
+from openpyxl import load_workbook
+from ebooklib import epub, ITEM_DOCUMENT
+from lxml import etree
+
+EXTRACTOR_VERSION = 3  # bump whenever any extractor's output changes; invalidates cached extractions
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 16))  # below this a pool costs more than it saves
+
+DOCX_PARAGRAPHS_PER_UNIT = 50
+XLSX_ROWS_PER_UNIT = 500
+TXT_CHARS_PER_UNIT = 64 * 1024
+EPUB_FEED_BYTES = 64 * 1024
+
+_pools = {}
+
+
+# ----------------- Helpers -----------------
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    # "spawn" keeps workers clean of the parent's threads, DB connections and sockets
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return pool
+
+
+def _page_ranges(n: int, parts: int) -> list:
+    size, extra = divmod(n, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class _TextCollector:
+    """lxml parser target: keeps only text, drops script/style/head, breaks lines after block elements."""
+    SKIP = {"script", "style", "head"}
+    BLOCK = {"p", "div", "li", "tr", "br", "section", "article", "blockquote", "pre", "dt", "dd",
+             "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        self.parts = []
+        self.skip = 0
+
+    def start(self, tag, attrib):
+        if _local(tag) in self.SKIP:
+            self.skip += 1
+
+    def end(self, tag):
+        tag = _local(tag)
+        if tag in self.SKIP:
+            self.skip -= 1
+        elif tag in self.BLOCK:
+            self.parts.append("\n")
+
+    def data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+    def close(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+def strip_markup(chunks) -> str:
+    """Plain text of an (X)HTML document fed to lxml incrementally as byte chunks; no tree is built."""
+    parser = etree.HTMLParser(target=_TextCollector(), encoding="utf-8")
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def _epub_spine(zf: zipfile.ZipFile) -> list:
+    """Archive paths of the content documents, in reading (spine) order."""
+    container = etree.fromstring(zf.read("META-INF/container.xml"))
+    rootfile = container.find(".//{urn:oasis:names:tc:opendocument:xmlns:container}rootfile")
+    opf_path = rootfile.get("full-path")
+    opf = etree.fromstring(zf.read(opf_path))
+    ns = {"opf": "http://www.idpf.org/2007/opf"}
+    base = posixpath.dirname(opf_path)
+    manifest = {
+        item.get("id"): (item.get("href"), item.get("media-type"))
+        for item in opf.iterfind(".//opf:manifest/opf:item", ns)
+    }
+    paths = []
+    for ref in opf.iterfind(".//opf:spine/opf:itemref", ns):
+        href, media = manifest.get(ref.get("idref"), (None, None))
+        if href and media in ("application/xhtml+xml", "text/html"):
+            paths.append(posixpath.normpath(posixpath.join(base, unquote(href))))
+    return paths
+
+
+def _iter_zip_member(zf: zipfile.ZipFile, name: str):
+    with zf.open(name) as f:
+        while True:
+            chunk = f.read(EPUB_FEED_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+def pdf_page_count(filepath: str) -> int:
+    with pdfplumber.open(filepath) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(filepath: str, start: int, stop: int):
+    """Text of pages [start, stop), page by page. Runs inside pool workers, each opening the file itself."""
+    with pdfplumber.open(filepath) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text() or ""
+            page.close()  # drop cached layout objects so memory stays flat on long slices
+
+
+def extract_pdf_pages(filepath: str, start: int, stop: int) -> list:
+    return list(iter_pdf_pages(filepath, start, stop))
+
+
+# ----------------- Unit generators -----------------
+# Every iter_text_from_* yields the document as a sequence of text units
+# (page, paragraph block, slide, sheet row block, chapter) without building the whole text.
+
+def iter_text_from_pdf(filepath: str, workers: int = None):
+    """One unit per page. Large files are split across a process pool; pages still come out in order."""
+    workers = PDF_WORKERS if workers is None else workers
+    n = pdf_page_count(filepath)
+
+    if workers <= 1 or n < PDF_PARALLEL_MIN_PAGES:
+        with pdfplumber.open(filepath) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+                page.close()  # drop cached layout objects so memory stays flat
+        return
+
+    # a tiny first slice so streaming callers get page 1 right away, then a few slices per
+    # worker so one slow slice (images, dense tables) doesn't hold up the rest
+    head = min(2, n)
+    ranges = [(0, head)] + [(a + head, b + head) for a, b in _page_ranges(n - head, workers * 4)]
+    pool = _get_pool(workers)
+    for chunk in pool.map(extract_pdf_pages, [filepath] * len(ranges), *zip(*ranges)):
+        yield from chunk
+
+
+def iter_text_from_docx(filepath: str):
+    """DOCX has no pages; one unit per block of paragraphs."""
+    doc = docx.Document(filepath)
+    block = []
+    for p in doc.paragraphs:
+        block.append(p.text)
+        if len(block) >= DOCX_PARAGRAPHS_PER_UNIT:
+            yield "\n".join(block)
+            block = []
+    if block:
+        yield "\n".join(block)
+
+
+def iter_text_from_txt(filepath: str):
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            chunk = f.read(TXT_CHARS_PER_UNIT)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_text_from_pptx(filepath: str):
+    """One unit per slide."""
+    prs = Presentation(filepath)
+    for slide in prs.slides:
+        texts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+        if texts:
+            yield "\n".join(texts)
+
+
+def iter_text_from_xlsx(filepath: str):
+    """One unit per block of non-empty rows. Read-only mode streams rows from the sheet XML instead of building every cell."""
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        block = []
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                row_text = " ".join([str(cell) for cell in row if cell])
+                if row_text.strip():
+                    block.append(row_text)
+                if len(block) >= XLSX_ROWS_PER_UNIT:
+                    yield "\n".join(block)
+                    block = []
+        if block:
+            yield "\n".join(block)
+    finally:
+        wb.close()  # read-only workbooks keep the archive open
+
+
+def iter_text_from_epub(filepath: str):
+    """
+    One unit per chapter, in spine (reading) order, as plain text. Chapters are streamed out of the
+    zip straight into lxml; ebooklib is only used for archives whose container/OPF we can't read.
+    """
+    try:
+        zf = zipfile.ZipFile(filepath)
+    except zipfile.BadZipFile:
+        zf = None
+    if zf is not None:
+        with zf:
+            try:
+                paths = _epub_spine(zf)
+            except (KeyError, AttributeError, etree.XMLSyntaxError):
+                paths = None
+            if paths is not None:
+                for path in paths:
+                    try:
+                        text = strip_markup(_iter_zip_member(zf, path))
+                    except (KeyError, etree.LxmlError) as e:
+                        print("EPUB chapter skipped:", path, e)
+                        continue
+                    if text:
+                        yield text
+                return
+
+    book = epub.read_epub(filepath)
+    for item in book.get_items():
+        if item.get_type() == ITEM_DOCUMENT:
+            text = strip_markup([item.get_content()])
+            if text:
+                yield text
+
+
+# extension -> (unit generator, separator used to join units back into one text)
+EXTRACTORS = {
+    "pdf": (iter_text_from_pdf, "\n"),
+    "docx": (iter_text_from_docx, "\n"),
+    "txt": (iter_text_from_txt, ""),
+    "pptx": (iter_text_from_pptx, "\n"),
+    "xlsx": (iter_text_from_xlsx, "\n"),
+    "epub": (iter_text_from_epub, "\n"),
+}
+
+
+def iter_units(filepath: str, ext: str, parallel: bool = True):
+    """Common interface: yield (unit_number, text) starting at 1."""
+    gen, _ = EXTRACTORS[ext]
+    units = gen(filepath) if parallel or ext != "pdf" else iter_text_from_pdf(filepath, workers=1)
+    for n, unit in enumerate(units, start=1):
+        yield n, unit
+
+
+def extract_preview(filepath: str, ext: str, max_chars: int = 5000, max_units: int = None) -> dict:
+    """
+    Extract only until max_chars (or max_units) is reached, then stop parsing.
+    Pages are read in order on one core: for a preview the first pages are all we need.
+    """
+    _, sep = EXTRACTORS[ext]
+    parts, size, units_read, truncated = [], 0, 0, False
+    units = iter_units(filepath, ext, parallel=False)
+    try:
+        for units_read, unit in units:
+            parts.append(unit)
+            size += len(unit) + len(sep)
+            if size > max_chars or (max_units and units_read >= max_units):
+                # budget reached: truncated if we cut text or there is at least one more unit
+                truncated = size - len(sep) > max_chars or next(units, None) is not None
+                break
+    finally:
+        units.close()
+
+    text = sep.join(parts)
+    return {"text": text[:max_chars], "truncated": truncated or len(text) > max_chars, "units_read": units_read}
+
+
+def extract_document_text(filepath: str, ext: str) -> str:
+    gen, sep = EXTRACTORS[ext]
+    return sep.join(gen(filepath))
+
+
+# ----------------- Whole-document wrappers -----------------
+def extract_text_from_pdf(filepath: str, workers: int = None) -> str:
+    return "\n".join(iter_text_from_pdf(filepath, workers)).strip()
+
+def extract_text_from_docx(filepath):
+    return extract_document_text(filepath, "docx")
+
+def extract_text_from_txt(filepath):
+    return extract_document_text(filepath, "txt")
+
+def extract_text_from_pptx(filepath):
+    return extract_document_text(filepath, "pptx")
+
+def extract_text_from_xlsx(filepath):
+    return extract_document_text(filepath, "xlsx")
+
+def extract_text_from_epub(filepath):
+    return extract_document_text(filepath, "epub")
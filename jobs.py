@@ -0,0 +1,202 @@
+import os, json, time, uuid, socket, threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from Config import Session
+from Model import Jobs
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", 900))  # running jobs without a heartbeat for this long are requeued
+JOB_HEARTBEAT_SECONDS = max(1.0, JOB_STALE_SECONDS / 6)  # while a handler runs, even inside one long stage
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+_handlers = {}
+
+
+# ----------------- Registry -----------------
+def register_job(kind: str):
+    """Decorator: handler(payload: dict, progress(pct, stage)) -> JSON-serializable result."""
+    def deco(fn):
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+
+# ----------------- Helpers -----------------
+def _job_to_dict(j: Jobs) -> dict:
+    return {
+        "job_id": j.job_id,
+        "kind": j.kind,
+        "status": j.status,
+        "progress": j.progress,
+        "stage": j.stage,
+        "result": json.loads(j.result) if j.result else None,
+        "error": j.error,
+        "attempts": j.attempts,
+        "created_at": j.created_at.isoformat() if j.created_at else None,
+        "updated_at": j.updated_at.isoformat() if j.updated_at else None,
+    }
+
+
+def _set(job_id: str, lease: str = None, **fields) -> bool:
+    """
+    Update a job. With a lease, only while that claim still owns the running job: a worker whose job
+    was requeued (and maybe claimed by someone else) can no longer overwrite it. Returns whether a row changed.
+    """
+    fields["updated_at"] = datetime.utcnow()
+    db = Session()
+    try:
+        where = [Jobs.job_id == job_id]
+        if lease:
+            where += [Jobs.worker_id == lease, Jobs.status == "running"]
+        res = db.execute(update(Jobs).where(*where).values(**fields))
+        db.commit()
+        return res.rowcount == 1
+    except Exception as e:
+        db.rollback()
+        print("Job update failed:", e)
+        return False
+    finally:
+        db.close()
+
+
+# ----------------- Queue API -----------------
+def enqueue_job(kind: str, payload: dict) -> str:
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job_id = str(uuid.uuid4())
+    db = Session()
+    try:
+        db.add(Jobs(job_id=job_id, kind=kind, status="queued", progress=0, stage="queued",
+                    payload=json.dumps(payload), created_at=datetime.utcnow(), updated_at=datetime.utcnow()))
+        db.commit()
+        return job_id
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_job(job_id: str):
+    db = Session()
+    try:
+        job = db.query(Jobs).filter(Jobs.job_id == job_id).first()
+        return _job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def _requeue_stale():
+    """Jobs left 'running' by a dead worker go back to the queue (or fail after JOB_MAX_ATTEMPTS)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    db = Session()
+    try:
+        stale = Jobs.status == "running", Jobs.heartbeat_at < cutoff
+        db.execute(update(Jobs).where(*stale, Jobs.attempts >= JOB_MAX_ATTEMPTS)
+                   .values(status="failed", error="Worker lost", updated_at=datetime.utcnow()))
+        # clearing worker_id revokes the old lease, so a late finish from the lost worker is discarded
+        db.execute(update(Jobs).where(*stale)
+                   .values(status="queued", stage="requeued", worker_id=None, updated_at=datetime.utcnow()))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("Job requeue failed:", e)
+    finally:
+        db.close()
+
+
+def _claim_next(worker_id: str):
+    """
+    Atomically move the oldest queued job to 'running'. Safe across processes: the UPDATE only wins once.
+    Each claim stores a fresh lease (worker id + token) in worker_id; returns (job_id, kind, payload, lease).
+    """
+    db = Session()
+    try:
+        candidates = (
+            db.query(Jobs.job_id)
+            .filter(Jobs.status == "queued")
+            .order_by(Jobs.created_at)
+            .limit(5)
+            .all()
+        )
+        for (job_id,) in candidates:
+            now = datetime.utcnow()
+            lease = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+            res = db.execute(
+                update(Jobs)
+                .where(Jobs.job_id == job_id, Jobs.status == "queued")
+                .values(status="running", worker_id=lease, attempts=Jobs.attempts + 1,
+                        heartbeat_at=now, updated_at=now, stage="started")
+            )
+            db.commit()
+            if res.rowcount == 1:
+                job = db.query(Jobs).filter(Jobs.job_id == job_id).first()
+                return job.job_id, job.kind, json.loads(job.payload or "{}"), lease
+        return None
+    except Exception as e:
+        db.rollback()
+        print("Job claim failed:", e)
+        return None
+    finally:
+        db.close()
+
+
+def _heartbeat(job_id: str, lease: str, done: threading.Event):
+    while not done.wait(JOB_HEARTBEAT_SECONDS):
+        if not _set(job_id, lease, heartbeat_at=datetime.utcnow()):
+            print(f"Job {job_id} lost its lease (requeued); its result will be discarded")
+            return
+
+
+def _run_one(job_id: str, kind: str, payload: dict, lease: str):
+    def progress(pct: int, stage: str = None):
+        _set(job_id, lease, progress=int(pct), stage=stage, heartbeat_at=datetime.utcnow())
+
+    done = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, lease, done), daemon=True).start()
+    try:
+        result = _handlers[kind](payload, progress)
+        finished = _set(job_id, lease, status="done", progress=100, stage="done", result=json.dumps(result))
+    except Exception as e:
+        print(f"Job {job_id} ({kind}) failed:", e)
+        finished = _set(job_id, lease, status="failed", stage="failed", error=str(e))
+    finally:
+        done.set()
+    if not finished:
+        print(f"Job {job_id} ({kind}) finished after losing its lease; result not saved")
+
+
+# ----------------- Worker -----------------
+def _worker_loop(worker_id: str, stop: threading.Event):
+    while not stop.is_set():
+        claimed = _claim_next(worker_id)
+        if not claimed:
+            stop.wait(JOB_POLL_SECONDS)
+            continue
+        _run_one(*claimed)
+
+
+def start_workers(concurrency: int = JOB_WORKERS) -> threading.Event:
+    """Start worker threads in this process. Set the returned event to stop them."""
+    stop = threading.Event()
+    _requeue_stale()
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    for i in range(concurrency):
+        threading.Thread(target=_worker_loop, args=(f"{base}:{i}", stop), daemon=True).start()
+    return stop
+
+
+def run_worker(concurrency: int = JOB_WORKERS):
+    """Blocking entry point for the dedicated worker process."""
+    print(f"Job worker started with {concurrency} threads, handlers: {sorted(_handlers)}")
+    stop = start_workers(concurrency)
+    try:
+        while True:
+            time.sleep(JOB_STALE_SECONDS / 3)
+            _requeue_stale()
+    except KeyboardInterrupt:
+        stop.set()
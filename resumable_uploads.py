@@ -0,0 +1,218 @@
+import os, re, json, time, uuid, shutil, threading, tempfile
+from hashlib import sha256
+from contextlib import contextmanager
+
+from coalesce import key_lock, LockTimeout
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESUMABLE_DIR = os.getenv("RESUMABLE_DIR", os.path.join(BASE_DIR, "uploads", "resumable"))
+RESUMABLE_MAX_BYTES = int(os.getenv("RESUMABLE_MAX_BYTES", 512 * 1024 ** 2))
+RESUMABLE_TTL_SECONDS = int(os.getenv("RESUMABLE_TTL_SECONDS", 24 * 3600))  # partial uploads idle this long are removed
+RESUMABLE_CLEANUP_INTERVAL = 600
+WRITE_CHUNK = 1024 * 1024
+os.makedirs(RESUMABLE_DIR, exist_ok=True)
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400, offset: int = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+# sha256 state for uploads appended by this process: {upload_id: (offset, hash)}.
+# Another process (or a restart) has no state for an upload and re-hashes the file on finalize.
+_hashes = {}
+_hashes_guard = threading.Lock()
+_last_cleanup = 0.0
+
+
+# ----------------- Helpers -----------------
+@contextmanager
+def _upload_lock(upload_id: str):
+    try:
+        with key_lock("upload", upload_id):
+            yield
+    except LockTimeout:
+        raise UploadError("Upload is busy with another request", 409)
+
+
+def _paths(upload_id: str):
+    if not _ID.fullmatch(upload_id or ""):
+        raise UploadError("Invalid upload id", 400)
+    base = os.path.join(RESUMABLE_DIR, upload_id)
+    return base + ".part", base + ".json"
+
+
+def _read_meta(upload_id: str) -> dict:
+    part, meta_path = _paths(upload_id)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        raise UploadError("Upload not found", 404)
+    meta["offset"] = os.path.getsize(part) if os.path.exists(part) else 0
+    return meta
+
+
+def _write_meta(meta: dict):
+    _, meta_path = _paths(meta["upload_id"])
+    fd, tmp = tempfile.mkstemp(dir=RESUMABLE_DIR, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in meta.items() if k != "offset"}, f)
+    os.replace(tmp, meta_path)
+
+
+def parse_content_range(header: str):
+    """'bytes 0-1048575/209715200' -> (0, 1048575, 209715200); total is None for '*'."""
+    m = _CONTENT_RANGE.fullmatch((header or "").strip())
+    if not m:
+        return None
+    start, end, total = int(m.group(1)), int(m.group(2)), m.group(3)
+    return start, end, None if total == "*" else int(total)
+
+
+# ----------------- Upload API -----------------
+def create_upload(filename: str, size: int = None) -> dict:
+    if size is not None and size > RESUMABLE_MAX_BYTES:
+        raise UploadError(f"File too large (max {RESUMABLE_MAX_BYTES} bytes)", 413)
+    cleanup_stale_uploads(throttle=True)
+
+    upload_id = uuid.uuid4().hex
+    part, _ = _paths(upload_id)
+    open(part, "wb").close()
+    meta = {"upload_id": upload_id, "filename": filename, "size": size, "created_at": time.time(), "offset": 0}
+    _write_meta(meta)
+    with _hashes_guard:
+        _hashes[upload_id] = (0, sha256())
+    return meta
+
+
+def get_upload(upload_id: str) -> dict:
+    return _read_meta(upload_id)
+
+
+def append_chunk(upload_id: str, start: int, stream, length: int, total: int = None) -> dict:
+    """
+    Append `length` bytes from stream at byte `start`, which must equal the current offset.
+    Bytes go straight to disk in WRITE_CHUNK pieces; a dropped connection keeps everything received so far.
+    """
+    part, _ = _paths(upload_id)
+    with _upload_lock(upload_id):
+        meta = _read_meta(upload_id)
+        if total is not None:
+            if meta["size"] is None:
+                meta["size"] = total
+                _write_meta(meta)
+            elif total != meta["size"]:
+                raise UploadError("Total size does not match the upload", 400, meta["offset"])
+        if start != meta["offset"]:
+            raise UploadError("Chunk does not start at the current offset", 409, meta["offset"])
+        limit = min(meta["size"] or RESUMABLE_MAX_BYTES, RESUMABLE_MAX_BYTES)
+        if start + length > limit:
+            raise UploadError(f"Upload exceeds its size (max {limit} bytes)", 413, meta["offset"])
+
+        with _hashes_guard:
+            state = _hashes.get(upload_id)
+        h = state[1] if state and state[0] == start else None
+
+        remaining, written = length, 0
+        try:
+            with open(part, "ab") as out:
+                while remaining > 0:
+                    chunk = stream.read(min(WRITE_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    if h is not None:
+                        h.update(chunk)
+                    remaining -= len(chunk)
+                    written += len(chunk)
+        finally:
+            with _hashes_guard:
+                if h is not None:
+                    _hashes[upload_id] = (start + written, h)
+                else:
+                    _hashes.pop(upload_id, None)
+            os.utime(_paths(upload_id)[1])  # activity marker for stale-upload cleanup
+
+        meta["offset"] = start + written
+        if remaining:
+            raise UploadError("Connection closed before the chunk was complete", 400, meta["offset"])
+        return meta
+
+
+def finalize_upload(upload_id: str, dest_dir: str) -> dict:
+    """
+    Move the completed upload into dest_dir as <sha256>.<ext>, so uploads with the same filename never
+    overwrite each other (identical content is stored once). Returns the upload with its digest and path.
+    """
+    part, meta_path = _paths(upload_id)
+    with _upload_lock(upload_id):
+        meta = _read_meta(upload_id)
+        if meta["size"] is not None and meta["offset"] != meta["size"]:
+            raise UploadError("Upload is incomplete", 409, meta["offset"])
+
+        with _hashes_guard:
+            state = _hashes.pop(upload_id, None)
+        if state and state[0] == meta["offset"]:
+            digest = state[1].hexdigest()
+        else:
+            h = sha256()
+            with open(part, "rb") as f:
+                for block in iter(lambda: f.read(WRITE_CHUNK), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+
+        ext = meta["filename"].rsplit(".", 1)[1].lower() if "." in meta["filename"] else "bin"
+        dest_path = os.path.join(dest_dir, f"{digest}.{ext}")
+        if os.path.exists(dest_path):
+            os.remove(part)
+        else:
+            shutil.move(part, dest_path)
+        os.remove(meta_path)
+    return {**meta, "size": meta["offset"], "sha256": digest, "path": dest_path}
+
+
+def abort_upload(upload_id: str):
+    part, meta_path = _paths(upload_id)
+    with _upload_lock(upload_id):
+        if not os.path.exists(meta_path):
+            raise UploadError("Upload not found", 404)
+        for path in (part, meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    with _hashes_guard:
+        _hashes.pop(upload_id, None)
+
+
+def cleanup_stale_uploads(max_age: int = RESUMABLE_TTL_SECONDS, throttle: bool = False) -> int:
+    """Remove partial uploads with no activity for max_age seconds. Returns how many were removed."""
+    global _last_cleanup
+    now = time.time()
+    if throttle and now - _last_cleanup < RESUMABLE_CLEANUP_INTERVAL:
+        return 0
+    _last_cleanup = now
+
+    removed = 0
+    for entry in os.scandir(RESUMABLE_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            if now - entry.stat().st_mtime < max_age:
+                continue
+            abort_upload(entry.name[:-5])
+            removed += 1
+        except (OSError, UploadError):
+            pass
+    return removed
+
+
+if __name__ == "__main__":
+    # cron-friendly: python resumable_uploads.py
+    print(f"Removed {cleanup_stale_uploads()} stale uploads")
@@ -0,0 +1,301 @@
+import os, re, threading
+
+from sqlalchemy import text, select, or_
+
+from Config import Session, engine
+from Model import Books
+from catalog import fetch_books
+
+# PostgreSQL: a BookSearch table of weighted tsvectors behind a GIN index.
+# SQLite (local/test runs): an FTS5 table keyed by book_id. Anything else: unranked LIKE on title/author.
+# Latency target for /books/search: p95 under 50 ms on a 500k-book catalog (see benchmarks/bench_search.py).
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")  # no stemming: titles and authors are multilingual
+SEARCH_DESCRIPTION_CHARS = int(os.getenv("SEARCH_DESCRIPTION_CHARS", 100000))  # descriptions can be whole books
+SEARCH_RANK_MAX_MATCHES = int(os.getenv("SEARCH_RANK_MAX_MATCHES", 20000))  # ranking cost grows with matches
+SEARCH_MAX_TERMS = 16
+REINDEX_BATCH = 5000
+
+if not re.fullmatch(r"[a-z_]+", SEARCH_TS_CONFIG):
+    raise ValueError(f"Invalid SEARCH_TS_CONFIG: {SEARCH_TS_CONFIG}")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+# ----------------- Backends -----------------
+_PG_DOCUMENT = f"""
+    setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(author, '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(main_category, '') || ' ' || coalesce(sub_category, '')), 'C') ||
+    setweight(to_tsvector('{SEARCH_TS_CONFIG}', left(coalesce(description, ''), :chars)), 'D')
+"""
+
+POSTGRES = {
+    "setup": [
+        'CREATE TABLE IF NOT EXISTS "BookSearch" ('
+        ' book_id INTEGER PRIMARY KEY REFERENCES "Books"(book_id) ON DELETE CASCADE,'
+        ' document TSVECTOR NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_book_search_document ON "BookSearch" USING GIN (document)',
+    ],
+    "max_indexed": 'SELECT coalesce(max(book_id), 0) FROM "BookSearch"',
+    "delete": ['DELETE FROM "BookSearch" WHERE book_id = :id'],
+    "index": [
+        f'INSERT INTO "BookSearch" (book_id, document) SELECT book_id, {_PG_DOCUMENT} FROM "Books" '
+        'WHERE book_id = :id ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document',
+    ],
+    "index_after": [
+        f'INSERT INTO "BookSearch" (book_id, document) SELECT book_id, {_PG_DOCUMENT} FROM "Books" '
+        'WHERE book_id > :after ORDER BY book_id LIMIT :batch ON CONFLICT (book_id) DO NOTHING',
+    ],
+    "count": f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM "BookSearch" WHERE document @@ to_tsquery('{SEARCH_TS_CONFIG}', :q) LIMIT :cap
+        ) m
+    """,
+    "search": f"""
+        SELECT s.book_id, ts_rank_cd(s.document, q) AS rank
+        FROM "BookSearch" s, to_tsquery('{SEARCH_TS_CONFIG}', :q) q
+        WHERE s.document @@ q
+        ORDER BY rank DESC, s.book_id
+        LIMIT :limit OFFSET :offset
+    """,
+    "recent": f"""
+        SELECT book_id, 0.0 AS rank FROM "BookSearch"
+        WHERE document @@ to_tsquery('{SEARCH_TS_CONFIG}', :q)
+        ORDER BY book_id DESC
+        LIMIT :limit OFFSET :offset
+    """,
+}
+
+_SQLITE_COLUMNS = ("SELECT book_id, coalesce(title, ''), coalesce(author, ''), "
+                   "coalesce(main_category, '') || ' ' || coalesce(sub_category, ''), "
+                   "substr(coalesce(description, ''), 1, :chars) FROM Books")
+
+SQLITE = {
+    "setup": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+        "title, author, categories, description, tokenize = 'unicode61 remove_diacritics 2')",
+    ],
+    "max_indexed": "SELECT coalesce(max(rowid), 0) FROM books_fts",
+    "delete": ["DELETE FROM books_fts WHERE rowid = :id"],
+    "index": [
+        "DELETE FROM books_fts WHERE rowid = :id",
+        f"INSERT INTO books_fts (rowid, title, author, categories, description) {_SQLITE_COLUMNS} WHERE book_id = :id",
+    ],
+    "index_after": [
+        f"INSERT INTO books_fts (rowid, title, author, categories, description) {_SQLITE_COLUMNS} "
+        "WHERE book_id > :after ORDER BY book_id LIMIT :batch",
+    ],
+    "count": "SELECT count(*) FROM (SELECT 1 FROM books_fts WHERE books_fts MATCH :q LIMIT :cap)",
+    # bm25 is "lower is better"; column weights: title, author, categories, description
+    "search": """
+        SELECT rowid AS book_id, -bm25(books_fts, 10.0, 5.0, 2.0, 1.0) AS rank
+        FROM books_fts
+        WHERE books_fts MATCH :q
+        ORDER BY bm25(books_fts, 10.0, 5.0, 2.0, 1.0)
+        LIMIT :limit OFFSET :offset
+    """,
+    "recent": """
+        SELECT rowid AS book_id, 0.0 AS rank FROM books_fts
+        WHERE books_fts MATCH :q
+        ORDER BY rowid DESC
+        LIMIT :limit OFFSET :offset
+    """,
+}
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+def _backend():
+    name = engine.dialect.name
+    if name == "postgresql":
+        return POSTGRES
+    if name == "sqlite":
+        return SQLITE
+    return None
+
+
+# ----------------- Helpers -----------------
+def _terms(q: str) -> list:
+    terms = _TERM.findall(q or "")[:SEARCH_MAX_TERMS]
+    if not terms:
+        raise SearchQueryError("Query must contain at least one word")
+    return terms
+
+
+def _fts5_query(terms: list, prefix: bool, title_only: bool) -> str:
+    # every word quoted (no FTS5 syntax from users); the last one is a prefix for search-as-you-type
+    words = [f'"{t}"' for t in terms]
+    if prefix:
+        words[-1] += "*"
+    query = " ".join(words)
+    return f"{{title author}} : ({query})" if title_only else query
+
+
+def _tsquery(terms: list, prefix: bool, title_only: bool) -> str:
+    # terms are plain \w+ words, so building to_tsquery syntax here is safe; AB = title and author weights
+    weights = "AB" if title_only else ""
+    words = [f"{t}:{weights}" if weights else t for t in terms]
+    if prefix:
+        words[-1] = f"{terms[-1]}:*{weights}"
+    return " & ".join(words)
+
+
+def _count(db, backend, query: str) -> int:
+    """Number of matches, counted up to SEARCH_RANK_MAX_MATCHES + 1."""
+    return db.execute(text(backend["count"]), {"q": query, "cap": SEARCH_RANK_MAX_MATCHES + 1}).scalar()
+
+
+def _catch_up(db, backend) -> int:
+    """Index every book above the highest indexed id, in batches. Returns how many were added."""
+    added = 0
+    while True:
+        after = db.execute(text(backend["max_indexed"])).scalar()
+        n = 0
+        for stmt in backend["index_after"]:
+            n = db.execute(text(stmt), {"after": after, "batch": REINDEX_BATCH,
+                                        "chars": SEARCH_DESCRIPTION_CHARS}).rowcount
+        db.commit()
+        added += max(n, 0)
+        if n < REINDEX_BATCH:
+            return added
+
+
+def ensure_search_index():
+    """Create the index on first use and add any books it is missing (new databases, bulk imports)."""
+    global _ready
+    backend = _backend()
+    if _ready or backend is None:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        db = Session()
+        try:
+            for stmt in backend["setup"]:
+                db.execute(text(stmt))
+            db.commit()
+            _catch_up(db, backend)
+        finally:
+            db.close()
+        _ready = True
+
+
+def _write(kind: str, book_id: int) -> bool:
+    backend = _backend()
+    if backend is None:
+        return True
+    db = Session()
+    try:
+        ensure_search_index()
+        for stmt in backend[kind]:
+            db.execute(text(stmt), {"id": book_id, "chars": SEARCH_DESCRIPTION_CHARS})
+        db.commit()
+        return True
+    except Exception as e:
+        # the book itself is saved; a rebuild (python search.py) repairs the index
+        db.rollback()
+        print("Search Index Error:", e)
+        return False
+    finally:
+        db.close()
+
+
+# ----------------- Search API -----------------
+def index_book(book_id: int) -> bool:
+    """(Re)index one book after it was created or changed."""
+    return _write("index", book_id)
+
+
+def unindex_book(book_id: int) -> bool:
+    return _write("delete", book_id)
+
+
+def _hits(db, backend, kind: str, query: str, limit: int, offset: int) -> list:
+    return db.execute(text(backend[kind]), {"q": query, "limit": limit, "offset": offset}).fetchall()
+
+
+def _ranked_hits(db, backend, build, terms: list, prefix: bool, limit: int, offset: int) -> list:
+    """
+    Broad queries (a word in a category name, say) match too many books to rank them all within the latency
+    target. Then only the title/author matches are ranked, followed by the other matches newest first;
+    if even the title/author matches are too many, all matches are listed newest first.
+    """
+    query = build(terms, prefix, False)
+    if _count(db, backend, query) <= SEARCH_RANK_MAX_MATCHES:
+        return _hits(db, backend, "search", query, limit, offset)
+    title_query = build(terms, prefix, True)
+    n_title = _count(db, backend, title_query)
+    if n_title > SEARCH_RANK_MAX_MATCHES:
+        return _hits(db, backend, "recent", query, limit, offset)
+
+    hits = _hits(db, backend, "search", title_query, limit, offset) if offset < n_title else []
+    if len(hits) < limit:
+        rest = f"({query}) NOT ({title_query})" if backend is SQLITE else f"({query}) & !({title_query})"
+        hits += _hits(db, backend, "recent", rest, limit - len(hits), max(0, offset - n_title))
+    return hits
+
+
+def search_books(q: str, fields, limit: int = 20, offset: int = 0) -> list:
+    """
+    Ranked matches over title, author, categories and description as dicts of `fields` plus `rank`.
+    The last word matches as a prefix unless q ends in whitespace, so pass q as typed, unstripped.
+    """
+    backend = _backend()
+    if backend is None:
+        return _search_like(q, fields, limit, offset)
+    ensure_search_index()
+    terms, prefix = _terms(q), q == q.rstrip()
+    build = _fts5_query if backend is SQLITE else _tsquery
+
+    db = Session()
+    try:
+        hits = _ranked_hits(db, backend, build, terms, prefix, limit, offset)
+        ranks = {h.book_id: round(float(h.rank), 6) for h in hits}
+        items = fetch_books(db, list(ranks), list(dict.fromkeys(["book_id", *fields])))
+    finally:
+        db.close()
+    for item in items:
+        item["rank"] = ranks[item["book_id"]]
+        if "book_id" not in fields:
+            del item["book_id"]
+    return items
+
+
+def _search_like(q: str, fields, limit: int, offset: int) -> list:
+    conds = [or_(Books.title.ilike(f"%{t}%"), Books.author.ilike(f"%{t}%")) for t in _terms(q)]
+    db = Session()
+    try:
+        ids = db.execute(select(Books.book_id).where(*conds).order_by(Books.book_id)
+                         .limit(limit).offset(offset)).scalars().all()
+        return fetch_books(db, ids, fields)
+    finally:
+        db.close()
+
+
+def rebuild_search_index() -> int:
+    """Drop and rebuild the whole index. Returns the number of indexed books."""
+    global _ready
+    backend = _backend()
+    if backend is None:
+        return 0
+    db = Session()
+    try:
+        for stmt in backend["setup"]:
+            db.execute(text(stmt))
+        db.execute(text('DELETE FROM "BookSearch"' if backend is POSTGRES else "DELETE FROM books_fts"))
+        db.commit()
+        n = _catch_up(db, backend)
+    finally:
+        db.close()
+    _ready = True
+    return n
+
+
+if __name__ == "__main__":
+    # after restores or direct SQL edits: python search.py
+    print(f"Indexed {rebuild_search_index()} books")
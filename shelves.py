@@ -0,0 +1,149 @@
+import os, json, time, random, threading
+from array import array
+from datetime import datetime
+
+from sqlalchemy import select
+
+from Config import Session
+from Model import Books
+from catalog import LIST_FIELDS, fetch_books
+
+# Shelf definitions: filters on Books columns (value or list of values), how many books to show, and how
+# long one random selection is kept (0 = a fresh sample on every request). Override with SHELVES_JSON.
+DEFAULT_SHELVES = {
+    "trending": {"where": {"main_category": "Literature"}, "size": 20, "rotate_seconds": 0},
+    "featured": {"where": {"main_category": "History"}, "size": 20, "rotate_seconds": 0},
+}
+SHELVES = json.loads(os.getenv("SHELVES_JSON") or "null") or DEFAULT_SHELVES
+SHELF_FILTER_COLUMNS = ("main_category", "sub_category", "author", "user_id")
+SHELF_REFRESH_SECONDS = int(os.getenv("SHELF_REFRESH_SECONDS", 300))  # incremental: picks up newly added books
+SHELF_REBUILD_SECONDS = int(os.getenv("SHELF_REBUILD_SECONDS", 3600))  # full: drops deleted / re-categorized books
+
+
+class _Pool:
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.spec = spec
+        self.ids = array("q")
+        self.max_id = 0
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+        self.lock = threading.Lock()
+        self.window = None  # (expires_at, fields, items) while a rotation is being served
+        self.rng = random.Random()
+
+
+_pools = {}
+_pools_guard = threading.Lock()
+
+
+# ----------------- Helpers -----------------
+def _conditions(where: dict) -> list:
+    conds = []
+    for col, value in (where or {}).items():
+        if col not in SHELF_FILTER_COLUMNS:
+            raise ValueError(f"Shelf filter on unsupported column: {col}")
+        column = getattr(Books, col)
+        conds.append(column.in_(value) if isinstance(value, list) else column == value)
+    return conds
+
+
+def _get_pool(name: str) -> _Pool:
+    if name not in SHELVES:
+        raise KeyError(name)
+    with _pools_guard:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = _Pool(name, SHELVES[name])
+        return pool
+
+
+def _load_ids(pool: _Pool, full: bool, session_factory=None):
+    """Full rebuild, or append ids above the high-water mark. Only touches the (filter, book_id) index."""
+    stmt = select(Books.book_id).where(*_conditions(pool.spec.get("where")))
+    if not full:
+        stmt = stmt.where(Books.book_id > pool.max_id)
+    db = (session_factory or Session)()
+    try:
+        fresh = array("q", db.execute(stmt).scalars())
+    finally:
+        db.close()
+
+    now = time.time()
+    if full:
+        pool.ids = fresh
+        pool.built_at = now
+        pool.window = None
+    else:
+        pool.ids.extend(fresh)
+    if fresh:
+        pool.max_id = max(fresh) if full else max(pool.max_id, max(fresh))
+    pool.refreshed_at = now
+
+
+def _ensure_fresh(pool: _Pool, session_factory=None):
+    now = time.time()
+    if not pool.built_at:
+        with pool.lock:
+            if not pool.built_at:
+                _load_ids(pool, True, session_factory)
+        return
+    full = now - pool.built_at > SHELF_REBUILD_SECONDS
+    if full or now - pool.refreshed_at > SHELF_REFRESH_SECONDS:
+        # one request refreshes; the others keep serving the current pool
+        if pool.lock.acquire(blocking=False):
+            try:
+                _load_ids(pool, full, session_factory)
+            finally:
+                pool.lock.release()
+
+
+# ----------------- Shelves API -----------------
+def get_shelf(name: str, fields=LIST_FIELDS, session_factory=None) -> list:
+    """
+    A random selection of the shelf's books, drawn from an in-memory pool of candidate ids
+    (no ORDER BY random over the category). Only the chosen rows are read, by primary key.
+    """
+    pool = _get_pool(name)
+    _ensure_fresh(pool, session_factory)
+    size = int(pool.spec.get("size", 20))
+    rotate = int(pool.spec.get("rotate_seconds", 0))
+
+    window = pool.window
+    if rotate and window and window[0] > time.time() and window[1] == tuple(fields):
+        return window[2]
+
+    ids = pool.ids
+    n = len(ids)
+    if not n:
+        return []
+    # a little slack covers books deleted since the last rebuild
+    picks = [ids[i] for i in pool.rng.sample(range(n), min(n, size + max(2, size // 5)))]
+    db = (session_factory or Session)()
+    try:
+        items = fetch_books(db, picks, fields)[:size]  # keeps the random order; deleted ids drop out
+    finally:
+        db.close()
+    if rotate:
+        pool.window = (time.time() + rotate, tuple(fields), items)
+    return items
+
+
+def invalidate_shelves():
+    """Called when books are added: the next request does an incremental refresh instead of waiting."""
+    with _pools_guard:
+        for pool in _pools.values():
+            pool.refreshed_at = 0.0
+
+
+def shelves_stats() -> dict:
+    out = {}
+    for name, spec in SHELVES.items():
+        pool = _pools.get(name)
+        out[name] = {
+            **spec,
+            "pool_size": len(pool.ids) if pool else 0,
+            "built_at": datetime.utcfromtimestamp(pool.built_at).isoformat() if pool and pool.built_at else None,
+            "refreshed_at": datetime.utcfromtimestamp(pool.refreshed_at).isoformat() if pool and pool.refreshed_at else None,
+        }
+    return out
@@ -0,0 +1,163 @@
+import os, re
+from hashlib import sha256
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from Config import Session
+from Model import SummaryChunks
+from summary_services import SUMMARY_MODEL, SUMMARY_PROMPT_VERSION
+
+# Rough budgets in tokens (~4 chars per token for English prose)
+SINGLE_PASS_TOKENS = int(os.getenv("SUMMARIZER_SINGLE_PASS_TOKENS", 12000))
+CHUNK_TOKENS = int(os.getenv("SUMMARIZER_CHUNK_TOKENS", 3000))
+MAX_WORKERS = int(os.getenv("SUMMARIZER_MAX_WORKERS", 4))
+
+MIN_PARTIAL_WORDS = 80
+MAX_PARTIAL_WORDS = 400
+MAX_REDUCE_LEVELS = 6
+
+
+# ----------------- Helpers -----------------
+def approx_tokens(text: str) -> int:
+    return len(text or "") // 4 + 1
+
+
+def _split_oversized(piece: str, max_tokens: int) -> list:
+    """Split a paragraph that is too big on its own: sentences first, then raw words."""
+    out, buf = [], []
+    for sentence in re.split(r"(?<=[.!?])\s+", piece):
+        if approx_tokens(sentence) > max_tokens:
+            words = sentence.split()
+            step = max(1, max_tokens * 4 // 6)  # ~6 chars per word incl. space
+            out.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+            continue
+        if buf and approx_tokens(" ".join(buf + [sentence])) > max_tokens:
+            out.append(" ".join(buf))
+            buf = []
+        buf.append(sentence)
+    if buf:
+        out.append(" ".join(buf))
+    return out
+
+
+def split_into_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> list:
+    """Pack paragraphs into chunks of at most max_tokens, keeping paragraph boundaries where possible."""
+    chunks, buf, buf_tokens = [], [], 0
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = para.strip()
+        if not para:
+            continue
+        pieces = [para] if approx_tokens(para) <= max_tokens else _split_oversized(para, max_tokens)
+        for piece in pieces:
+            t = approx_tokens(piece)
+            if buf and buf_tokens + t > max_tokens:
+                chunks.append("\n\n".join(buf))
+                buf, buf_tokens = [], 0
+            buf.append(piece)
+            buf_tokens += t
+    if buf:
+        chunks.append("\n\n".join(buf))
+    return chunks
+
+
+def _partial_prompt(text: str, words: int) -> str:
+    return f"""
+        You are summarizing one section of a longer book.
+        Summarize the section below faithfully in about {words} words.
+        Keep character names, key events, arguments and their order. Do not add outside content.
+
+        --- Section ---
+        {text}
+        """
+
+
+def _chunk_hash(text: str, words: int) -> str:
+    raw = f"{SUMMARY_MODEL}|{SUMMARY_PROMPT_VERSION}|{words}|{text}"
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ----------------- Partial summary cache -----------------
+def _load_cached(hashes: list) -> dict:
+    if not hashes:
+        return {}
+    db = Session()
+    try:
+        rows = db.query(SummaryChunks).filter(SummaryChunks.chunk_hash.in_(hashes)).all()
+        return {r.chunk_hash: r.content for r in rows}
+    except Exception as e:
+        print("Summary chunk cache lookup failed:", e)
+        return {}
+    finally:
+        db.close()
+
+
+def _save_cached(results: dict):
+    if not results:
+        return
+    db = Session()
+    try:
+        for h, content in results.items():
+            db.merge(SummaryChunks(chunk_hash=h, content=content, created_at=datetime.utcnow()))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("Summary chunk cache write failed:", e)
+    finally:
+        db.close()
+
+
+def _summarize_all(pieces: list, words: int, complete, stats: dict) -> list:
+    """Summarize every piece to ~words in parallel, reusing cached partials by content hash."""
+    hashes = [_chunk_hash(p, words) for p in pieces]
+    cached = _load_cached(list(set(hashes)))
+    todo = {h: p for h, p in zip(hashes, pieces) if h not in cached}
+    stats["cached"] += len(pieces) - sum(1 for h in hashes if h in todo)
+    stats["generated"] += len(todo)
+
+    fresh = {}
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {h: pool.submit(complete, _partial_prompt(p, words), words * 2) for h, p in todo.items()}
+            for h, fut in futures.items():
+                fresh[h] = fut.result().strip()
+    finally:
+        # keep whatever finished so a retry only pays for the rest
+        _save_cached(fresh)
+
+    done = {**cached, **fresh}
+    return [done[h] for h in hashes]
+
+
+def _partial_words(n: int, budget_tokens: int) -> int:
+    words = (budget_tokens * 3 // 4) // max(1, n)
+    return max(MIN_PARTIAL_WORDS, min(MAX_PARTIAL_WORDS, words))
+
+
+# ----------------- Engine -----------------
+def condense_text(text: str, complete, max_tokens: int = SINGLE_PASS_TOKENS, stats: dict = None) -> str:
+    """
+    Map-reduce `text` until it fits in one prompt of max_tokens.
+
+    `complete(prompt, max_tokens) -> str` performs one LLM call. Text that already
+    fits is returned unchanged; otherwise chunks are summarized in parallel and the
+    partial summaries are reduced level by level.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("cached", 0)
+    stats.setdefault("generated", 0)
+    stats.setdefault("levels", 0)
+
+    if approx_tokens(text) <= max_tokens:
+        return text
+
+    pieces = split_into_chunks(text, CHUNK_TOKENS)
+    stats["chunks"] = len(pieces)
+    while True:
+        words = _partial_words(len(pieces), max_tokens)
+        partials = _summarize_all(pieces, words, complete, stats)
+        stats["levels"] += 1
+        joined = "\n\n".join(partials)
+        if approx_tokens(joined) <= max_tokens or len(partials) == 1 or stats["levels"] >= MAX_REDUCE_LEVELS:
+            return joined
+        # regroup partial summaries into chunk-sized groups for the next reduce level
+        pieces = split_into_chunks(joined, CHUNK_TOKENS)
@@ -0,0 +1,130 @@
+from hashlib import sha256
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from Config import Session
+from Model import Summaries
+
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_PROMPT_VERSION = "v1"  # bump whenever build_summary_prompt changes
+
+WORDS_MAP = {
+    "1min": 150,
+    "10min": 1500,
+    "30min": 4500
+}
+
+
+# ----------------- Helpers -----------------
+def _normalize(s: str) -> str:
+    return " ".join((s or "").lower().split())
+
+
+def summary_lookup_key(title: str, author: str, duration: str) -> str:
+    raw = "|".join([_normalize(title), _normalize(author), duration or ""])
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+
+def build_summary_prompt(title: str, author: str, words: int) -> str:
+    return f"""
+        You are a specialized AI assistant acting as a Book Summarizer Bot.
+        Your role is that of a "Book Keeper" who has read and learned from a wide range of real books.
+        Your task is to produce faithful summaries of books based strictly on their actual content.
+
+        ### Rules & Instructions:
+        BOOK NAME = {title}
+        AUTHOR = {author}
+        WORDS = {words}
+        """
+
+
+def build_own_summary_prompt(description: str, duration: str, words: int) -> str:
+    return f"""
+        You are a specialized AI assistant acting as a Book Summarizer Bot.
+        You are given a book description written by the user.
+        Based strictly on this description, generate a clear and useful summary.
+
+        ### Rules:
+        - Do NOT add any external content not hinted at in the description.
+        - Expand and compress the summary according to the requested time length.
+        - Duration: {duration} (target ~{words} words).
+        - The style should be engaging, clear, and faithful to the original description.
+
+        --- Book Description ---
+        {description}
+        """
+
+
+def _summary_to_dict(s: Summaries) -> dict:
+    return {
+        "summary_id": s.summary_id,
+        "book_id": s.book_id,
+        "title": s.title,
+        "author": s.author,
+        "duration": s.summary_type,
+        "summary": s.content,
+        "audio_url": s.audio_url,
+        "model": s.model,
+        "prompt_version": s.prompt_version,
+        "created_at": s.created_at.isoformat() if s.created_at else None,
+    }
+
+
+def _current_version_query(db, lookup_key, book_id, duration):
+    q = db.query(Summaries).filter(
+        Summaries.summary_type == duration,
+        Summaries.model == SUMMARY_MODEL,
+        Summaries.prompt_version == SUMMARY_PROMPT_VERSION,
+    )
+    if book_id:
+        q = q.filter(or_(Summaries.book_id == book_id, Summaries.lookup_key == lookup_key))
+    else:
+        q = q.filter(Summaries.lookup_key == lookup_key)
+    return q.order_by(Summaries.summary_id.desc())
+
+
+# ----------------- Summary store -----------------
+def get_stored_summary(title: str, author: str, duration: str, book_id=None):
+    """Return the stored summary for this book/duration made with the current prompt+model, or None."""
+    lookup_key = summary_lookup_key(title, author, duration)
+    db = Session()
+    try:
+        row = _current_version_query(db, lookup_key, book_id, duration).first()
+        return _summary_to_dict(row) if row else None
+    except Exception as e:
+        print("Summary store lookup failed:", e)
+        return None
+    finally:
+        db.close()
+
+
+def store_summary(title: str, author: str, duration: str, content: str, book_id=None, audio_url=None):
+    """Insert or overwrite the current-version summary for this book/duration."""
+    lookup_key = summary_lookup_key(title, author, duration)
+    db = Session()
+    try:
+        row = _current_version_query(db, lookup_key, book_id, duration).first()
+        if not row:
+            row = Summaries(
+                lookup_key=lookup_key,
+                summary_type=duration,
+                model=SUMMARY_MODEL,
+                prompt_version=SUMMARY_PROMPT_VERSION,
+            )
+            db.add(row)
+
+        row.book_id = book_id or row.book_id
+        row.title = title
+        row.author = author
+        row.content = content
+        row.audio_url = audio_url or row.audio_url
+        row.created_at = datetime.utcnow()
+        db.commit()
+        return _summary_to_dict(row)
+    except Exception as e:
+        db.rollback()
+        print("Summary store write failed:", e)
+        return None
+    finally:
+        db.close()
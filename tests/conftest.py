@@ -0,0 +1,50 @@
+# Shared setup for python -m pytest tests: the database and every on-disk store point into one temp dir.
+import os, sys, shutil, tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp(prefix="kotubrief-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["COALESCE_DIR"] = os.path.join(_tmp, "locks")
+os.environ["AUDIO_DIR"] = os.path.join(_tmp, "audio")
+os.environ["EXTRACT_CACHE_DIR"] = os.path.join(_tmp, "extract_cache")
+os.environ["RESUMABLE_DIR"] = os.path.join(_tmp, "resumable")
+
+
+def write_pdf(path: str, pages: list):
+    """Minimal uncompressed PDF with one line of Helvetica text per page."""
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>")
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """make_pdf(pages) -> path of a PDF with one text line per page."""
+    def make(pages: list, name: str = "book.pdf") -> str:
+        path = str(tmp_path / name)
+        write_pdf(path, pages)
+        return path
+    return make
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_tmp, ignore_errors=True)
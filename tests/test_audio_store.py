@@ -0,0 +1,88 @@
+# Content-addressed audio store and its LRU eviction: python -m pytest tests
+import os, time, shutil, threading
+
+import pytest
+
+import audio_store as store
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    conn = store._db()
+    try:
+        conn.execute("DELETE FROM blobs")
+        conn.execute("DELETE FROM names")
+    finally:
+        conn.close()
+    shutil.rmtree(store.BLOB_DIR, ignore_errors=True)
+    os.makedirs(store.BLOB_DIR, exist_ok=True)
+
+
+def _put(text: str, size: int = 100) -> str:
+    digest = store.audio_digest(text)
+    store.put_blob(digest, text.encode()[:1] * size, evict_now=False)
+    time.sleep(0.01)  # distinct last_access times
+    return digest
+
+
+def test_put_and_read():
+    digest = _put("hello")
+    assert store.read_blob(digest) == b"h" * 100
+    assert store.lookup_blob(digest) == store.blob_path(digest)
+    assert store.digest_from_relpath(store.blob_relpath(digest)) == digest
+    assert store.digest_from_relpath("../index.sqlite3") is None
+    assert store.read_blob(store.audio_digest("never stored")) is None
+
+
+def test_evicts_least_recently_used():
+    a, b, c = _put("a"), _put("b"), _put("c")
+    store.link_name("b.mp3", b)
+    store.read_blob(a)  # a is now the most recently used
+    assert store.evict(max_bytes=200) == 100
+    assert store.lookup_blob(b) is None
+    assert store.resolve_name("b.mp3") is None
+    assert not os.path.exists(store.blob_path(b))
+    assert store.read_blob(a) is not None and store.read_blob(c) is not None
+    assert store.store_stats()["bytes"] == 200
+
+
+def test_evict_under_budget_is_a_no_op():
+    _put("a"), _put("b")
+    assert store.evict(max_bytes=1000) == 0
+    assert store.store_stats()["blobs"] == 2
+
+
+def test_missing_file_is_a_miss_and_drops_the_row():
+    digest = _put("gone")
+    os.remove(store.blob_path(digest))
+    assert store.open_blob(digest) is None
+    assert store.store_stats()["blobs"] == 0
+
+
+def test_same_content_is_created_once():
+    digest, calls, start = store.audio_digest("shared"), [], threading.Barrier(4)
+
+    def synthesize():
+        calls.append(1)
+        time.sleep(0.05)
+        return b"x" * 10
+
+    def worker():
+        start.wait()
+        store.get_or_create_blob(digest, synthesize)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert store.read_blob(digest) == b"x" * 10
+
+
+def test_names_alias_one_blob():
+    digest = _put("text")
+    store.link_name("title-one.mp3", digest)
+    store.link_name("title-two.mp3", digest)
+    assert store.resolve_name("title-one.mp3") == store.resolve_name("title-two.mp3") == store.blob_relpath(digest)
+    assert store.store_stats()["names"] == 2
@@ -0,0 +1,109 @@
+# Prefix index with a popularity segment tree, checked against brute force: python -m pytest tests
+import random
+
+import pytest
+
+import autocomplete as ac
+import catalog
+from autocomplete import build_index, normalize, TITLE, AUTHOR
+from Config import Session
+from Model import Books, Library
+
+
+def _brute(entries, prefix, limit, removed=()):
+    hits = [e for e in entries if e[0].startswith(prefix) and e[3] not in removed]
+    return sorted(e[4] for e in hits)[::-1][:limit]
+
+
+def test_normalize():
+    assert normalize("Les Misérables!") == "les miserables"
+    assert normalize("  J. R. R. Tolkien ") == "j r r tolkien"
+    assert normalize(None) == ""
+
+
+def test_top_k_matches_brute_force():
+    rng = random.Random(7)
+    entries = [("".join(rng.choice("abc") for _ in range(rng.randint(1, 6))), f"t{i}", TITLE, i, rng.randint(0, 50))
+               for i in range(2000)]
+    idx = ac._Index(list(entries), 0, 2000)
+    removed = {e[3] for e in entries[:200]}
+    by_id = {e[3]: e for e in entries}
+    for prefix in ("", "a", "ab", "cab", "bbb", "ccccc", "zz"):
+        for limit in (1, 8, 50):
+            got = idx.top(prefix, limit, removed)
+            assert sorted((by_id[b][4] for _, _, b in got), reverse=True) == _brute(entries, prefix, limit, removed)
+            assert all(by_id[b][0].startswith(prefix) for _, _, b in got)
+
+
+def test_titles_and_authors():
+    rows = [(1, "The Hobbit", "J. R. R. Tolkien"), (2, "The Silmarillion", "J. R. R. Tolkien"),
+            (3, "Hobbies at Home", "Ann Other")]
+    idx = build_index(rows, {1: 5, 2: 4, 3: 1})
+    assert idx.top("hob", 8, ()) == [("The Hobbit", TITLE, 1), ("Hobbies at Home", TITLE, 3)]
+    assert idx.top("tolk", 8, ()) == [("J. R. R. Tolkien", AUTHOR, -1)]
+    assert idx.pop[idx.keys.index("tolkien")] == 9  # an author ranks by all of their books
+    assert idx.top("hob", 8, {1}) == [("Hobbies at Home", TITLE, 3)]
+    assert idx.top("tolk", 8, (), {"j r r tolkien"}) == []
+
+
+@pytest.fixture
+def catalog_books():
+    db = Session()
+    db.query(Library).delete()
+    db.query(Books).delete()
+    books = [Books(title="Quasar Tales", author="Ophelia Quokka"), Books(title="Quasar Two", author="Primo Solo")]
+    db.add_all(books)
+    db.commit()
+    ids = [b.book_id for b in books]
+    db.close()
+    ac._removed.clear()
+    ac._removed_authors.clear()
+    ac._lock.acquire()
+    ac._rebuild()
+    yield ids
+    db = Session()
+    db.query(Books).delete()
+    db.commit()
+    db.close()
+
+
+def _texts(q):
+    return [s["text"] for s in ac.suggest(q)]
+
+
+def test_deleted_book_and_its_only_author_are_hidden_until_rebuild(catalog_books):
+    solo = catalog_books[1]
+    db = Session()
+    db.query(Books).filter(Books.book_id == solo).delete()
+    db.commit()
+    db.close()
+    ac.forget_book(solo, "Primo Solo")
+    assert _texts("quasar") == ["Quasar Tales"] and _texts("solo") == []
+    assert ac._removed == {solo} and ac._removed_authors == {"primo solo"}
+
+    ac._lock.acquire()
+    ac._rebuild()
+    assert ac._removed == set() and ac._removed_authors == set()  # the fresh index no longer has them
+    assert _texts("quasar") == ["Quasar Tales"] and _texts("solo") == []
+
+
+def test_author_with_books_left_stays(catalog_books):
+    db = Session()
+    book = Books(title="Another Quokka Book", author="Ophelia Quokka")
+    db.add(book)
+    db.commit()
+    db.query(Books).filter(Books.book_id == catalog_books[0]).delete()
+    db.commit()
+    db.close()
+    ac.forget_book(catalog_books[0], "Ophelia Quokka")
+    assert _texts("quokka") == ["Ophelia Quokka"]
+
+
+def test_hidden_author_returns_with_a_new_book(catalog_books):
+    ac._removed_authors.add("primo solo")  # as after their last book was deleted
+    db = Session()
+    db.add(Books(title="Solo Again", author="Primo Solo"))
+    db.commit()
+    db.close()
+    catalog.bump_catalog_version()  # the next lookup catches up on new books
+    assert "Primo Solo" in _texts("solo")
@@ -0,0 +1,163 @@
+# Catalog listing: query-string parsing and keyset pagination on SQLite: python -m pytest tests
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+import catalog
+from Config import Session
+from Model import Books, Library
+from catalog import parse_list_args, list_books, fetch_books, encode_cursor, ListArgsError, MAX_PAGE_LIMIT
+
+T0 = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db():
+    session = Session()
+    session.query(Library).delete()
+    session.query(Books).delete()
+    # five books share a timestamp, so created_at pages must break ties on book_id
+    for i in range(25):
+        session.add(Books(title=f"Book {i:02d}", author=f"Author {i % 3}",
+                          main_category="Fiction" if i % 2 else "Science",
+                          created_at=T0 + timedelta(minutes=max(i, 4)), description="long text " * 50))
+    session.commit()
+    yield session
+    session.query(Books).delete()
+    session.commit()
+    session.close()
+
+
+def _walk(db, **kwargs):
+    pages, cursor = [], None
+    while True:
+        items, cursor = list_books(db, cursor=cursor, **kwargs)
+        pages.append(items)
+        if not cursor:
+            return pages
+        cursor = parse_list_args({"cursor": cursor, "sort": kwargs.get("sort", "book_id")})["cursor"]
+
+
+def test_parse_defaults_and_limits():
+    args = parse_list_args({})
+    assert (args["limit"], args["sort"], args["cursor"], args["page"]) == (20, "book_id", None, None)
+    assert "description" not in args["fields"]
+    assert parse_list_args({"limit": "100000"})["limit"] == MAX_PAGE_LIMIT
+    assert parse_list_args({"limit": "0"})["limit"] == 1
+    assert parse_list_args({"fields": "title, author"})["fields"] == ["title", "author"]
+
+
+@pytest.mark.parametrize("args", [{"fields": "title,password"}, {"limit": "ten"}, {"sort": "title"},
+                                  {"cursor": "not-a-cursor"},
+                                  {"cursor": encode_cursor("book_id", 5), "sort": "created_at"}])
+def test_parse_rejects_bad_arguments(args):
+    with pytest.raises(ListArgsError):
+        parse_list_args(args)
+
+
+def test_unpaged_endpoints_keep_returning_everything():
+    args = parse_list_args({}, unpaged_fields=("book_id", "title", "description"))
+    assert args["limit"] is None and args["fields"] == ["book_id", "title", "description"]
+    assert parse_list_args({"limit": "5"}, unpaged_fields=("book_id",))["limit"] == 5
+
+
+def test_book_id_pages_cover_every_row_once(db):
+    pages = _walk(db, fields=["book_id", "title"], limit=7)
+    ids = [b["book_id"] for page in pages for b in page]
+    assert [len(p) for p in pages] == [7, 7, 7, 4]
+    assert ids == sorted(ids) and len(set(ids)) == 25
+    assert set(pages[0][0]) == {"book_id", "title"}
+
+
+def test_created_at_pages_break_ties_on_book_id(db):
+    pages = _walk(db, fields=["book_id", "created_at"], limit=3, sort="created_at")
+    rows = [b for page in pages for b in page]
+    keys = [(b["created_at"], b["book_id"]) for b in rows]
+    assert len(pages) == 9 and len(set(keys)) == 25
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_filters_and_legacy_pages(db):
+    where = [Books.main_category == "Fiction"]
+    items, cursor = list_books(db, where, fields=["title", "main_category"], limit=5)
+    assert len(items) == 5 and cursor and {b["main_category"] for b in items} == {"Fiction"}
+    page_two, _ = list_books(db, where, fields=["title"], limit=5, page=2)
+    after_cursor, _ = list_books(db, where, fields=["title"], limit=5,
+                                 cursor=parse_list_args({"cursor": cursor})["cursor"])
+    assert page_two == after_cursor
+
+
+def test_unbounded_list_has_no_cursor(db):
+    items, cursor = list_books(db, fields=["book_id"], limit=None)
+    assert len(items) == 25 and cursor is None
+
+
+def test_fetch_books_keeps_the_requested_order(db):
+    ids = [b["book_id"] for b in list_books(db, fields=["book_id"], limit=None)[0]]
+    picked = [ids[3], ids[0], 999999, ids[7]]
+    assert [b["book_id"] for b in fetch_books(db, picked, ["book_id", "title"])] == [ids[3], ids[0], ids[7]]
+
+
+# ----------------- Category tree cache -----------------
+class _CountingFactory:
+    def __init__(self, on_query=None):
+        self.calls = 0
+        self.on_query = on_query
+
+    def __call__(self):
+        self.calls += 1
+        if self.on_query:
+            self.on_query()
+        return Session()
+
+
+@pytest.fixture
+def categories(db):
+    db.add_all([Books(title="Dune", main_category="Fiction", sub_category="Sci-Fi"),
+                Books(title="Untitled upload", main_category=None)])
+    db.commit()
+    catalog.bump_catalog_version()
+
+
+def test_tree_and_counts(categories):
+    meta = catalog.catalog_metadata(Session)
+    assert meta["tree"] == {"Fiction": ["Sci-Fi"], "Science": []}
+    assert meta["counts"]["Fiction"] == {"total": 13, "sub_categories": {"Sci-Fi": 1}}
+    assert meta["counts"]["Science"]["total"] == 13
+
+
+def test_metadata_is_cached_until_a_bump(categories):
+    factory = _CountingFactory()
+    first = catalog.catalog_metadata(factory)
+    assert catalog.catalog_metadata(factory) == first and factory.calls == 1
+    catalog.bump_catalog_version()
+    second = catalog.catalog_metadata(factory)
+    assert factory.calls == 2 and second["version"] == first["version"] + 1
+    assert second["etags"] == first["etags"]  # same content, same tags
+
+
+def test_cache_expires_for_other_workers_bumps(categories, monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_CACHE_SECONDS", 0)
+    factory = _CountingFactory()
+    catalog.catalog_metadata(factory)
+    catalog.catalog_metadata(factory)
+    assert factory.calls == 2
+
+
+def test_bump_during_the_query_is_not_cached(categories):
+    factory = _CountingFactory(on_query=catalog.bump_catalog_version)
+    catalog.catalog_metadata(factory)
+    factory.on_query = None
+    catalog.catalog_metadata(factory)
+    assert factory.calls == 2
+
+
+def test_conditional_response_answers_304_for_a_known_etag():
+    app = Flask(__name__)
+    etag = catalog._etag({"a": 1})
+    with app.test_request_context(headers={"If-None-Match": f'W/{etag}, "other"'}):
+        assert catalog.conditional_response({"a": 1}, etag)[1] == 304
+    with app.test_request_context():
+        body, status, headers = catalog.conditional_response({"a": 1}, etag, max_age=60)
+        assert status == 200 and headers["ETag"] == etag and "max-age=60" in headers["Cache-Control"]
@@ -0,0 +1,86 @@
+# Content-addressed upload storage and the LRU extraction cache: python -m pytest tests
+import io, os, time, shutil
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import extract_cache as ec
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    shutil.rmtree(ec.EXTRACT_CACHE_DIR, ignore_errors=True)
+    os.makedirs(ec.EXTRACT_CACHE_DIR)
+    ec._size = None
+
+
+def _upload(data: bytes, name: str = "book.txt") -> FileStorage:
+    return FileStorage(stream=io.BytesIO(data), filename=name)
+
+
+def _age(path: str, seconds: float):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_uploads_are_stored_by_content(tmp_path):
+    one, path_one = ec.save_upload_hashed(_upload(b"first"), str(tmp_path), "txt")
+    two, path_two = ec.save_upload_hashed(_upload(b"second"), str(tmp_path), "txt")
+    again, path_again = ec.save_upload_hashed(_upload(b"first"), str(tmp_path), "txt")
+    assert one != two and one == again and path_one == path_again
+    assert os.path.basename(path_one) == f"{one}.txt"
+    with open(path_one, "rb") as f:
+        assert f.read() == b"first"
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{one}.txt", f"{two}.txt"])  # no temp files left
+
+
+def test_failed_upload_leaves_nothing(tmp_path):
+    class Broken(io.BytesIO):
+        def read(self, *args):
+            raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        ec.save_upload_hashed(FileStorage(stream=Broken(), filename="x.txt"), str(tmp_path), "txt")
+    assert os.listdir(tmp_path) == []
+
+
+def test_get_put_roundtrip():
+    key = ec.cache_key("ab" * 32, "pdf", "full")
+    assert f"-v{ec.EXTRACTOR_VERSION}-" in key
+    assert ec.cache_get(key) is None
+    ec.cache_put(key, {"text": "hello", "units_read": 1})
+    assert ec.cache_get(key) == {"text": "hello", "units_read": 1}
+
+
+def test_evict_drops_least_recently_used():
+    keys = [ec.cache_key(f"{i:02d}" * 32, "txt", "full") for i in range(3)]
+    for i, key in enumerate(keys):
+        ec.cache_put(key, {"text": "x" * 100})
+        _age(ec._path(key), 100 - i)
+    size = os.path.getsize(ec._path(keys[0]))
+    ec.cache_get(keys[0])  # read: now the most recent
+    assert ec.evict(max_bytes=2 * size) == size
+    assert ec.cache_get(keys[1]) is None
+    assert ec.cache_get(keys[0]) is not None and ec.cache_get(keys[2]) is not None
+
+
+def test_put_over_budget_evicts_down_to_low_water(monkeypatch):
+    monkeypatch.setattr(ec, "EXTRACT_CACHE_MAX_BYTES", 1000)
+    for i in range(20):
+        ec.cache_put(ec.cache_key(f"{i:02d}" * 32, "txt", "full"), {"text": "y" * 90})
+    assert ec.cache_stats()["bytes"] <= 1000
+    assert ec.cache_get(ec.cache_key("19" * 32, "txt", "full")) is not None
+
+
+def test_prune_texts_by_age_then_size(tmp_path):
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"{i}.txt")
+        ec.save_text(path, "z" * 100)
+        _age(path, 100 - i)
+        paths.append(path)
+    _age(paths[0], ec.EXTRACTED_MAX_AGE_SECONDS + 1)
+    assert ec.prune_texts(str(tmp_path)) == 100
+    assert not ec.touch_text(paths[0]) and ec.touch_text(paths[2])
+    assert ec.prune_texts(str(tmp_path), max_bytes=100) == 100
+    assert sorted(os.listdir(tmp_path)) == ["2.txt"]
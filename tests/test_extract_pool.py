@@ -0,0 +1,68 @@
+# Extraction on isolated worker processes: page-range jobs, errors and limits: python -m pytest tests
+import pytest
+
+import extract_pool as pool
+from extract_pool import isolated_document, isolated_units, isolated_preview, ExtractionError, ExtractionLimitError
+
+
+@pytest.fixture(autouse=True)
+def stop_idle_workers():
+    yield
+    with pool._cond:
+        idle = list(pool._idle)
+        pool._idle.clear()
+        pool._live -= len(idle)
+    for worker in idle:
+        worker.stop()
+
+
+def test_pdf_ranges_cover_every_page_within_the_job_size(monkeypatch):
+    monkeypatch.setattr(pool, "EXTRACT_PAGES_PER_JOB", 200)
+    for n, parts in ((1, 1), (199, 1), (450, 1), (1000, 4), (30, 4)):
+        ranges = pool._pdf_ranges(n, parts)
+        assert ranges[0][0] == 0 and ranges[-1][1] == n
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        assert all(0 < stop - start <= 200 for start, stop in ranges)
+        assert len(ranges) >= min(parts, n)
+
+
+def test_pdf_runs_as_page_range_jobs(make_pdf, monkeypatch):
+    monkeypatch.setattr(pool, "EXTRACT_PAGES_PER_JOB", 2)
+    path = make_pdf([f"Page {i}" for i in range(1, 6)])
+    doc = isolated_document(path, "pdf")
+    assert doc == {"text": "\n".join(f"Page {i}" for i in range(1, 6)), "units_read": 5}
+    assert list(isolated_units(path, "pdf")) == [(i, f"Page {i}") for i in range(1, 6)]
+
+
+def test_other_formats_run_as_one_job(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("hello world", encoding="utf-8")
+    assert isolated_document(str(path), "txt") == {"text": "hello world", "units_read": 1}
+    assert isolated_preview(str(path), "txt", max_chars=5) == {"text": "hello", "truncated": True, "units_read": 1}
+
+
+def test_malformed_document_is_an_extraction_error(tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf at all")
+    with pytest.raises(ExtractionError) as ctx:
+        isolated_preview(str(path), "pdf")
+    assert ctx.value.status == 422
+    assert pool.pool_stats()["idle"] == 1  # a parse error leaves the worker reusable
+
+
+def test_wall_clock_limit_replaces_the_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(pool, "EXTRACT_TIMEOUT_SECONDS", 0.001)
+    path = tmp_path / "a.txt"
+    path.write_text("slow", encoding="utf-8")
+    before = pool.pool_stats()["limit_timeout"]
+    with pytest.raises(ExtractionLimitError) as ctx:
+        isolated_document(str(path), "txt")
+    assert ctx.value.limit == "time"
+    stats = pool.pool_stats()
+    assert stats["limit_timeout"] == before + 1 and stats["idle"] == 0
+
+
+def test_busy_pool_rejects_after_the_queue_timeout(monkeypatch):
+    monkeypatch.setattr(pool, "EXTRACT_POOL_WORKERS", 0)
+    with pytest.raises(pool.PoolBusyError):
+        pool.run_extraction("count", "unused.pdf", queue_timeout=0.05)
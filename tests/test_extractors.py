@@ -0,0 +1,104 @@
+# Unit-by-unit extraction for every supported format, on documents built in tmp_path: python -m pytest tests
+import zipfile
+
+import docx
+from openpyxl import Workbook
+from pptx import Presentation
+
+import extractors
+from extractors import iter_units, extract_preview, extract_document_text
+
+
+def _units(path, ext):
+    return list(iter_units(str(path), ext, parallel=False))
+
+
+def _docx(path, paragraphs: int):
+    d = docx.Document()
+    for i in range(paragraphs):
+        d.add_paragraph(f"Paragraph {i}")
+    d.save(str(path))
+
+
+def _epub(path, chapters: dict, spine: list):
+    manifest = "".join(f'<item id="{cid}" href="text/{cid}.xhtml" media-type="application/xhtml+xml"/>'
+                       for cid in chapters)
+    itemrefs = "".join(f'<itemref idref="{cid}"/>' for cid in spine)
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip")
+        zf.writestr("META-INF/container.xml",
+                    '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0"><rootfiles>'
+                    '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+                    '</rootfiles></container>')
+        zf.writestr("OEBPS/content.opf",
+                    f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0"><manifest>{manifest}</manifest>'
+                    f'<spine>{itemrefs}</spine></package>')
+        for cid, body in chapters.items():
+            zf.writestr(f"OEBPS/text/{cid}.xhtml", f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>t</title>'
+                                                   f'<style>p {{color: red}}</style></head><body>{body}</body></html>')
+
+
+def test_txt_units_are_fixed_size_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "TXT_CHARS_PER_UNIT", 10)
+    path = tmp_path / "a.txt"
+    path.write_text("abcdefghij" * 3 + "xyz", encoding="utf-8")
+    units = _units(path, "txt")
+    assert [n for n, _ in units] == [1, 2, 3, 4]
+    assert "".join(u for _, u in units) == path.read_text(encoding="utf-8")
+
+
+def test_docx_units_are_paragraph_blocks(tmp_path):
+    path = tmp_path / "a.docx"
+    _docx(path, extractors.DOCX_PARAGRAPHS_PER_UNIT + 5)
+    units = _units(path, "docx")
+    assert len(units) == 2
+    assert units[1][1].splitlines()[0] == f"Paragraph {extractors.DOCX_PARAGRAPHS_PER_UNIT}"
+
+
+def test_pptx_units_are_slides(tmp_path):
+    prs = Presentation()
+    for i in range(3):
+        prs.slides.add_slide(prs.slide_layouts[5]).shapes.title.text = f"Slide {i}"
+    path = tmp_path / "a.pptx"
+    prs.save(str(path))
+    assert [u for _, u in _units(path, "pptx")] == ["Slide 0", "Slide 1", "Slide 2"]
+
+
+def test_xlsx_skips_empty_rows_and_blocks_the_rest(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "XLSX_ROWS_PER_UNIT", 2)
+    wb = Workbook()
+    ws = wb.active
+    for row in (["a", 1], [None, None], ["b", 2], ["c", None]):
+        ws.append(row)
+    path = tmp_path / "a.xlsx"
+    wb.save(str(path))
+    assert [u for _, u in _units(path, "xlsx")] == ["a 1\nb 2", "c"]
+
+
+def test_epub_follows_the_spine_and_drops_markup(tmp_path):
+    path = tmp_path / "a.epub"
+    _epub(path, {"ch1": "<h1>One</h1><p>First <b>chapter</b></p><script>x()</script>", "ch2": "<p>Two</p>"},
+          spine=["ch2", "ch1"])
+    assert [u for _, u in _units(path, "epub")] == ["Two", "One\nFirst chapter"]
+
+
+def test_pdf_units_are_pages(make_pdf):
+    path = make_pdf([f"Page {i}" for i in range(1, 4)])
+    assert _units(path, "pdf") == [(1, "Page 1"), (2, "Page 2"), (3, "Page 3")]
+    assert extract_document_text(path, "pdf") == "Page 1\nPage 2\nPage 3"
+
+
+def test_preview_stops_at_the_unit_budget(make_pdf):
+    path = make_pdf([f"Page {i}" for i in range(1, 6)])
+    preview = extract_preview(path, "pdf", max_chars=5000, max_units=2)
+    assert preview == {"text": "Page 1\nPage 2", "truncated": True, "units_read": 2}
+    assert extract_preview(path, "pdf", max_chars=5000, max_units=5)["truncated"] is False
+
+
+def test_preview_stops_at_the_char_budget(tmp_path):
+    path = tmp_path / "a.docx"
+    _docx(path, extractors.DOCX_PARAGRAPHS_PER_UNIT * 3)
+    preview = extract_preview(str(path), "docx", max_chars=100)
+    assert preview["units_read"] == 1 and preview["truncated"] is True
+    assert len(preview["text"]) == 100
+
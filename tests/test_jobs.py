@@ -0,0 +1,120 @@
+# Job queue claims, leases and stale-job requeueing on SQLite: python -m pytest tests
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from Config import Session
+from Model import Jobs
+
+
+@jobs.register_job("test-echo")
+def _echo(payload, progress):
+    progress(50, "halfway")
+    return {"echo": payload["value"]}
+
+
+@jobs.register_job("test-fail")
+def _fail(payload, progress):
+    raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    db = Session()
+    try:
+        db.query(Jobs).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _age_heartbeat(job_id: str):
+    old = datetime.utcnow() - timedelta(seconds=jobs.JOB_STALE_SECONDS + 60)
+    assert jobs._set(job_id, heartbeat_at=old)
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        jobs.enqueue_job("no-such-kind", {})
+
+
+def test_claim_runs_and_stores_result():
+    job_id = jobs.enqueue_job("test-echo", {"value": 7})
+    claimed = jobs._claim_next("w1")
+    assert claimed[:3] == (job_id, "test-echo", {"value": 7})
+    assert claimed[3].startswith("w1:")
+    assert jobs.get_job(job_id)["status"] == "running"
+    assert jobs._claim_next("w2") is None
+
+    jobs._run_one(*claimed)
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["progress"], job["result"], job["attempts"]) == ("done", 100, {"echo": 7}, 1)
+
+
+def test_claims_are_oldest_first():
+    first = jobs.enqueue_job("test-echo", {"value": 1})
+    second = jobs.enqueue_job("test-echo", {"value": 2})
+    assert jobs._claim_next("w")[0] == first
+    assert jobs._claim_next("w")[0] == second
+
+
+def test_handler_error_fails_the_job():
+    job_id = jobs.enqueue_job("test-fail", {})
+    jobs._run_one(*jobs._claim_next("w1"))
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["error"]) == ("failed", "boom")
+
+
+def test_concurrent_claims_win_once():
+    job_id = jobs.enqueue_job("test-echo", {"value": 1})
+    wins, start = [], threading.Barrier(4)
+
+    def claim(i):
+        start.wait()
+        claimed = jobs._claim_next(f"w{i}")
+        if claimed:
+            wins.append(claimed[0])
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert wins == [job_id]
+
+
+def test_stale_job_is_requeued_and_old_lease_revoked():
+    job_id = jobs.enqueue_job("test-echo", {"value": 3})
+    _, _, _, old_lease = jobs._claim_next("lost")
+    _age_heartbeat(job_id)
+    jobs._requeue_stale()
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["stage"]) == ("queued", "requeued")
+
+    claimed = jobs._claim_next("w2")
+    assert claimed[3] != old_lease
+    # the lost worker finishing late must not overwrite the new claim
+    assert not jobs._set(job_id, old_lease, status="done", result='{"echo": "stale"}')
+    jobs._run_one(*claimed)
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["result"], job["attempts"]) == ("done", {"echo": 3}, 2)
+
+
+def test_fresh_heartbeat_is_not_requeued():
+    job_id = jobs.enqueue_job("test-echo", {"value": 4})
+    jobs._claim_next("w1")
+    jobs._requeue_stale()
+    assert jobs.get_job(job_id)["status"] == "running"
+
+
+def test_job_fails_after_max_attempts():
+    job_id = jobs.enqueue_job("test-echo", {"value": 5})
+    for _ in range(jobs.JOB_MAX_ATTEMPTS):
+        assert jobs._claim_next("lost")[0] == job_id
+        _age_heartbeat(job_id)
+        jobs._requeue_stale()
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["error"]) == ("failed", "Worker lost")
+    assert jobs._claim_next("w") is None
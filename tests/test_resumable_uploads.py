@@ -0,0 +1,106 @@
+# Resumable uploads: Content-Range parsing, offsets, resume after a drop and finalize: python -m pytest tests
+import io, os, time
+from hashlib import sha256
+
+import pytest
+
+import resumable_uploads as ru
+from resumable_uploads import UploadError, parse_content_range
+
+DATA = bytes(range(256)) * 40  # 10 KiB
+
+
+def _append(upload_id: str, start: int, data: bytes, total: int = None):
+    return ru.append_chunk(upload_id, start, io.BytesIO(data), len(data), total)
+
+
+def _status(call) -> tuple:
+    with pytest.raises(UploadError) as ctx:
+        call()
+    return ctx.value.status, ctx.value.offset
+
+
+def test_parse_content_range():
+    assert parse_content_range("bytes 0-1048575/209715200") == (0, 1048575, 209715200)
+    assert parse_content_range(" bytes 5-9/* ") == (5, 9, None)
+    for bad in ("", None, "bytes=0-5/10", "bytes 0-5", "items 0-5/10", "bytes -1-5/10"):
+        assert parse_content_range(bad) is None
+
+
+def test_chunks_in_order_then_finalize(tmp_path):
+    upload = ru.create_upload("Book.PDF", len(DATA))
+    uid = upload["upload_id"]
+    assert _append(uid, 0, DATA[:4096])["offset"] == 4096
+    assert _append(uid, 4096, DATA[4096:])["offset"] == len(DATA)
+    done = ru.finalize_upload(uid, str(tmp_path))
+    assert done["sha256"] == sha256(DATA).hexdigest() and done["size"] == len(DATA)
+    assert done["path"] == os.path.join(str(tmp_path), f"{done['sha256']}.pdf")
+    with open(done["path"], "rb") as f:
+        assert f.read() == DATA
+    assert _status(lambda: ru.get_upload(uid)) == (404, None)
+
+
+def test_out_of_order_chunk_reports_the_offset():
+    uid = ru.create_upload("a.txt", len(DATA))["upload_id"]
+    _append(uid, 0, DATA[:100])
+    assert _status(lambda: _append(uid, 200, DATA[200:300])) == (409, 100)
+    assert _status(lambda: _append(uid, 0, DATA[:100])) == (409, 100)  # a replayed chunk is not written twice
+    assert ru.get_upload(uid)["offset"] == 100
+
+
+def test_resume_after_a_dropped_connection(tmp_path):
+    uid = ru.create_upload("a.txt", len(DATA))["upload_id"]
+    # the body ends after 3000 of the announced bytes: the connection went away
+    assert _status(lambda: ru.append_chunk(uid, 0, io.BytesIO(DATA[:3000]), len(DATA))) == (400, 3000)
+    offset = ru.get_upload(uid)["offset"]
+    assert offset == 3000
+    _append(uid, offset, DATA[offset:])
+    assert ru.finalize_upload(uid, str(tmp_path))["sha256"] == sha256(DATA).hexdigest()
+
+
+def test_finalize_rehashes_without_in_process_state(tmp_path):
+    uid = ru.create_upload("a.txt", len(DATA))["upload_id"]
+    _append(uid, 0, DATA)
+    ru._hashes.pop(uid)  # as if another worker had received the chunks
+    assert ru.finalize_upload(uid, str(tmp_path))["sha256"] == sha256(DATA).hexdigest()
+
+
+def test_size_limits_and_totals():
+    assert _status(lambda: ru.create_upload("big.pdf", ru.RESUMABLE_MAX_BYTES + 1))[0] == 413
+    uid = ru.create_upload("a.txt", 10)["upload_id"]
+    assert _status(lambda: _append(uid, 0, b"x" * 11)) == (413, 0)
+    assert _status(lambda: _append(uid, 0, b"x" * 5, total=20)) == (400, 0)
+
+
+def test_unknown_size_is_taken_from_the_first_total(tmp_path):
+    uid = ru.create_upload("a.txt")["upload_id"]
+    _append(uid, 0, DATA[:10], total=len(DATA))
+    assert ru.get_upload(uid)["size"] == len(DATA)
+    assert _status(lambda: ru.finalize_upload(uid, str(tmp_path))) == (409, 10)
+
+
+def test_same_content_is_stored_once(tmp_path):
+    paths = []
+    for name in ("one.txt", "two.txt"):
+        uid = ru.create_upload(name, len(DATA))["upload_id"]
+        _append(uid, 0, DATA)
+        paths.append(ru.finalize_upload(uid, str(tmp_path))["path"])
+    assert paths[0] == paths[1] and len(os.listdir(tmp_path)) == 1
+
+
+def test_invalid_ids_and_abort():
+    assert _status(lambda: ru.get_upload("../../etc/passwd"))[0] == 400
+    uid = ru.create_upload("a.txt", 10)["upload_id"]
+    ru.abort_upload(uid)
+    assert _status(lambda: ru.get_upload(uid))[0] == 404
+    assert _status(lambda: ru.abort_upload(uid))[0] == 404
+
+
+def test_stale_uploads_are_removed():
+    stale = ru.create_upload("old.txt", 10)["upload_id"]
+    fresh = ru.create_upload("new.txt", 10)["upload_id"]
+    old = time.time() - ru.RESUMABLE_TTL_SECONDS - 60
+    os.utime(ru._paths(stale)[1], (old, old))
+    assert ru.cleanup_stale_uploads() >= 1
+    assert _status(lambda: ru.get_upload(stale))[0] == 404
+    assert ru.get_upload(fresh)["offset"] == 0
@@ -0,0 +1,69 @@
+# Map-reduce summarization with a stand-in LLM: python -m pytest tests
+import re, uuid
+
+import summarizer
+from summarizer import condense_text, split_into_chunks, approx_tokens
+
+
+def _book(paragraphs: int, words: int = 200) -> str:
+    tag = uuid.uuid4().hex  # partials are cached by content: every test gets its own text
+    return "\n\n".join(f"Chapter {i} {tag}. " + " ".join(["lorem ipsum"] * (words // 2)) for i in range(paragraphs))
+
+
+def _llm(calls: list):
+    """complete(prompt, max_tokens) that answers with exactly the number of words the prompt asks for."""
+    def complete(prompt, max_tokens):
+        calls.append(prompt)
+        words = int(re.search(r"about (\d+) words", prompt).group(1))
+        return " ".join(["gist"] * words)
+    return complete
+
+
+def test_text_that_fits_is_returned_unchanged():
+    calls = []
+    text = _book(3)
+    assert condense_text(text, _llm(calls), max_tokens=approx_tokens(text)) == text
+    assert calls == []
+
+
+def test_chunks_keep_paragraphs_and_respect_the_budget():
+    text = _book(40)
+    chunks = split_into_chunks(text, 1000)
+    assert len(chunks) > 1
+    assert all(approx_tokens(c) <= 1000 for c in chunks)
+    assert "\n\n".join(chunks) == text  # paragraphs are packed, never cut or reordered
+
+
+def test_oversized_paragraph_is_split():
+    text = " ".join(f"Sentence {i} goes on for a while." for i in range(500))
+    chunks = split_into_chunks(text, 200)
+    assert len(chunks) > 1
+    assert all(approx_tokens(c) <= 200 for c in chunks)
+
+
+def test_one_map_pass_when_partials_fit():
+    calls, stats = [], {}
+    text = _book(60)
+    out = condense_text(text, _llm(calls), max_tokens=2000, stats=stats)
+    assert stats["levels"] == 1
+    assert len(calls) == stats["chunks"] == stats["generated"]
+    assert approx_tokens(out) <= 2000
+
+
+def test_partials_are_reduced_level_by_level(monkeypatch):
+    monkeypatch.setattr(summarizer, "CHUNK_TOKENS", 400)
+    calls, stats = [], {}
+    out = condense_text(_book(60), _llm(calls), max_tokens=300, stats=stats)
+    assert stats["levels"] >= 2
+    assert len(calls) > stats["chunks"]
+    assert approx_tokens(out) <= 300
+
+
+def test_cached_partials_are_reused():
+    text = _book(60)
+    first, second = [], []
+    condense_text(text, _llm(first), max_tokens=2000)
+    stats = {}
+    condense_text(text, _llm(second), max_tokens=2000, stats=stats)
+    assert first and second == []
+    assert stats["cached"] == stats["chunks"] and stats["generated"] == 0
@@ -0,0 +1,90 @@
+# MP3 frame joining and group-level TTS caching with the offline engine: python -m pytest tests
+import pytest
+
+import tts_services as tts
+from tts_services import SilenceEngine, concat_mp3, iter_mp3_frames, group_sentences, split_sentences
+
+FRAME = SilenceEngine.FRAME
+
+
+class CountingEngine(SilenceEngine):
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def synthesize(self, text: str, lang: str = "en") -> bytes:
+        self.texts.append(text)
+        return super().synthesize(text, lang)
+
+
+@pytest.fixture
+def engine():
+    e = CountingEngine()
+    previous = tts.get_tts_engine()
+    tts.set_tts_engine(e)
+    yield e
+    tts.set_tts_engine(previous)
+
+
+def _id3(payload: bytes = b"tag!") -> bytes:
+    n = len(payload)
+    return b"ID3\x03\x00\x00" + bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F]) + payload
+
+
+def _xing() -> bytes:
+    # an Info header frame: same header as FRAME, the tag right after the mono MPEG-2 side info
+    return FRAME[:4] + bytes(9) + b"Xing" + bytes(len(FRAME) - 17)
+
+
+def test_frames_are_parsed():
+    assert list(iter_mp3_frames(FRAME * 3)) == [FRAME] * 3
+
+
+def test_concat_drops_tags_and_vbr_headers():
+    chunk = _id3() + _xing() + FRAME * 2
+    assert concat_mp3([chunk, chunk]) == FRAME * 4
+
+
+def test_concat_skips_leading_junk():
+    assert concat_mp3([b"\x00junk" + FRAME * 2, b"\x00" + FRAME]) == FRAME * 3
+
+
+def test_sentences_are_grouped_under_the_limit():
+    sentences = split_sentences("One two. Three four!\nFive six? " + "Seven eight. " * 20)
+    assert sentences[:3] == ["One two.", "Three four!", "Five six?"]
+    groups = group_sentences(sentences, max_chars=40)
+    assert " ".join(groups) == " ".join(sentences)
+    assert all(len(g) <= 40 for g in groups)
+
+
+def test_long_sentence_stays_whole():
+    assert group_sentences(["x" * 50, "y."], max_chars=10) == ["x" * 50, "y."]
+
+
+def test_one_engine_call_per_group(engine):
+    text = " ".join(f"Sentence number {i} is here." for i in range(100))
+    audio, stats = tts.synthesize_segmented(text, engine=engine)
+    groups = group_sentences(split_sentences(text))
+    assert sorted(engine.texts) == sorted(groups)
+    assert stats == {"segments": len(groups), "segment_hits": 0, "segment_misses": len(groups)}
+    assert audio == concat_mp3([engine.synthesize(g) for g in groups])
+
+
+def test_edit_resynthesizes_only_the_changed_group(engine):
+    text = " ".join(f"Edited text sentence {i}." for i in range(100))
+    tts.synthesize_segmented(text, engine=engine)
+    engine.texts = []
+    edited = text.replace("sentence 99.", "sentence ninety-nine.")
+    _, stats = tts.synthesize_segmented(edited, engine=engine)
+    assert len(engine.texts) == stats["segment_misses"] == 1
+    assert stats["segment_hits"] == stats["segments"] - 1
+
+
+def test_same_text_is_a_full_hit(engine):
+    text = "A short summary. It has two sentences."
+    first = tts.synthesize_tts_to_file(text, "Title", "Author", "1min")
+    calls = len(engine.texts)
+    second = tts.synthesize_tts_to_file(text, "Other Title", "Author", "1min")
+    assert calls == 1 and len(engine.texts) == 1
+    assert first["cache"]["full_text_hit"] is False and second["cache"]["full_text_hit"] is True
+    assert first["path"] == second["path"] and first["name"] != second["name"]
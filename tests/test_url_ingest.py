@@ -0,0 +1,166 @@
+# URL ingestion against a local stand-in server: python -m unittest discover tests
+import os, sys, socket, shutil, tempfile, threading, subprocess, unittest, ipaddress
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp(prefix="kotubrief-ingest-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ["INGEST_DIR"] = os.path.join(_tmp, "ingested")
+
+import url_ingest  # noqa: E402
+
+PDF = b"%PDF-1.4\n% stand-in document\n"
+PUBLIC = "127.0.0.1"  # the stand-in server; every other address counts as internal in these tests
+
+
+def tearDownModule():
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = []
+
+    def do_GET(self):
+        _Handler.hits.append((self.path, self.headers.get("Host")))
+        if self.path.startswith("/redirect?to="):
+            self.send_response(302)
+            self.send_header("Location", self.path.split("=", 1)[1])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/loop":
+            self.send_response(302)
+            self.send_header("Location", "/loop")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+def _resolver(answers: dict):
+    """getaddrinfo stand-in: name -> list of addresses, consumed one answer per lookup (rebinding)."""
+    real = socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host not in answers:
+            return real(host, port, *args, **kwargs)
+        ip = answers[host].pop(0) if len(answers[host]) > 1 else answers[host][0]
+        family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        return [(family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (ip, port))]
+    return getaddrinfo
+
+
+class IngestTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer((PUBLIC, 0), _Handler)
+        cls.port = cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _Handler.hits = []
+        patcher = mock.patch.object(url_ingest, "_address_allowed", lambda ip: str(ip) == PUBLIC)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def url(self, path: str, host: str = PUBLIC) -> str:
+        return f"http://{host}:{self.port}{path}"
+
+    def test_download(self):
+        doc = url_ingest.download_document(self.url("/book.pdf"))
+        self.assertEqual((doc["ext"], doc["size"]), ("pdf", len(PDF)))
+        with open(doc["path"], "rb") as f:
+            self.assertEqual(f.read(), PDF)
+
+    def test_private_host_is_refused_before_connecting(self):
+        with self.assertRaises(url_ingest.IngestError) as ctx:
+            url_ingest.download_document(self.url("/book.pdf", "127.0.0.2"))
+        self.assertEqual(ctx.exception.status, 403)
+        self.assertEqual(_Handler.hits, [])
+
+    def test_redirect_to_private_host_is_not_followed(self):
+        target = self.url("/secret.pdf", "127.0.0.2")
+        with self.assertRaises(url_ingest.IngestError) as ctx:
+            url_ingest.download_document(self.url(f"/redirect?to={target}"))
+        self.assertEqual(ctx.exception.status, 403)
+        self.assertEqual([path for path, _ in _Handler.hits], [f"/redirect?to={target}"])
+
+    def test_redirect_to_public_host_is_followed(self):
+        doc = url_ingest.download_document(self.url("/redirect?to=/final.pdf"))
+        self.assertEqual(doc["size"], len(PDF))
+        self.assertEqual([path for path, _ in _Handler.hits], ["/redirect?to=/final.pdf", "/final.pdf"])
+
+    def test_redirect_limit(self):
+        with self.assertRaises(url_ingest.IngestError) as ctx:
+            url_ingest.download_document(self.url("/loop"))
+        self.assertEqual(ctx.exception.status, 502)
+        self.assertEqual(len(_Handler.hits), url_ingest.INGEST_MAX_REDIRECTS + 1)
+
+    def test_connects_to_the_vetted_address(self):
+        # the first lookup passes the check; a second one would answer with an internal address
+        answers = {"books.test": [PUBLIC, "127.0.0.2"]}
+        with mock.patch("socket.getaddrinfo", _resolver(answers)):
+            doc = url_ingest.download_document(self.url("/book.pdf", "books.test"))
+        self.assertEqual(doc["size"], len(PDF))
+        self.assertEqual(_Handler.hits, [("/book.pdf", f"books.test:{self.port}")])
+        self.assertEqual(answers["books.test"], ["127.0.0.2"])  # resolved exactly once
+
+    def test_any_internal_address_refuses_the_host(self):
+        self.assertFalse(url_ingest._address_allowed(ipaddress.ip_address("127.0.0.2")))
+        with mock.patch("socket.getaddrinfo", lambda host, port, *a, **k: [
+                (socket.AF_INET, socket.SOCK_STREAM, 6, "", (PUBLIC, port)),
+                (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.2", port))]):
+            with self.assertRaises(url_ingest.IngestError):
+                url_ingest.download_document(self.url("/book.pdf", "mixed.test"))
+        self.assertEqual(_Handler.hits, [])
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl not available")
+class PinnedTLSTest(unittest.TestCase):
+    """https to the vetted address still sends SNI and checks the certificate for the original name."""
+
+    def setUp(self):
+        import ssl
+        d = tempfile.mkdtemp(dir=_tmp)
+        self.cert, key = os.path.join(d, "cert.pem"), os.path.join(d, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-subj", "/CN=books.test", "-addext", "subjectAltName=DNS:books.test",
+                        "-keyout", key, "-out", self.cert], check=True, capture_output=True)
+        self.server = ThreadingHTTPServer((PUBLIC, 0), _Handler)
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(self.cert, key)
+        self.server.socket = ctx.wrap_socket(self.server.socket, server_side=True)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        for patcher in (mock.patch.object(url_ingest, "_address_allowed", lambda ip: str(ip) == PUBLIC),
+                        mock.patch.dict(os.environ, {"REQUESTS_CA_BUNDLE": self.cert, "CURL_CA_BUNDLE": self.cert})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_certificate_is_checked_against_the_name(self):
+        with mock.patch("socket.getaddrinfo", _resolver({"books.test": [PUBLIC], "other.test": [PUBLIC]})):
+            doc = url_ingest.download_document(f"https://books.test:{self.port}/book.pdf")
+            self.assertEqual(doc["size"], len(PDF))
+            with self.assertRaises(url_ingest.IngestError) as ctx:
+                url_ingest.download_document(f"https://other.test:{self.port}/book.pdf")
+        self.assertEqual(ctx.exception.status, 502)
+
+
+if __name__ == "__main__":
+    unittest.main()
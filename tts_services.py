@@ -0,0 +1,300 @@
+import os, re, io, math, time
+from concurrent.futures import ThreadPoolExecutor
+
+from gtts import gTTS
+
+from audio_store import (
+    audio_digest, segment_digest, get_or_create_blob, link_name, put_blob, read_blob, open_blob, evict
+)
+
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")  # "gtts" | "silence" (offline stand-in)
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", 4))
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", 600))
+TTS_FIRST_CHUNK_CHARS = 150  # small first group so streamed playback starts quickly
+
+
+# ----------------- Engines -----------------
+class GTTSEngine:
+    """Google Translate TTS via gTTS (network)."""
+    name = "gtts"
+
+    def synthesize(self, text: str, lang: str = "en") -> bytes:
+        buf = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buf)
+        return buf.getvalue()
+
+
+class SilenceEngine:
+    """
+    Offline stand-in: emits valid silent MP3 frames (MPEG-2 Layer III, 24 kHz, 32 kbps mono,
+    the same format gTTS returns) with a duration proportional to the text. `delay` simulates
+    the per-request network latency of a real engine for benchmarks.
+    """
+    name = "silence"
+    FRAME = bytes([0xFF, 0xF3, 0x44, 0xC0]) + bytes(92)  # 96-byte frame = 24 ms of audio
+
+    def __init__(self, delay: float = 0.0, wpm: int = 150):
+        self.delay = delay
+        self.wpm = wpm
+
+    def synthesize(self, text: str, lang: str = "en") -> bytes:
+        if self.delay:
+            time.sleep(self.delay)
+        seconds = max(1, len((text or "").split())) / self.wpm * 60
+        return self.FRAME * max(1, int(seconds / 0.024))
+
+
+_engine = None
+
+
+def get_tts_engine():
+    global _engine
+    if _engine is None:
+        _engine = SilenceEngine() if TTS_ENGINE == "silence" else GTTSEngine()
+    return _engine
+
+
+def set_tts_engine(engine):
+    """Swap the process-wide engine (tests, benchmarks)."""
+    global _engine
+    _engine = engine
+
+
+# ----------------- Text splitting -----------------
+def split_sentences(text: str) -> list:
+    parts = re.split(r"(?<=[.!?;:])\s+|\n+", text or "")
+    return [p.strip() for p in parts if p and p.strip()]
+
+
+def group_sentences(sentences: list, max_chars: int = TTS_CHUNK_CHARS) -> list:
+    """Pack consecutive sentences into chunks of at most max_chars (a longer sentence stays whole)."""
+    groups, buf, size = [], [], 0
+    for s in sentences:
+        if buf and size + len(s) + 1 > max_chars:
+            groups.append(" ".join(buf))
+            buf, size = [], 0
+        buf.append(s)
+        size += len(s) + 1
+    if buf:
+        groups.append(" ".join(buf))
+    return groups
+
+
+# ----------------- MP3 frames -----------------
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 25: [11025, 12000, 8000]}
+
+
+def _frame_info(data: bytes, i: int):
+    """(frame_length, side_info_offset) for a valid frame header at data[i], else None."""
+    if i + 4 > len(data) or data[i] != 0xFF or (data[i + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[i + 1] >> 3) & 0x03
+    layer_bits = (data[i + 1] >> 1) & 0x03
+    br_idx = data[i + 2] >> 4
+    sr_idx = (data[i + 2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or br_idx in (0, 15) or sr_idx == 3:
+        return None
+
+    version = {3: 1, 2: 2, 0: 25}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][br_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][sr_idx]
+    padding = (data[i + 2] >> 1) & 0x01
+    mono = (data[i + 3] >> 6) == 3
+
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and version != 1:
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        length = 144 * bitrate // sample_rate + padding
+
+    if version == 1:
+        side = 17 if mono else 32
+    else:
+        side = 9 if mono else 17
+    return length, 4 + side
+
+
+def _strip_tags(data: bytes) -> bytes:
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def iter_mp3_frames(data: bytes):
+    """Yield each audio frame in an MP3 byte string, skipping tags, junk and Xing/Info/VBRI headers."""
+    data = _strip_tags(data)
+    i, n = 0, len(data)
+    while i < n:
+        info = _frame_info(data, i)
+        if not info or info[0] <= 4 or i + info[0] > n:
+            i += 1
+            continue
+        length, side = info
+        # require the next header to line up too (or end of data) so we don't lock onto a false sync
+        if i + length < n and not _frame_info(data, i + length):
+            i += 1
+            continue
+        frame = data[i:i + length]
+        if frame[side:side + 4] not in (b"Xing", b"Info") and frame[36:40] != b"VBRI":
+            yield frame
+        i += length
+
+
+def concat_mp3(chunks: list) -> bytes:
+    """Join MP3 byte strings at frame boundaries into one stream (no per-chunk tags or VBR headers)."""
+    out = []
+    for chunk in chunks:
+        frames = list(iter_mp3_frames(chunk))
+        out.append(b"".join(frames) if frames else _strip_tags(chunk))
+    return b"".join(out)
+
+
+# ----------------- Pipeline -----------------
+def synthesize_mp3(text: str, lang: str = "en", engine=None, max_workers: int = TTS_MAX_WORKERS) -> bytes:
+    """Split at sentence boundaries, synthesize chunks concurrently, join in order."""
+    engine = engine or get_tts_engine()
+    groups = group_sentences(split_sentences(text)) or [text]
+    if len(groups) == 1:
+        return concat_mp3([engine.synthesize(groups[0], lang)])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as pool:
+        parts = list(pool.map(lambda g: engine.synthesize(g, lang), groups))
+    return concat_mp3(parts)
+
+
+def synthesize_segmented(text: str, lang: str = "en", engine=None, max_workers: int = TTS_MAX_WORKERS):
+    """
+    Group-level caching: the text is split into the same sentence groups synthesize_mp3 sends to the
+    engine, and each group's audio is a blob keyed by its own hash. After an edit only the groups that
+    changed are synthesized, one engine call per group. Returns (mp3_bytes, {"segment_hits", "segment_misses"}).
+    """
+    engine = engine or get_tts_engine()
+    groups = group_sentences(split_sentences(text)) or [text]
+    digests = [segment_digest(g, lang, engine.name) for g in groups]
+
+    audio = {}
+    for d in set(digests):
+        data = read_blob(d)
+        if data is not None:
+            audio[d] = data
+    missing = {d: g for d, g in zip(digests, groups) if d not in audio}
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            fresh = dict(zip(missing, pool.map(lambda g: engine.synthesize(g, lang), missing.values())))
+        for d, data in fresh.items():
+            put_blob(d, data, evict_now=False)
+        audio.update(fresh)
+        evict()
+
+    stats = {
+        "segments": len(groups),
+        "segment_hits": sum(1 for d in digests if d not in missing),
+        "segment_misses": len(missing)
+    }
+    return concat_mp3([audio[d] for d in digests]), stats
+
+
+def iter_mp3_chunks(text: str, lang: str = "en", engine=None, max_workers: int = TTS_MAX_WORKERS):
+    """
+    Yield MP3 frame data group by group, in order, as soon as each group is synthesized.
+    Later groups are synthesized ahead on the pool while earlier ones are being sent.
+    """
+    engine = engine or get_tts_engine()
+    sentences = split_sentences(text) or [text]
+    first_n, size = 0, 0
+    for s in sentences:
+        if first_n and size + len(s) + 1 > TTS_FIRST_CHUNK_CHARS:
+            break
+        first_n += 1
+        size += len(s) + 1
+    groups = [" ".join(sentences[:first_n])] + group_sentences(sentences[first_n:])
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(groups)))
+    futures = []
+    try:
+        futures = [pool.submit(engine.synthesize, g, lang) for g in groups]
+        for fut in futures:
+            yield concat_mp3([fut.result()])
+    finally:
+        # client went away or synthesis failed: don't keep paying for the remaining groups
+        for fut in futures:
+            fut.cancel()
+        pool.shutdown(wait=False)
+
+
+def stream_tts(text: str, lang: str = "en"):
+    """
+    Generator of MP3 bytes for streaming responses. Served from the audio store when the blob
+    exists; otherwise synthesized progressively and written to the store once complete.
+    """
+    engine = get_tts_engine()
+    digest = audio_digest(text, lang, voice=engine.name)
+    f = open_blob(digest)  # None if never stored or evicted: synthesize below
+    if f is not None:
+        with f:
+            while True:
+                block = f.read(64 * 1024)
+                if not block:
+                    return
+                yield block
+
+    parts = []
+    for part in iter_mp3_chunks(text, lang, engine):
+        parts.append(part)
+        yield part
+    # only reached when the whole text was sent; later plays and /generate-tts reuse this blob
+    put_blob(digest, b"".join(parts))
+
+
+# ------------------ Audio files ------------------
+def _slug(s: str) -> str:
+    s = (s or "").lower()
+    s = re.sub(r"[^a-z0-9]+", "-", s).strip("-")
+    return s or "audio"
+
+def _approx_seconds_from_text(txt: str, wpm: int = 150) -> int:
+    words = max(1, len((txt or "").split()))
+    return math.ceil(words / wpm * 60)
+
+def synthesize_tts_to_file(text: str, title: str, author: str, duration_key: str, lang: str = "en") -> dict:
+    """
+    Content-addressed: audio is keyed by (voice, lang, text) only, so the same text under another
+    title reuses the blob. The old title-based filename is kept as an alias in the store index.
+    A new text is assembled from cached sentence groups, synthesizing only the ones not seen before.
+    """
+    engine = get_tts_engine()
+    digest = audio_digest(text, lang, voice=engine.name)
+    cache = {"full_text_hit": True, "segment_hits": 0, "segment_misses": 0}
+
+    def build():
+        audio, stats = synthesize_segmented(text, lang, engine)
+        cache.update(stats, full_text_hit=False)
+        return audio
+
+    blob = get_or_create_blob(digest, build)
+
+    name = f"{_slug(title)}-{_slug(author)}-{duration_key}-{digest[:12]}.mp3"
+    link_name(name, digest)
+
+    return {
+        "filename": blob["relpath"],
+        "path": blob["path"],
+        "name": name,
+        "seconds": _approx_seconds_from_text(text),
+        "cache": cache
+    }
@@ -0,0 +1,232 @@
+import os, time, socket, tempfile, ipaddress
+from hashlib import sha256
+from datetime import datetime
+from urllib.parse import urlparse, urljoin, unquote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from Config import Session
+from Model import Books
+from catalog import bump_catalog_version
+from search import index_book
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INGEST_DIR = os.getenv("INGEST_DIR", os.path.join(BASE_DIR, "uploads", "ingested"))
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", 200 * 1024 ** 2))
+INGEST_CONNECT_TIMEOUT = float(os.getenv("INGEST_CONNECT_TIMEOUT", 5))
+INGEST_READ_TIMEOUT = float(os.getenv("INGEST_READ_TIMEOUT", 30))  # max silence between bytes
+INGEST_TOTAL_SECONDS = float(os.getenv("INGEST_TOTAL_SECONDS", 300))  # whole download
+INGEST_ALLOW_PRIVATE = os.getenv("INGEST_ALLOW_PRIVATE", "0").lower() in ("1", "true", "yes")  # local test servers
+INGEST_MAX_REDIRECTS = 5
+DOWNLOAD_CHUNK = 64 * 1024
+os.makedirs(INGEST_DIR, exist_ok=True)
+
+CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/epub+zip": "epub",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "text/plain": "txt",
+}
+
+
+class IngestError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+# ----------------- HTTP client -----------------
+class _PinnedAdapter(HTTPAdapter):
+    """
+    Requests are sent to the vetted IP with the real name in the Host header (see _pinned_request);
+    for https the name is also used for SNI and certificate checks. Pools are keyed by (IP, name).
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        name = (request.headers.get("Host") or "").rsplit(":", 1)[0].strip("[]")
+        if host_params["scheme"] == "https" and name and name != host_params["host"]:
+            pool_kwargs["server_hostname"] = name
+            pool_kwargs["assert_hostname"] = name
+        return host_params, pool_kwargs
+
+
+_session = None
+
+
+def get_http_session() -> requests.Session:
+    """One pooled Session per process: keep-alive connections are reused across ingests."""
+    global _session
+    if _session is None:
+        s = requests.Session()
+        retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5, allowed_methods=["GET"])
+        adapter = _PinnedAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        s.headers["User-Agent"] = "KotuBrief-Ingest/1.0"
+        _session = s
+    return _session
+
+
+# ----------------- Helpers -----------------
+def _address_allowed(ip) -> bool:
+    return INGEST_ALLOW_PRIVATE or (ip.is_global and not ip.is_multicast)
+
+
+def _check_host(url: str):
+    """
+    Resolve the URL's host and return the address to connect to. Refuses non-HTTP schemes and hosts
+    with any internal address (private, loopback, link-local, ...) unless INGEST_ALLOW_PRIVATE.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise IngestError("Only http(s) URLs are supported")
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        infos = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, ValueError):
+        raise IngestError("Host could not be resolved", 422)
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not addresses:
+        raise IngestError("Host could not be resolved", 422)
+    for ip in addresses:
+        if not _address_allowed(ip):
+            raise IngestError("URL points to a private address", 403)
+    return addresses[0]
+
+
+def _pinned_request(url: str):
+    """
+    (url rewritten to the vetted address, headers). Connecting to that address rather than resolving
+    the name again means a DNS answer that changes after the check (rebinding) cannot redirect us.
+    """
+    ip = _check_host(url)
+    parsed = urlparse(url)
+    host = f"[{ip}]" if ip.version == 6 else str(ip)
+    netloc = f"{host}:{parsed.port}" if parsed.port else host
+    name = parsed.hostname if ":" not in parsed.hostname else f"[{parsed.hostname}]"
+    return parsed._replace(netloc=netloc).geturl(), {"Host": f"{name}:{parsed.port}" if parsed.port else name}
+
+
+def _open(url: str):
+    """GET with redirects followed by hand, each hop's host vetted before connecting. Returns (final url, response)."""
+    session = get_http_session()
+    for _ in range(INGEST_MAX_REDIRECTS + 1):
+        target, headers = _pinned_request(url)
+        try:
+            resp = session.get(target, headers=headers, stream=True, allow_redirects=False,
+                               timeout=(INGEST_CONNECT_TIMEOUT, INGEST_READ_TIMEOUT))
+        except requests.RequestException as e:
+            raise IngestError(f"Download failed: {e}", 502)
+        if not resp.is_redirect:
+            return url, resp
+        location = resp.headers["Location"]
+        resp.close()
+        url = urljoin(url, location)
+    raise IngestError(f"Too many redirects (max {INGEST_MAX_REDIRECTS})", 502)
+
+
+def _detect_ext(url: str, content_type: str, head: bytes):
+    path = unquote(urlparse(url).path).lower()
+    ext = path.rsplit(".", 1)[1] if "." in path.rsplit("/", 1)[-1] else ""
+    if ext in CONTENT_TYPES.values():
+        return ext
+    ext = CONTENT_TYPES.get((content_type or "").split(";")[0].strip().lower())
+    if ext:
+        return ext
+    return "pdf" if head.startswith(b"%PDF-") else None
+
+
+# ----------------- Download -----------------
+def download_document(url: str, max_bytes: int = INGEST_MAX_BYTES) -> dict:
+    """
+    Stream url to disk while hashing it; enforces max_bytes and INGEST_TOTAL_SECONDS.
+    The file is stored once per content hash under INGEST_DIR: {path, sha256, size, ext, content_type, duplicate}.
+    """
+    deadline = time.monotonic() + INGEST_TOTAL_SECONDS
+    final_url, resp = _open(url)
+
+    with resp:
+        if resp.status_code != 200:
+            raise IngestError(f"Remote server returned {resp.status_code}", 502)
+        declared = resp.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise IngestError(f"Document too large (max {max_bytes} bytes)", 413)
+
+        h, size, head = sha256(), 0, b""
+        fd, tmp = tempfile.mkstemp(dir=INGEST_DIR, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in resp.iter_content(DOWNLOAD_CHUNK):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise IngestError(f"Document too large (max {max_bytes} bytes)", 413)
+                    if time.monotonic() > deadline:
+                        raise IngestError("Download took too long", 504)
+                    if not head:
+                        head = chunk[:8]
+                    h.update(chunk)
+                    out.write(chunk)
+        except requests.RequestException as e:
+            os.remove(tmp)
+            raise IngestError(f"Download failed: {e}", 502)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    ext = _detect_ext(final_url, resp.headers.get("Content-Type"), head)
+    if not ext:
+        os.remove(tmp)
+        raise IngestError("Unsupported document type", 415)
+
+    digest = h.hexdigest()
+    path = os.path.join(INGEST_DIR, f"{digest}.{ext}")
+    duplicate = os.path.exists(path)
+    if duplicate:
+        os.remove(tmp)  # same bytes fetched before: keep the stored copy
+    else:
+        os.replace(tmp, path)
+    return {
+        "path": path,
+        "sha256": digest,
+        "size": size,
+        "ext": ext,
+        "content_type": resp.headers.get("Content-Type"),
+        "duplicate": duplicate,
+    }
+
+
+# ----------------- Books -----------------
+def attach_text_to_book(book_id: int, text: str, source: str, digest: str) -> bool:
+    """
+    Append text to the book's description (same layout as /append-pdf-to-book).
+    Returns False if the text is already part of the description.
+    """
+    db = Session()
+    try:
+        book = db.query(Books).filter(Books.book_id == book_id).first()
+        if not book:
+            raise IngestError("Book not found", 404)
+        if book.description and text in book.description:
+            return False
+        if book.description:
+            book.description += f"\n\n--- Added from {source} (sha256 {digest[:16]}, {datetime.utcnow().date()}) ---\n{text}"
+        else:
+            book.description = text
+        db.commit()
+        bump_catalog_version()
+        index_book(book_id)
+        return True
+    except IngestError:
+        raise
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
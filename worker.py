@@ -0,0 +1,7 @@
+# Background job worker (summary + TTS). Run as its own process: `python worker.py`
+from jobs import run_worker
+
+if __name__ == "__main__":
+    # imported here, not at module level: spawned extraction workers re-import this file as __mp_main__
+    import Routes  # registers job handlers with the queue
+    run_worker()